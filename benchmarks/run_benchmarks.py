@@ -0,0 +1,228 @@
+#!/usr/bin/python3
+"""
+Offline benchmarks of the sender, formatter and merge hot paths.
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --quick --baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --update-baseline
+    python -m benchmarks.run_benchmarks --only import
+
+SES calls are answered by botocore's Stubber, so no network or credentials are needed.
+The results are written as JSON and, when a baseline is given, every benchmark whose median
+is slower than the baseline median by more than the tolerance is reported and the exit code is 1.
+The baseline keeps the full and the quick results apart, as they run different sizes.
+The import group measures cold start with python -X importtime in fresh interpreters.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import boto3
+from botocore.stub import Stubber
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+from send_email.json_convert_appconfig import ApConfigJsonConvert
+from send_email.send_email_common import BULK_DESTINATION_LIMIT, EmailBody, MessageFormat, SesMailSender
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = "xu.liang@cienet.com.cn"
+
+
+def measure(func, repeat):
+    """
+    :return: dict: the median and minimum seconds of repeat runs of func
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {'median_s': statistics.median(timings), 'min_s': min(timings), 'repeat': repeat}
+
+
+def stubbed_sender(method, response, count):
+    client = boto3.client("ses", region_name="us-east-1", aws_access_key_id="testing",
+                          aws_secret_access_key="testing")
+    stubber = Stubber(client)
+    for _ in range(count):
+        stubber.add_response(method, response)
+    stubber.activate()
+    return SesMailSender(client)
+
+
+def bench_sender(results, quick, repeat):
+    emails = 50 if quick else 200
+    email_bodies = [EmailBody(source=SOURCE, destination="user%d@163.com" % index, subject="subject",
+                              text="text", html="<p>html</p>", template_name="MyTemplate",
+                              template_data={"name": "user%d" % index}) for index in range(emails)]
+    appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.COMPLETE.value, {},
+                                       "shipoption/test1.json")
+    os.environ.setdefault("EMAIL_SOURCE", SOURCE)
+    os.environ.setdefault("EMAIL_DESTINATION", "user@163.com")
+
+    styles = {
+        'send_email': ('send_email', {'MessageId': 'id'}, emails,
+                       lambda sender: [sender.send_email(email_body) for email_body in email_bodies]),
+        'send_templated_email': ('send_templated_email', {'MessageId': 'id'}, emails,
+                                 lambda sender: [sender.send_templated_email(email_body)
+                                                 for email_body in email_bodies]),
+        'send_bulk_templated_email': ('send_bulk_templated_email',
+                                      {'Status': [{'Status': 'Success', 'MessageId': 'id'}] * BULK_DESTINATION_LIMIT},
+                                      -(-emails // BULK_DESTINATION_LIMIT),
+                                      lambda sender: sender.send_bulk_templated_email(email_bodies)),
+        'send_appconfig_email': ('send_email', {'MessageId': 'id'}, emails,
+                                 lambda sender: [sender.send_appconfig_email(appconfig_result)
+                                                 for _ in range(emails)]),
+    }
+    for style, (method, response, calls, run) in styles.items():
+        senders = [stubbed_sender(method, response, calls) for _ in range(repeat)]
+        timing = measure(lambda: run(senders.pop()), repeat)
+        timing['emails_per_s'] = emails / timing['median_s']
+        results['sender.%s.%d' % (style, emails)] = timing
+
+
+def bench_formatter(results, quick, repeat):
+    for rows in (10, 1000, 10000) if quick else (10, 1000, 10000, 100000):
+        error_message = {"This sheet %dth row has error" % row: ["Ship Option ID is not null",
+                                                                 "Ship Option Name is not null"]
+                         for row in range(2, rows + 2)}
+        appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.VERIFY_ERROR.value,
+                                           error_message, "shipoption/test1.json")
+        results['formatter.error_message.%d' % rows] = measure(lambda: MessageFormat(appconfig_result).render(),
+                                                               repeat)
+
+
+def ship_option(ship_id, max_days):
+    return {"shipOptionID": ship_id, "shipOptionName": "Option %d" % ship_id,
+            "shipOptionMinTransitTimeasDays": 1, "shipOptionMaxTransitTimeasDays": max_days}
+
+
+def bench_merge(results, quick, repeat):
+    for size in (1000, 10000) if quick else (1000, 10000, 100000):
+        config_json = [ship_option(ship_id, 3) for ship_id in range(size)]
+        for change_ratio in (0.0, 0.1, 1.0):
+            changed = int(size * change_ratio)
+            list_obj = [ship_option(ship_id, 5 if ship_id < changed else 3) for ship_id in range(size)]
+            convert = ApConfigJsonConvert(list_obj, "profile_id")
+            results['merge.%d.changed_%d%%' % (size, change_ratio * 100)] = measure(
+                lambda: convert.merge(config_json), repeat)
+
+
+def import_time(module):
+    """
+    :return: float: the cumulative seconds python -X importtime reports for importing module in a fresh interpreter
+    """
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stderr
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    raise ValueError("%s not found in the importtime output" % module)
+
+
+def bench_import(results, quick, repeat):
+    for module in ("send_email.send_email_common", "send_email.json_convert_appconfig", "send_email.client_pool"):
+        timings = [import_time(module) for _ in range(repeat)]
+        results['import.%s' % module] = {'median_s': statistics.median(timings), 'min_s': min(timings),
+                                         'repeat': repeat}
+
+
+def load_baseline(path):
+    """
+    :return: dict: mode -> report, the mode being 'full' or 'quick'
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+    if 'results' in baseline:
+        # a single report, as written before the quick results were kept apart
+        return {'quick' if baseline['meta'].get('quick') else 'full': baseline}
+    return baseline
+
+
+def compare(results, baseline, tolerance):
+    """
+    :param results: dict: name -> timing of this run
+    :param baseline: dict: name -> timing of the baseline run with the same sizes
+    :param tolerance: the allowed slowdown of the median, 1.0 means twice the baseline median
+    :return: list: the benchmarks slower than the baseline by more than the tolerance
+    """
+    regressions = []
+    for name, timing in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print("%-48s %10.6fs  no baseline" % (name, timing['median_s']))
+            continue
+        ratio = timing['median_s'] / base['median_s']
+        status = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        print("%-48s %10.6fs  baseline %10.6fs  x%.2f  %s" % (name, timing['median_s'], base['median_s'], ratio,
+                                                               status))
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    parser.add_argument("--repeat", type=int, default=None, help="runs per benchmark")
+    parser.add_argument("--only", choices=("sender", "formatter", "merge", "import"), action="append",
+                        help="run only these groups")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE, help="the baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.0,
+                        help="allowed slowdown of the median against the baseline, 1.0 means 100%%")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    repeat = args.repeat or (5 if args.quick else 7)
+    groups = {'sender': bench_sender, 'formatter': bench_formatter, 'merge': bench_merge, 'import': bench_import}
+    results = {}
+    for group, bench in groups.items():
+        if not args.only or group in args.only:
+            bench(results, args.quick, repeat)
+
+    report = {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'quick': args.quick,
+                 'repeat': repeat},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    mode = 'quick' if args.quick else 'full'
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        if args.only and mode in baseline:
+            # keep the groups that did not run
+            report['results'] = dict(baseline[mode]['results'], **results)
+        baseline[mode] = report
+        with open(args.baseline, "w") as output:
+            json.dump(baseline, output, indent=2, sort_keys=True)
+        print("%s baseline written to %s" % (mode, args.baseline))
+        return 0
+
+    if mode not in baseline:
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return 0
+    regressions = compare(results, baseline[mode]['results'], args.tolerance)
+    if regressions:
+        print("%d benchmarks regressed: %s" % (len(regressions), ", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
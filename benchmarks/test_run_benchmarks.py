@@ -0,0 +1,44 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.run_benchmarks import compare, load_baseline
+
+
+def timing(median_s):
+    return {'median_s': median_s, 'min_s': median_s, 'repeat': 5}
+
+
+class TestRunBenchmarks(unittest.TestCase):
+
+    def test_compare(self):
+        results = {'merge.1000': timing(0.3), 'merge.10000': timing(0.5), 'sender.send_email.50': timing(1.0)}
+        baseline = {'merge.1000': timing(0.1), 'merge.10000': timing(0.4)}
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(compare(results, baseline, 1.0), ['merge.1000'])
+            self.assertEqual(compare(results, baseline, 2.5), [])
+            self.assertEqual(compare(results, baseline, 0.2), ['merge.1000', 'merge.10000'])
+        self.assertIn("sender.send_email.50", output.getvalue())
+        self.assertIn("no baseline", output.getvalue())
+
+    def test_load_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            self.assertEqual(load_baseline(path), {})
+
+            report = {'meta': {'quick': True}, 'results': {'merge.1000': timing(0.1)}}
+            with open(path, "w") as baseline_file:
+                json.dump(report, baseline_file)
+            self.assertEqual(load_baseline(path), {'quick': report})
+
+            with open(path, "w") as baseline_file:
+                json.dump({'full': report}, baseline_file)
+            self.assertEqual(load_baseline(path), {'full': report})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,45 @@
+import json
+
+from .appconfig_state_enum import AppconfigState
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_decoder = json.JSONDecoder()
+_STATES = {state.value: state for state in AppconfigState}
+
+
 class AppConfigResult:
+    __slots__ = ('version', 'application_id', 'profile_name', 'profile_id', '_state', 'error_message', 'key')
 
     def __init__(self, version, application_id, profile_name, profile_id, state, error_message, key):
         self.version = version
         self.application_id = application_id
         self.profile_name = profile_name
         self.profile_id = profile_id
-        # 'COMPLETE'|'ROLLED_BACK' 'VERIFY_ERROR' 'ERROR'
         self.state = state
         self.error_message = error_message
         self.key = key
 
+    @property
+    def state(self):
+        """
+        :return: the state as a string, such as 'COMPLETE'
+        """
+        return self._state.value if isinstance(self._state, AppconfigState) else self._state
+
+    @state.setter
+    def state(self, state):
+        # states outside AppconfigState, such as 'BAKING' or 'DEPLOYING', are kept as plain strings
+        if not isinstance(state, AppconfigState):
+            state = _STATES.get(state, state)
+        self._state = state
+
+    @property
+    def appconfig_state(self):
+        """
+        :return: the state as an AppconfigState, None for a state outside AppconfigState
+        """
+        return self._state if isinstance(self._state, AppconfigState) else None
+
     def convert2json(self):
         return {
             'version': self.version,
@@ -21,7 +51,45 @@ class AppConfigResult:
             'key': self.key
         }
 
+    def to_json(self):
+        """
+        :return: the same JSON string as json.dumps(result, default=AppConfigResult.convert2json)
+        """
+        return json.dumps(self.convert2json())
+
+    @classmethod
+    def from_json(cls, json_dict):
+        return cls(json_dict['version'], json_dict['application_id'], json_dict['profile_name'],
+                   json_dict['profile_id'], json_dict['state'], json_dict['error_message'], json_dict['key'])
+
+    def _fields(self):
+        return (self.version, self.application_id, self.profile_name, self.profile_id, self.state,
+                self.error_message, self.key)
+
+    def to_bytes(self):
+        """
+        :return: the compact positional encoding of the result, read back by from_bytes
+        """
+        return _encoder.encode(self._fields()).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(*_decoder.decode(data.decode('utf-8')))
+
+    @staticmethod
+    def encode_batch(results):
+        """
+        Encodes many results in one call.
+        :return: bytes read back by decode_batch
+        """
+        return _encoder.encode([result._fields() for result in results]).encode('utf-8')
+
+    @classmethod
+    def decode_batch(cls, data):
+        return [cls(*fields) for fields in _decoder.decode(data.decode('utf-8'))]
+
     def __str__(self) -> str:
-        return {'key': self.key, 'state': self.state, 'error_message': self.error_message,
-                'profile_id': self.profile_id, 'profile_name': self.profile_name,
-                'application_id': self.application_id, 'version': self.version}.__str__()
+        return "{'key': %r, 'state': %r, 'error_message': %r, 'profile_id': %r, 'profile_name': %r, " \
+               "'application_id': %r, 'version': %r}" % (self.key, self.state, self.error_message,
+                                                         self.profile_id, self.profile_name, self.application_id,
+                                                         self.version)
@@ -0,0 +1,44 @@
+import json
+import unittest
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+
+
+def appconfig_result():
+    return AppConfigResult(3, "12", "名称", "12345", AppconfigState.VERIFY_ERROR.value,
+                           {'This sheet 2th row has error': ['Ship Option ID is not null']}, "shipoption/test1.json")
+
+
+class TestAppConfigResult(unittest.TestCase):
+
+    def test_state(self):
+        result = appconfig_result()
+        self.assertEqual(result.state, "VERIFY_ERROR")
+        self.assertIs(result.appconfig_state, AppconfigState.VERIFY_ERROR)
+        result.state = AppconfigState.COMPLETE
+        self.assertEqual(result.state, "COMPLETE")
+        result.state = "DEPLOYING"
+        self.assertEqual(result.state, "DEPLOYING")
+        self.assertIsNone(result.appconfig_state)
+        self.assertEqual(AppConfigResult.from_bytes(result.to_bytes()).state, "DEPLOYING")
+        self.assertIn("'state': 'DEPLOYING'", str(result))
+        self.assertRaises(AttributeError, setattr, result, "other", 1)
+
+    def test_serialization(self):
+        result = appconfig_result()
+        self.assertEqual(result.to_json(), json.dumps(result, default=AppConfigResult.convert2json))
+        self.assertEqual(str(result), {'key': result.key, 'state': result.state, 'error_message': result.error_message,
+                                       'profile_id': result.profile_id, 'profile_name': result.profile_name,
+                                       'application_id': result.application_id, 'version': result.version}.__str__())
+
+        decoded = AppConfigResult.from_bytes(result.to_bytes())
+        self.assertEqual(decoded.convert2json(), result.convert2json())
+        self.assertEqual(AppConfigResult.from_json(result.convert2json()).convert2json(), result.convert2json())
+
+        decoded = AppConfigResult.decode_batch(AppConfigResult.encode_batch([result, result]))
+        self.assertEqual([each.convert2json() for each in decoded], [result.convert2json()] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import functools
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from send_email.send_email_common import SesMailSender
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSesMailSender:
+    """Awaitable counterpart of SesMailSender with bounded concurrency."""
+
+    def __init__(self, sender=None, max_concurrency=64):
+        """
+        :param sender: The SesMailSender doing the actual sends, a new one if None.
+        :param max_concurrency: The maximum number of sends in flight at the same time.
+        """
+        self.sender = sender if sender is not None else SesMailSender()
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ses-async")
+        # asyncio.Semaphore binds to the loop it is first awaited in, so every loop gets its own
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def send_email(self, email_body):
+        """
+        Sends an email, see SesMailSender.send_email.
+
+        :param email_body:
+        :return: The ID of the message, assigned by Amazon SES.
+        """
+        return await self._run(self.sender.send_email, email_body)
+
+    async def send_templated_email(self, email_body):
+        """
+        Sends an email based on a template, see SesMailSender.send_templated_email.
+
+        :param email_body:
+        :return: The ID of the message, assigned by Amazon SES.
+        """
+        return await self._run(self.sender.send_templated_email, email_body)
+
+    async def send_appconfig_email(self, message):
+        """
+        Sends an email according to the response information of AppConfig Deploy,
+        see SesMailSender.send_appconfig_email.
+
+        :param message:
+        :return: The ID of the message, assigned by Amazon SES.
+        """
+        return await self._run(self.sender.send_appconfig_email, message)
+
+    async def send_appconfig_templated_email(self, message):
+        """
+        Sends a templated email according to the response information of AppConfig Deploy,
+        see SesMailSender.send_appconfig_templated_email.
+
+        :param message:
+        :return: The ID of the message, assigned by Amazon SES.
+        """
+        return await self._run(self.sender.send_appconfig_templated_email, message)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        async with semaphore:
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    def close(self):
+        """
+        Releases the worker threads once the in-flight sends are done.
+        """
+        self.executor.shutdown(wait=True)
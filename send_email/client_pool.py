@@ -0,0 +1,79 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_client_config = {
+    'max_pool_connections': 10,
+    'tcp_keepalive': True,
+}
+# The botocore retry options of the clients called through a ResilientCaller, which retries on its own.
+_no_retries = {'total_max_attempts': 1}
+_generation = 0
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def configure(**config):
+    """
+    Sets the botocore Config options of the pooled clients, such as
+    max_pool_connections, tcp_keepalive, connect_timeout or read_timeout.
+    Clients already created are replaced on their next get_client.
+
+    :param config: botocore Config keyword arguments.
+    """
+    global _generation
+    with _lock:
+        _client_config.update(config)
+        _generation += 1
+
+
+def get_client(service_name, region_name=None, retry=True):
+    """
+    Gets the boto3 client of a service for the current thread, creating it on first use.
+    Each thread has its own boto3 session, so the clients and their HTTP connection
+    pools are reused by all later calls of that thread.
+
+    :param service_name: The AWS service name, such as 'ses' or 'appconfigdata'.
+    :param region_name: The AWS region, the default region if None.
+    :param retry: Whether botocore retries the failed calls; False for a client called
+                  through a ResilientCaller, so the attempts of both are not multiplied.
+    :return: A boto3 client.
+    """
+    clients = getattr(_local, 'clients', None)
+    if clients is None or _local.generation != _generation:
+        clients = _local.clients = {}
+        _local.generation = _generation
+    client = clients.get((service_name, region_name, retry))
+    if client is None:
+        import boto3
+        from botocore.config import Config
+
+        session = getattr(_local, 'session', None)
+        if session is None:
+            session = _local.session = boto3.session.Session()
+        with _lock:
+            config = Config(**_client_config) if retry else Config(**dict(_client_config, retries=_no_retries))
+        client = session.client(service_name, region_name=region_name, config=config)
+        clients[(service_name, region_name, retry)] = client
+        logger.debug("Created %s client for thread %s.", service_name, threading.current_thread().name)
+    return client
+
+
+def __getattr__(name):
+    # ClientError is imported from botocore on first use and bound to the module, so except clauses
+    # can name client_pool.ClientError without importing botocore before the first AWS call.
+    if name == 'ClientError':
+        from botocore.exceptions import ClientError
+        globals()['ClientError'] = ClientError
+        return ClientError
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def reset():
+    """
+    Drops the pooled clients of all threads, so the next get_client creates new ones.
+    """
+    global _generation
+    with _lock:
+        _generation += 1
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# The SQLite store evicts old fingerprints once every this many puts rather than on each put.
+EVICT_EVERY_PUTS = 100
+
+
+def result_fingerprint(message):
+    """
+    Fingerprints an AppConfig Deploy result by its key, version, state and error message,
+    so a retried event for the same deploy maps to the same notification.
+
+    :param message: the response information of AppConfig Deploy.
+    :return: str: the hex fingerprint
+    """
+    error_hash = hashlib.sha256(json.dumps(message.error_message, sort_keys=True, default=str).encode('utf-8'))
+    identity = json.dumps([message.key, message.version, message.state, error_hash.hexdigest()], default=str)
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+class MemoryDedupStore:
+    """A bounded in-process LRU store of the sent message IDs."""
+
+    def __init__(self, max_size=10000):
+        """
+        :param max_size: The number of fingerprints kept, the least recently used are evicted first.
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint, now):
+        """
+        :return: The message ID stored for the fingerprint, None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[fingerprint]
+                return None
+            self._entries.move_to_end(fingerprint)
+            return entry[0]
+
+    def put(self, fingerprint, message_id, expires_at, now):
+        with self._lock:
+            self._entries[fingerprint] = (message_id, expires_at)
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class SqliteDedupStore:
+    """A store of the sent message IDs in a local SQLite file, shared by several worker processes."""
+
+    def __init__(self, path, max_size=100000):
+        """
+        :param path: The SQLite database file.
+        :param max_size: The number of fingerprints kept, the least recently used are evicted first.
+        """
+        self.path = path
+        self.max_size = max_size
+        self._puts = 0
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS sent_message ("
+            "fingerprint TEXT PRIMARY KEY, message_id TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, fingerprint, now):
+        """
+        :return: The message ID stored for the fingerprint, None if missing or expired.
+        """
+        connection = self._connection()
+        row = connection.execute("SELECT message_id, expires_at FROM sent_message WHERE fingerprint = ?",
+                                 (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            connection.execute("DELETE FROM sent_message WHERE fingerprint = ? AND expires_at <= ?",
+                               (fingerprint, now))
+            return None
+        connection.execute("UPDATE sent_message SET used_at = ? WHERE fingerprint = ?", (now, fingerprint))
+        return row[0]
+
+    def put(self, fingerprint, message_id, expires_at, now):
+        connection = self._connection()
+        connection.execute("INSERT OR REPLACE INTO sent_message VALUES (?, ?, ?, ?)",
+                           (fingerprint, message_id, expires_at, now))
+        self._puts += 1
+        if self._puts % EVICT_EVERY_PUTS == 0:
+            self.evict(now)
+
+    def evict(self, now):
+        """
+        Deletes the expired fingerprints and the least recently used ones beyond max_size.
+        """
+        connection = self._connection()
+        connection.execute("DELETE FROM sent_message WHERE expires_at <= ?", (now,))
+        connection.execute(
+            "DELETE FROM sent_message WHERE fingerprint IN (SELECT fingerprint FROM sent_message "
+            "ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_size,))
+
+
+class SendDedupCache:
+    """Remembers the message sent for each AppConfig Deploy result, so retries return the original message ID."""
+
+    def __init__(self, store=None, ttl_seconds=24 * 3600, clock=time.time):
+        """
+        :param store: The MemoryDedupStore or SqliteDedupStore holding the message IDs,
+                      a new MemoryDedupStore if None.
+        :param ttl_seconds: The seconds a sent message is remembered.
+        :param clock: The wall clock used for the expiry, shared by all processes using the store.
+        """
+        self.store = store if store is not None else MemoryDedupStore()
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+    def lookup(self, message):
+        """
+        :param message: the response information of AppConfig Deploy.
+        :return: The ID of the message already sent for the result, None if it was not sent.
+        """
+        return self.store.get(result_fingerprint(message), self.clock())
+
+    def remember(self, message, message_id):
+        """
+        :param message: the response information of AppConfig Deploy.
+        :param message_id: The ID of the message sent for it, ignored if None.
+        """
+        if message_id is not None:
+            now = self.clock()
+            self.store.put(result_fingerprint(message), message_id, now + self.ttl_seconds, now)
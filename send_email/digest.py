@@ -0,0 +1,156 @@
+import atexit
+import logging
+import os
+import threading
+import time
+import traceback
+
+from entity.appconfig_state_enum import AppconfigState
+from send_email.send_email_common import EmailBody, MessageFormat
+
+logger = logging.getLogger(__name__)
+
+
+class DigestAggregator:
+    """
+    Buffers AppConfig Deploy results and sends one digest email per state and destination
+    when the window of the group closes, instead of one email per result.
+    """
+
+    def __init__(self, sender, window_seconds=60.0, max_count=100, background=True, clock=time.monotonic):
+        """
+        :param sender: The SesMailSender sending the digests.
+        :param window_seconds: The seconds a group buffers results after its first result.
+        :param max_count: The number of results that closes the window of a group early.
+        :param background: Whether a daemon thread flushes the groups whose window closed;
+                           otherwise they are flushed by the next add or flush_expired call.
+        :param clock: The monotonic clock measuring the windows.
+        """
+        self.sender = sender
+        self.window_seconds = window_seconds
+        self.max_count = max_count
+        self.clock = clock
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="appconfig-digest", daemon=True)
+            self._thread.start()
+
+    def add(self, message, destination=None):
+        """
+        Buffers a result in the group of its state and destination.
+
+        :param message: the response information of AppConfig Deploy.
+        :param destination: The destination email accounts, EMAIL_DESTINATION if None.
+        """
+        if destination is None:
+            destination = os.getenv("EMAIL_DESTINATION")
+        group_key = (message.state, destination)
+        with self._lock:
+            group = self._groups.get(group_key)
+            if group is None:
+                group = self._groups[group_key] = _DigestGroup(self.clock())
+            group.results.append(message)
+            full = len(group.results) >= self.max_count
+            if full:
+                del self._groups[group_key]
+        if full:
+            self._send(group_key, group.results)
+        self.flush_expired()
+
+    def flush_expired(self):
+        """
+        Sends the digests of the groups whose window closed.
+
+        :return: The IDs of the sent messages.
+        """
+        now = self.clock()
+        return self._flush(lambda group: now - group.started >= self.window_seconds)
+
+    def flush(self):
+        """
+        Sends the digests of all buffered groups.
+
+        :return: The IDs of the sent messages.
+        """
+        return self._flush(lambda group: True)
+
+    def close(self):
+        """
+        Stops the background thread and sends the buffered digests.
+
+        :return: The IDs of the sent messages.
+        """
+        self._closed.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.flush()
+
+    def install_shutdown_hook(self):
+        """
+        Flushes the buffered digests when the interpreter exits.
+        """
+        atexit.register(self.close)
+
+    def _flush(self, due):
+        with self._lock:
+            flushed = [(group_key, group) for group_key, group in self._groups.items() if due(group)]
+            for group_key, _ in flushed:
+                del self._groups[group_key]
+        return [self._send(group_key, group.results) for group_key, group in flushed]
+
+    def _run(self):
+        interval = min(self.window_seconds, 1.0)
+        while not self._closed.wait(interval):
+            self.flush_expired()
+
+    def _send(self, group_key, results):
+        state, destination = group_key
+        email_body = EmailBody(source=os.getenv("EMAIL_SOURCE"), destination=destination)
+        try:
+            email_body.subject, email_body.text, email_body.html = DigestMessageFormat(state, results).render()
+            return self.sender.send_email(email_body)
+        except Exception as exception:
+            logger.error("send appconfig digest email fail.")
+            traceback.print_exc()
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class _DigestGroup:
+
+    def __init__(self, started):
+        self.started = started
+        self.results = []
+
+
+class DigestMessageFormat:
+    """Digest format output text and html of several results with the same state."""
+
+    def __init__(self, state, results):
+        """
+        :param state: the state shared by the results, such as 'COMPLETE'.
+        :param results: the response information of several AppConfig Deploys.
+        """
+        self.state = state
+        self.results = results
+
+    def render(self):
+        """
+        :return: tuple: the subject, the text body and the HTML body
+        """
+        if self.state == AppconfigState.VERIFY_ERROR.value:
+            subject = "Appconfig deploy error digest: %d notifications." % len(self.results)
+        else:
+            subject = "Appconfig deploy %s digest: %d notifications." % (self.state, len(self.results))
+        bodies = [MessageFormat(result).render()[1:] for result in self.results]
+        text = "\r\n".join(body[0] for body in bodies)
+        html = "<hr>".join(body[1] for body in bodies)
+        return subject, text, html
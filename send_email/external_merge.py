@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+import heapq
+import json
+import logging
+import os
+import tempfile
+
+from send_email.json_stream import JsonArrayWriter
+from send_email.merge_index import KEY_FIELD, fingerprint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+DEFAULT_PARTITIONS = 16
+# The number of sorted runs merged at once, each holding an open file and its read buffer.
+DEFAULT_MAX_FAN_IN = 64
+_RUN_BUFFER = 64 * 1024
+# A parsed record takes about 2.3 times its spilled JSON bytes plus 500 bytes of dict, list and fingerprint
+# overhead, as measured with tracemalloc on ship option records; both are rounded up.
+_BYTES_FACTOR = 2.5
+_RECORD_OVERHEAD = 512
+# A partition still above the budget after this many splits, e.g. one huge item, is merged in memory.
+MAX_SPLIT_DEPTH = 4
+# The output groups: deployed keys keep their deployed position, new keys follow in upload order.
+_DEPLOYED = 0
+_ADDED = 1
+
+
+class ExternalMerge:
+    """
+    Merge the incremental data into deployed data larger than memory. Both sides are spilled
+    to temporary files partitioned by the hash of the key, each partition is merged in memory
+    on its own and the sorted partition outputs are merged back, max_fan_in files at a time,
+    into the order of MergeIndex: the deployed keys in deployed order, then the new keys in
+    the order they were uploaded.
+    """
+
+    def __init__(self, key_field=KEY_FIELD, memory_budget=DEFAULT_MEMORY_BUDGET, partitions=DEFAULT_PARTITIONS,
+                 spill_dir=None, max_fan_in=DEFAULT_MAX_FAN_IN):
+        """
+        :param key_field:the field identifying an item
+        :param memory_budget:the bytes a partition may take once parsed in memory, estimated from its spilled
+                             bytes and records; larger partitions are split
+        :param partitions:the number of partitions of each split
+        :param spill_dir:the directory of the temporary spill files, the system temporary directory if None
+        :param max_fan_in:the number of sorted runs merged at once, more runs are merged in several passes
+        """
+        if max_fan_in < 2:
+            raise ValueError("max_fan_in must be at least 2")
+        self.key_field = key_field
+        self.memory_budget = memory_budget
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.max_fan_in = max_fan_in
+
+    def merge(self, config_items, list_obj, fp):
+        """
+         Merge and write the merged data to fp as a JSON array
+        :param config_items:iterable of the deployed json items
+        :param list_obj:iterable of the newly uploaded incremental data items
+        :param fp:file-like object opened for writing, in binary or text mode
+        :return: int:the number of changes, counted like MergeIndex.merge
+        """
+        with tempfile.TemporaryDirectory(prefix="appconfig-merge-", dir=self.spill_dir) as directory:
+            deployed_partitions = self._partition(enumerate(config_items), directory, 0)
+            upload_partitions = self._partition(enumerate(list_obj), directory, 0)
+            runs = []
+            change_num = 0
+            for deployed, upload in zip(deployed_partitions, upload_partitions):
+                change_num += self._merge_partition(deployed, upload, directory, runs, 0)
+            logger.info("merged %s partitions with %s changes", len(runs), change_num)
+            runs = self._merge_runs(runs, directory)
+            with JsonArrayWriter(fp) as writer:
+                for _, _, item in heapq.merge(*[_read_records(path, _RUN_BUFFER) for path in runs],
+                                              key=_position):
+                    writer.write(item)
+        return change_num
+
+    def _partition(self, records, directory, depth):
+        """
+        :param records:iterable of the [sequence number, item] records to spill
+        :return: list:the (path, number of records) of the partition files
+        """
+        paths = []
+        counts = [0] * self.partitions
+        files = []
+        try:
+            for _ in range(self.partitions):
+                fd, path = tempfile.mkstemp(dir=directory, suffix=".spill")
+                paths.append(path)
+                files.append(open(fd, 'w', encoding='utf-8', buffering=1024 * 1024))
+            for seq, item in records:
+                record = json.dumps([seq, item], ensure_ascii=False, separators=(',', ':'))
+                partition = hash((depth, item[self.key_field])) % self.partitions
+                files[partition].write(record + "\n")
+                counts[partition] += 1
+        finally:
+            for file in files:
+                file.close()
+        return list(zip(paths, counts))
+
+    def _merge_partition(self, deployed, upload, directory, runs, depth):
+        """
+         Merge one partition in memory and write its records sorted by output position, splitting
+         the partition first when its estimated in-memory size exceeds the memory budget
+        :param deployed:the (path, number of records) of the deployed partition
+        :param upload:the (path, number of records) of the upload partition
+        :return: int:the number of changes of the partition
+        """
+        (deployed_path, deployed_count), (upload_path, upload_count) = deployed, upload
+        size = os.path.getsize(deployed_path) + os.path.getsize(upload_path)
+        if _estimated_memory(size, deployed_count + upload_count) > self.memory_budget and depth < MAX_SPLIT_DEPTH:
+            deployed_partitions = self._partition(_read_records(deployed_path), directory, depth + 1)
+            upload_partitions = self._partition(_read_records(upload_path), directory, depth + 1)
+            os.unlink(deployed_path)
+            os.unlink(upload_path)
+            return sum(self._merge_partition(deployed, upload, directory, runs, depth + 1)
+                       for deployed, upload in zip(deployed_partitions, upload_partitions))
+
+        merged = {}
+        fingerprints = {}
+        for seq, item in _read_records(deployed_path):
+            key = item[self.key_field]
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [_DEPLOYED, seq, item]
+            else:
+                entry[2] = item
+            fingerprints[key] = fingerprint(item)
+        change_num = 0
+        for seq, item in _read_records(upload_path):
+            key = item[self.key_field]
+            item_fingerprint = fingerprint(item)
+            if fingerprints.get(key) == item_fingerprint:
+                continue
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [_ADDED, seq, item]
+            else:
+                entry[2] = item
+            fingerprints[key] = item_fingerprint
+            change_num += 1
+        os.unlink(deployed_path)
+        os.unlink(upload_path)
+
+        runs.append(_write_run(sorted(merged.values(), key=_position), directory))
+        return change_num
+
+    def _merge_runs(self, runs, directory):
+        """
+         Merge the sorted runs max_fan_in at a time into longer runs until at most max_fan_in are left,
+         so no more than max_fan_in run files are open at once
+        :return: list:the paths of the remaining runs
+        """
+        while len(runs) > self.max_fan_in:
+            merged_runs = []
+            for start in range(0, len(runs), self.max_fan_in):
+                group = runs[start:start + self.max_fan_in]
+                if len(group) == 1:
+                    merged_runs.extend(group)
+                    continue
+                merged_runs.append(_write_run(heapq.merge(*[_read_records(path, _RUN_BUFFER) for path in group],
+                                                          key=_position), directory))
+                for path in group:
+                    os.unlink(path)
+            logger.info("merged %s runs into %s", len(runs), len(merged_runs))
+            runs = merged_runs
+        return runs
+
+
+def _position(record):
+    return record[0], record[1]
+
+
+def _estimated_memory(size, records):
+    return size * _BYTES_FACTOR + records * _RECORD_OVERHEAD
+
+
+def _write_run(records, directory):
+    """
+    :param records:iterable of the records sorted by output position
+    :return: the path of the run file
+    """
+    fd, run_path = tempfile.mkstemp(dir=directory, suffix=".run")
+    with open(fd, 'w', encoding='utf-8', buffering=1024 * 1024) as run:
+        for record in records:
+            run.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+    return run_path
+
+
+def _read_records(path, buffering=1024 * 1024):
+    with open(path, encoding='utf-8', buffering=buffering) as file:
+        for line in file:
+            yield json.loads(line)
@@ -0,0 +1,139 @@
+import contextlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# The number of most recent samples each histogram keeps for its percentiles.
+RESERVOIR_SIZE = 4096
+
+_NOOP_SPAN = contextlib.nullcontext()
+_enabled = False
+_exporter = None
+_histograms = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Latency histogram of a span: count, total and max of all samples, percentiles of the recent ones."""
+
+    def __init__(self, reservoir_size=RESERVOIR_SIZE):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = [0.0] * reservoir_size
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples[self.count % len(self._samples)] = seconds
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, percent):
+        """
+        :param percent: The percentile, between 0 and 100.
+        :return: The latency in seconds below which percent of the recent samples fall.
+        """
+        with self._lock:
+            samples = sorted(self._samples[:min(self.count, len(self._samples))])
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def summary(self):
+        """
+        :return: dict: the count, mean, max, p50, p95 and p99 in seconds
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99)
+        }
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        record(self.name, time.perf_counter() - self.start)
+
+
+def enable(exporter=None):
+    """
+    Starts timing the spans.
+
+    :param exporter: A callable receiving (span name, seconds) for every finished span, e.g. to
+                     forward it to a metrics backend; None to only keep the in-process histograms.
+    """
+    global _enabled, _exporter
+    _exporter = exporter
+    _enabled = True
+
+
+def disable():
+    """
+    Stops timing the spans, span() returns a shared no-op context manager again.
+    """
+    global _enabled, _exporter
+    _enabled = False
+    _exporter = None
+
+
+def span(name):
+    """
+    Times the block of a with statement when instrumentation is enabled.
+
+    :param name: The span name, such as 'convert_and_merge.get_config'.
+    :return: A context manager.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+def record(name, seconds):
+    """
+    Records a latency in the histogram of the span and passes it to the exporter.
+    """
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(name, Histogram())
+    histogram.record(seconds)
+    exporter = _exporter
+    if exporter is not None:
+        try:
+            exporter(name, seconds)
+        except Exception:
+            logger.exception("Instrumentation exporter failed for %s.", name)
+
+
+def snapshot():
+    """
+    :return: dict: span name -> histogram summary
+    """
+    with _lock:
+        histograms = dict(_histograms)
+    return {name: histogram.summary() for name, histogram in histograms.items()}
+
+
+def reset():
+    """
+    Drops the recorded histograms.
+    """
+    with _lock:
+        _histograms.clear()
@@ -1,92 +1,380 @@
 #!/usr/bin/python3
+import asyncio
 import json
 import logging
 import os
+import tempfile
+import threading
+import time
 import traceback
 
-import boto3
-import botocore
-import json_tools
+from send_email import client_pool, instrumentation
+from send_email.external_merge import DEFAULT_MEMORY_BUDGET, ExternalMerge
+from send_email.json_stream import JsonArrayWriter, iter_json_array, load_json
+from send_email.merge_index import KEY_FIELD, ChangeSet, MergeIndex, fingerprint
 
 logger = logging.getLogger(__name__)
 
+MIN_POLL_INTERVAL_SECONDS = 15
+
 
 class ApConfigJsonConvert:
     """Merge the newly uploaded incremental data into the deployed version of AppConfig"""
 
-    def __init__(self, list_obj, profile_id):
+    def __init__(self, list_obj, profile_id, session_cache=None, resilience=None, snapshot_store=None):
         """
-        :param list_obj:the newly uploaded incremental data
+        :param list_obj:the newly uploaded incremental data, an iterable of items or a
+                        file-like object holding a JSON array, which is parsed item by item
         :param profile_id:AppConfig profile id
+        :param session_cache:ConfigSessionCache reusing the configuration session between calls
+        :param resilience:ResilientCaller retrying the throttled and failed AppConfig calls behind a circuit breaker
+        :param snapshot_store:SnapshotStore whose local copy of the deployed version replaces the download,
+                              saved after downloading a version it does not hold
         """
         self.list_obj = list_obj
         self.profile_id = profile_id
+        self.session_cache = session_cache
+        self.resilience = resilience
+        self.snapshot_store = snapshot_store
 
-    def convert_and_merge(self):
+    def convert_and_merge(self, details=None, change_set=False):
         """
-         JSON data comparison and return the merged data
-        :return: list:the merged data
+         JSON data comparison and return the merged data.
+         With a snapshot store, the deployed version is checked before using the snapshot, and on a
+         miss checked again after the download before saving it, so a miss costs two deployed
+         version lookups; the second one cannot reuse the first, it detects a deployment made
+         during the download.
+        :param details:dict filled with key -> field-level diff of every changed item, only computed when given
+        :param change_set:return a ChangeSet holding the merged data instead of the merged data only
+        :return: list:the merged data, or ChangeSet if change_set is True
         """
-        cache_dict = {}
-        config_json = self.get_config()
+        with instrumentation.span('convert_and_merge'):
+            version = self.get_deployed_version()
+            if version is not None:
+                snapshot = self.snapshot_store.load(self.profile_id, version)
+                if snapshot is not None:
+                    return self._merge(snapshot.merge_index(), lambda: snapshot.config_json, details, change_set)
+            with instrumentation.span('convert_and_merge.get_config'):
+                config_json = self.get_config()
+            if version is not None:
+                self.save_snapshot(version, config_json)
+            return self.merge(config_json, details, change_set)
 
-        if config_json:
-            for each_data in config_json:
-                cache_dict[each_data["shipOptionID"]] = each_data
+    def get_deployed_version(self):
+        """
+        :return: the configuration version deployed to the environment, None without a snapshot store or if unknown
+        """
+        if self.snapshot_store is None:
+            return None
+        with instrumentation.span('convert_and_merge.snapshot'):
+            try:
+                return self.snapshot_store.deployed_version(
+                    self.profile_id, self._call, client_pool.get_client('appconfig', retry=self.resilience is None))
+            except Exception:
+                logger.exception("check the deployed version of %s fail", self.profile_id)
+                return None
 
-        change_num = 0
-        for item in self.list_obj:
-            ship_id = item["shipOptionID"]
-            if ship_id in cache_dict:
-                diff_ret = json_tools.diff(item, cache_dict[ship_id])
-                if diff_ret:
-                    cache_dict[ship_id] = item
-                    change_num += 1
+    def save_snapshot(self, version, config_json):
+        """
+         Store the downloaded config as the snapshot of version, unless another version was deployed
+         while it was downloaded, as the download may then hold either of them
+        :param version:the deployed version checked before the download
+        :param config_json:the downloaded json data
+        """
+        if not isinstance(config_json, list) or self.get_deployed_version() != version:
+            return
+        try:
+            self.snapshot_store.save(self.profile_id, version, config_json)
+        except Exception:
+            logger.exception("save the snapshot of %s fail", self.profile_id)
 
-            else:
-                cache_dict[ship_id] = item
-                change_num += 1
+    def merge(self, config_json, details=None, change_set=False):
+        """
+         Merge the newly uploaded incremental data into the given deployed data
+        :param config_json: the deployed json data
+        :param details:dict filled with key -> field-level diff of every changed item, only computed when given
+        :param change_set:return a ChangeSet holding the merged data instead of the merged data only
+        :return: list:the merged data, or ChangeSet if change_set is True
+        """
+        with instrumentation.span('convert_and_merge.index'):
+            merge_index = MergeIndex(config_json)
+        return self._merge(merge_index, lambda: config_json, details, change_set)
+
+    def _merge(self, merge_index, config_json, details, change_set):
+        """
+        :param config_json:function returning the deployed json data, returned as it is when nothing changed
+        """
+        changes = ChangeSet() if change_set else None
+        with instrumentation.span('convert_and_merge.merge'):
+            cache_dict, change_num = merge_index.merge(self.iter_list_obj(), details, changes)
 
         if change_num == 0:
             logging.info("no change--->")
-            return config_json
+            merged = config_json()
         else:
-            list_ret = []
-            for value in cache_dict.values():
-                list_ret.append(value)
-            return list_ret
+            merged = list(cache_dict.values())
+        if changes is None:
+            return merged
+        changes.merged = merged
+        return changes
+
+    def merge_to_stream(self, fp):
+        """
+         Merge the newly uploaded incremental data into the deployed data and write the merged
+         data to fp as a JSON array. The deployed data is parsed and written item by item, so
+         memory holds the upload and the deployed keys rather than the deployed document.
+         The deployed items are first spilled to a temporary file, so a key repeated in the
+         deployed data is written once at its first position with the content of its last
+         occurrence, like convert_and_merge.
+        :param fp:file-like object opened for writing, in binary or text mode
+        :return: int:the number of changed items
+        """
+        upload = {}
+        for item in self.iter_list_obj():
+            upload[item[KEY_FIELD]] = item
+
+        change_num = 0
+        with tempfile.TemporaryFile(prefix="appconfig-deployed-") as spill, JsonArrayWriter(fp) as writer:
+            # key -> offset of the last occurrence of the key in the spill file
+            last_offsets = {}
+            for each_data in self.iter_config():
+                key = each_data[KEY_FIELD]
+                if key in last_offsets:
+                    logging.warning("deployed key %s is repeated, its last occurrence is written", key)
+                last_offsets[key] = spill.tell()
+                spill.write(json.dumps(each_data).encode() + b'\n')
+
+            spill.seek(0)
+            written = set()
+            while True:
+                offset = spill.tell()
+                line = spill.readline()
+                if not line:
+                    break
+                each_data = json.loads(line)
+                key = each_data[KEY_FIELD]
+                if key in written:
+                    continue
+                written.add(key)
+                if last_offsets[key] != offset:
+                    spill.seek(last_offsets[key])
+                    each_data = json.loads(spill.readline())
+                    spill.seek(offset + len(line))
+                item = upload.get(key)
+                if item is not None and fingerprint(item) != fingerprint(each_data):
+                    writer.write(item)
+                    change_num += 1
+                else:
+                    writer.write(each_data)
+            for key, item in upload.items():
+                if key not in last_offsets:
+                    writer.write(item)
+                    change_num += 1
+        if change_num == 0:
+            logging.info("no change--->")
+        return change_num
+
+    def merge_out_of_core(self, fp, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=None):
+        """
+         Merge the newly uploaded incremental data into deployed data larger than memory and write
+         the merged data to fp as a JSON array, in the same order as convert_and_merge. Both sides
+         are spilled to temporary files partitioned by key and merged one partition at a time.
+        :param fp:file-like object opened for writing, in binary or text mode
+        :param memory_budget:the estimated bytes a partition may take when merged in memory
+        :param spill_dir:the directory of the temporary spill files, the system temporary directory if None
+        :return: int:the number of changed items
+        """
+        with instrumentation.span('convert_and_merge.out_of_core'):
+            change_num = ExternalMerge(memory_budget=memory_budget, spill_dir=spill_dir).merge(
+                self.iter_config(), self.iter_list_obj(), fp)
+        if change_num == 0:
+            logging.info("no change--->")
+        return change_num
+
+    def iter_list_obj(self):
+        """
+        :return: iterator of the newly uploaded incremental data items
+        """
+        if hasattr(self.list_obj, 'read'):
+            return iter_json_array(self.list_obj)
+        return iter(self.list_obj)
+
+    def iter_config(self):
+        """
+        Get the latest deployed data form AppConfig item by item, parsing the configuration while it is downloaded
+        :return: iterator of the latest deployed json items
+        """
+        if self.session_cache is not None:
+            yield from self.get_config()
+            return
+        client = client_pool.get_client('appconfigdata', retry=self.resilience is None)
+        token = self._start_session(client)
+        if token is None:
+            return
+        response = self._call(client.get_latest_configuration, ConfigurationToken=token)
+        yield from iter_json_array(response['Configuration'])
 
     def get_config(self):
         """
         Get the latest deployed data form AppConfig
         :return: the latest deployed json data
         """
-        application_id = os.getenv("APP_CONFIG_APPLICATION_ID")
-        environment_id = os.getenv("APP_CONFIG_ENVIRONMENT_ID")
+        client = client_pool.get_client('appconfigdata', retry=self.resilience is None)
+        if self.session_cache is not None:
+            with self.session_cache.lock(self.profile_id):
+                return self._get_cached_config(client)
+
+        token = self._start_session(client)
+        if token is None:
+            return []
+
+        response = self._call(client.get_latest_configuration, ConfigurationToken=token)
+        config_json = load_json(response['Configuration'])
 
-        client = boto3.client('appconfigdata')
+        return [] if config_json is None else config_json
 
-        response = []
+    def _get_cached_config(self, client):
+        """
+        Get the latest deployed data through the cached configuration session of the profile.
+        Within the poll interval the cached data is returned without any call, afterwards the
+        next poll token is used and an empty configuration means the cached data is still current.
+        :return: the latest deployed json data
+        """
+        session = self.session_cache.get(self.profile_id)
+        if session is not None and self.session_cache.clock() < session.next_poll_at:
+            return session.config_json
+
+        response = None
+        if session is not None:
+            try:
+                response = self._call(client.get_latest_configuration, ConfigurationToken=session.token)
+            except client_pool.ClientError as exception:
+                if exception.response['Error']['Code'] != "BadRequestException":
+                    raise
+                logging.info("the configuration session of %s expired!", self.profile_id)
+                session = None
+        if response is None:
+            token = self._start_session(client)
+            if token is None:
+                return []
+            response = self._call(client.get_latest_configuration, ConfigurationToken=token)
+
+        config_json = load_json(response['Configuration'])
+        if config_json is None:
+            config_json = [] if session is None else session.config_json
+        self.session_cache.put(self.profile_id, ConfigSession(
+            response['NextPollConfigurationToken'], config_json,
+            self.session_cache.clock() + response.get('NextPollIntervalInSeconds', MIN_POLL_INTERVAL_SECONDS)))
+        return config_json
+
+    def _call(self, func, **kwargs):
+        if self.resilience is None:
+            return func(**kwargs)
+        return self.resilience.call(func, **kwargs)
+
+    def _start_session(self, client):
+        """
+        Start an AppConfig configuration session of the profile
+        :return: the initial configuration token, None if the profile was never deployed
+        """
+        application_id = os.getenv("APP_CONFIG_APPLICATION_ID")
+        environment_id = os.getenv("APP_CONFIG_ENVIRONMENT_ID")
         try:
-            application_id = os.getenv("APP_CONFIG_APPLICATION_ID")
-            response = client.start_configuration_session(
+            response = self._call(
+                client.start_configuration_session,
                 ApplicationIdentifier=application_id,
                 EnvironmentIdentifier=environment_id,
                 ConfigurationProfileIdentifier=self.profile_id,
-                RequiredMinimumPollIntervalInSeconds=15
+                RequiredMinimumPollIntervalInSeconds=MIN_POLL_INTERVAL_SECONDS
             )
         except Exception as exception:
             if type(exception).__name__ == "ResourceNotFoundException":
                 logging.info("the first deploy!")
-                return []
+                return None
             else:
                 raise
 
-        token = response['InitialConfigurationToken']
+        return response['InitialConfigurationToken']
 
-        response = client.get_latest_configuration(
-            ConfigurationToken=token
-        )
-        config_json = json.loads(response['Configuration'].read())
 
-        return config_json
+class ConfigSession:
+    """The AppConfig configuration session of a profile"""
+
+    def __init__(self, token, config_json, next_poll_at):
+        """
+        :param token:the token of the next get_latest_configuration call
+        :param config_json:the last decoded configuration
+        :param next_poll_at:the clock time before which AppConfig must not be polled again
+        """
+        self.token = token
+        self.config_json = config_json
+        self.next_poll_at = next_poll_at
+
+
+class ConfigSessionCache:
+    """Keep the AppConfig configuration session and the decoded configuration of each profile.
+    The cached configuration is shared between callers and must not be modified."""
+
+    def __init__(self, clock=time.monotonic):
+        """
+        :param clock:the monotonic clock used for the poll intervals
+        """
+        self.clock = clock
+        self._sessions = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, profile_id):
+        return self._sessions.get(profile_id)
+
+    def put(self, profile_id, session):
+        self._sessions[profile_id] = session
+
+    def invalidate(self, profile_id=None):
+        """
+        Drop the cached session of a profile, or of all profiles if None,
+        e.g. right after deploying a new version of it
+        """
+        if profile_id is None:
+            self._sessions.clear()
+        else:
+            self._sessions.pop(profile_id, None)
+
+    def lock(self, profile_id):
+        """
+        :return: the lock serializing the polls of a profile, a poll token can only be used once
+        """
+        with self._lock:
+            return self._locks.setdefault(profile_id, threading.Lock())
+
+
+class AsyncApConfigJsonConvert(ApConfigJsonConvert):
+    """Awaitable ApConfigJsonConvert that keeps the boto3 round trip and the merge off the event loop"""
+
+    def __init__(self, list_obj, profile_id, semaphore=None, executor=None, session_cache=None, resilience=None):
+        """
+        :param list_obj:the newly uploaded incremental data
+        :param profile_id:AppConfig profile id
+        :param session_cache:ConfigSessionCache reusing the configuration session between calls
+        :param resilience:ResilientCaller retrying the throttled and failed AppConfig calls behind a circuit breaker
+        :param semaphore:asyncio.Semaphore shared by all instances to bound the in-flight config fetches
+        :param executor:the executor running the blocking calls, the loop's default executor if None
+        """
+        super().__init__(list_obj, profile_id, session_cache, resilience)
+        self.semaphore = semaphore
+        self.executor = executor
+
+    async def convert_and_merge_async(self, details=None, change_set=False):
+        """
+         JSON data comparison and return the merged data
+        :param details:dict filled with key -> field-level diff of every changed item, only computed when given
+        :param change_set:return a ChangeSet holding the merged data instead of the merged data only
+        :return: list:the merged data, or ChangeSet if change_set is True
+        """
+        loop = asyncio.get_running_loop()
+        if self.semaphore is None:
+            config_json = await loop.run_in_executor(self.executor, self.get_config)
+        else:
+            async with self.semaphore:
+                config_json = await loop.run_in_executor(self.executor, self.get_config)
+        return await loop.run_in_executor(self.executor, self.merge, config_json, details, change_set)
@@ -0,0 +1,165 @@
+import codecs
+import io
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE):
+    """
+    Parse a JSON array from a byte or text stream item by item, so only the current
+    chunk and the current item are held in memory instead of the whole document.
+    :param stream:file-like object with read(size), returning bytes or str
+    :param chunk_size:the number of bytes or characters read at a time
+    :return: iterator of the array items
+    """
+    reader = _ChunkReader(stream, chunk_size)
+    if reader.next_char() != '[':
+        raise ValueError("the JSON document is not an array")
+    yield from _iter_array(reader)
+
+
+def load_json(stream, chunk_size=CHUNK_SIZE):
+    """
+    Decode a JSON document from a byte or text stream. An array is parsed item by item like
+    iter_json_array, so the raw document is not held in memory next to the decoded items;
+    any other document is read whole and decoded with json.loads.
+    :param stream:file-like object with read(size), returning bytes or str
+    :param chunk_size:the number of bytes or characters read at a time
+    :return: the decoded document, None if the stream is empty
+    """
+    reader = _ChunkReader(stream, chunk_size)
+    char = reader.next_char()
+    if char == '[':
+        return list(_iter_array(reader))
+    if char == '':
+        return None
+    return json.loads(reader.read_rest())
+
+
+def _iter_array(reader):
+    """
+    :param reader:_ChunkReader positioned at the '[' opening the array
+    :return: iterator of the array items
+    """
+    reader.pos += 1
+    if reader.next_char() == ']':
+        reader.pos += 1
+        reader.expect_end()
+        return
+    while True:
+        yield reader.decode_value()
+        char = reader.next_char()
+        reader.pos += 1
+        if char == ']':
+            reader.expect_end()
+            return
+        if char != ',':
+            raise ValueError("expected ',' or ']' in the JSON array, got %r" % char)
+
+
+class _ChunkReader:
+    """The text buffer of iter_json_array, refilled from the stream on demand"""
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        """
+        Read the next chunk into the buffer, dropping the consumed text
+        :param size:the number of bytes or characters to read, chunk_size if None
+        :return: bool:False at the end of the stream
+        """
+        if self.eof:
+            return False
+        chunk = self.stream.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+        if isinstance(chunk, bytes):
+            chunk = self.utf8.decode(chunk, final=self.eof)
+        self.buffer = self.buffer[self.pos:] + (chunk or '')
+        self.pos = 0
+        return True
+
+    def next_char(self):
+        """
+        Skip whitespace and return the next character, '' at the end of the stream
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def decode_value(self):
+        """
+        Decode the JSON value at the current position, reading more chunks while it is incomplete.
+        A value ending right at the end of the buffer may be cut, e.g. a number, so it is only
+        accepted once more text or the end of the stream follows it.
+        """
+        self.next_char()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # grow the reads with the value so a large value is not decoded again for every chunk
+            self.fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def read_rest(self):
+        """
+        :return: the unconsumed text and the rest of the stream, read at once
+        """
+        rest = self.stream.read()
+        if isinstance(rest, bytes):
+            rest = self.utf8.decode(rest, final=True)
+        self.eof = True
+        return self.buffer[self.pos:] + rest
+
+    def expect_end(self):
+        if self.next_char() != '':
+            raise ValueError("unexpected data after the JSON array")
+
+
+class JsonArrayWriter:
+    """Write a JSON array to a byte or text file-like object one item at a time"""
+
+    def __init__(self, fp):
+        """
+        :param fp:file-like object opened for writing, in binary or text mode
+        """
+        self.fp = fp
+        self.binary = isinstance(fp, (io.RawIOBase, io.BufferedIOBase)) or 'b' in getattr(fp, 'mode', '')
+        self.count = 0
+        self._write('[')
+
+    def write(self, item):
+        self._write((',' if self.count else '') + json.dumps(item, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        self._write(']')
+
+    def _write(self, text):
+        self.fp.write(text.encode('utf-8') if self.binary else text)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
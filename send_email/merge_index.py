@@ -0,0 +1,143 @@
+import hashlib
+import json
+
+KEY_FIELD = "shipOptionID"
+
+
+def fingerprint(item):
+    """
+    Fingerprint the content of a json item. Two items have the same fingerprint exactly
+    when json_tools.diff finds no difference between them: key order is ignored while
+    list order and value types (1, 1.0, true) are not.
+    :param item:the json item
+    :return: bytes:the fingerprint
+    """
+    canonical = json.dumps(item, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+
+
+class MergeIndex:
+    """Key -> content fingerprint index of the deployed data, built once and reused for every merge"""
+
+    def __init__(self, config_json, key_field=KEY_FIELD):
+        """
+        :param config_json:the deployed json data
+        :param key_field:the field identifying an item
+        """
+        self.key_field = key_field
+        self.items = {}
+        self.fingerprints = {}
+        for each_data in config_json or ():
+            key = each_data[key_field]
+            self.items[key] = each_data
+            self.fingerprints[key] = fingerprint(each_data)
+
+    @classmethod
+    def from_index(cls, items, fingerprints, key_field=KEY_FIELD):
+        """
+         Build the index from items and fingerprints computed before, such as a stored snapshot
+        :param items:dict:key -> item in deployed order
+        :param fingerprints:dict:key -> fingerprint of the item
+        :param key_field:the field identifying an item
+        """
+        merge_index = cls((), key_field)
+        merge_index.items = items
+        merge_index.fingerprints = fingerprints
+        return merge_index
+
+    def merge(self, list_obj, details=None, change_set=None):
+        """
+         Merge the incremental data into the deployed data, comparing fingerprints instead of
+         diffing every item. The index itself is not modified.
+        :param list_obj:the newly uploaded incremental data
+        :param details:dict filled with key -> json_tools.diff(deployed item, new item) of
+                       every changed item; the diffs are only computed when given
+        :param change_set:ChangeSet filled with the added, modified and unchanged keys and the
+                          field deltas of the modified items; only computed when given
+        :return: tuple:the merged key -> item dict in output order and the number of changes
+        """
+        if details is not None:
+            import json_tools
+        merged = dict(self.items)
+        replaced = {}
+        seen = {}
+        change_num = 0
+        for item in list_obj:
+            key = item[self.key_field]
+            if change_set is not None:
+                seen[key] = None
+            item_fingerprint = fingerprint(item)
+            current = replaced.get(key, self.fingerprints.get(key))
+            if current == item_fingerprint:
+                continue
+            if details is not None and key in merged:
+                details[key] = json_tools.diff(merged[key], item)
+            merged[key] = item
+            replaced[key] = item_fingerprint
+            change_num += 1
+
+        if change_set is not None:
+            for key in seen:
+                deployed_fingerprint = self.fingerprints.get(key)
+                if deployed_fingerprint is None:
+                    change_set.added.append(key)
+                elif replaced.get(key, deployed_fingerprint) == deployed_fingerprint:
+                    change_set.unchanged.append(key)
+                else:
+                    change_set.modified.append(key)
+                    change_set.deltas[key] = field_deltas(self.items[key], merged[key])
+        return merged, change_num
+
+
+class ChangeSet:
+    """The keys added, modified, unchanged and removed by a merge, with the field deltas of the modified items"""
+
+    def __init__(self):
+        # keys of the upload missing from the deployed data, appended to the merged data
+        self.added = []
+        # keys of the deployed data whose content the upload changed
+        self.modified = []
+        # keys of the upload whose content equals the deployed data
+        self.unchanged = []
+        # keys of the deployed data dropped from the merged data, always empty for incremental uploads
+        self.removed = []
+        # key -> {field: {'prev': deployed value, 'value': new value}} of every modified item
+        self.deltas = {}
+        # the merged data, as returned by convert_and_merge
+        self.merged = None
+
+    @property
+    def change_num(self):
+        return len(self.added) + len(self.modified) + len(self.removed)
+
+    def convert2json(self):
+        return {
+            'added': self.added,
+            'modified': self.modified,
+            'unchanged': self.unchanged,
+            'removed': self.removed,
+            'deltas': self.deltas
+        }
+
+
+def field_deltas(prev, item):
+    """
+    Compare two json items field by field
+    :return: dict:field -> {'prev': old value, 'value': new value}; a missing field has no 'prev' or 'value'
+    """
+    deltas = {}
+    for field, prev_value in prev.items():
+        if field not in item:
+            deltas[field] = {'prev': prev_value}
+        elif not _same_value(prev_value, item[field]):
+            deltas[field] = {'prev': prev_value, 'value': item[field]}
+    for field, value in item.items():
+        if field not in prev:
+            deltas[field] = {'value': value}
+    return deltas
+
+
+def _same_value(prev_value, value):
+    if type(prev_value) is not type(value) or prev_value != value:
+        return False
+    return not isinstance(value, (dict, list)) or fingerprint(prev_value) == fingerprint(value)
@@ -0,0 +1,135 @@
+import base64
+import csv
+import email.utils
+import gzip
+import io
+import tempfile
+import uuid
+from email.header import Header
+
+from send_email.json_stream import JsonArrayWriter
+
+# The number of error rows still listed in the body of a notification with an attached report.
+PREVIEW_ROWS = 20
+# The bytes a report keeps in memory before spilling to a temporary file.
+SPOOL_SIZE = 1024 * 1024
+# base64 encodes 57 bytes into one 76 characters line, so chunks of whole lines are encoded independently.
+_BASE64_CHUNK = 57 * 1024
+_REPORT_FORMATS = {
+    'csv': ('report.csv.gz', 'application/gzip'),
+    'json': ('report.json.gz', 'application/gzip'),
+}
+
+
+def write_report(error_message, fp, report_format='csv'):
+    """
+    Writes the rows of an error message gzip-compressed, one row at a time.
+
+    :param error_message: dict: row -> list of messages, as in a VERIFY_ERROR result.
+    :param fp: file-like object opened for writing in binary mode.
+    :param report_format: 'csv' for row,messages lines or 'json' for an array of {"row", "messages"} objects.
+    """
+    if report_format not in _REPORT_FORMATS:
+        raise ValueError("Unknown report format %s." % report_format)
+    with gzip.GzipFile(fileobj=fp, mode='wb', compresslevel=6, mtime=0) as compressed:
+        if report_format == 'json':
+            with JsonArrayWriter(compressed) as writer:
+                for row, messages in error_message.items():
+                    writer.write({"row": row, "messages": messages})
+            return
+        text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(("row", "messages"))
+        for row, messages in error_message.items():
+            writer.writerow((row, ','.join(messages)))
+        text.flush()
+        text.detach()
+
+
+def report_attachment(error_message, report_format='csv'):
+    """
+    :return: tuple: the file name, the content type and a spooled file holding the compressed report
+    """
+    filename, content_type = _REPORT_FORMATS.get(report_format, (None, None))
+    if filename is None:
+        raise ValueError("Unknown report format %s." % report_format)
+    report = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    write_report(error_message, report, report_format)
+    report.seek(0)
+    return filename, content_type, report
+
+
+class RawMessageWriter:
+    """
+    Writes a MIME message part by part to a binary file-like object: the headers, a
+    multipart/alternative text and HTML body, then the attachments read in chunks, so
+    an attachment is never held in memory as a whole.
+    """
+
+    def __init__(self, fp):
+        """
+        :param fp: file-like object opened for writing in binary mode.
+        """
+        self.fp = fp
+        self.boundary = "mixed-" + uuid.uuid4().hex
+
+    def write_headers(self, source, to, subject, cc=None, reply_tos=None, message_id=None):
+        """
+        :param to: The comma-separated destination email accounts.
+        :param cc: The comma-separated 'CC:' email accounts.
+        :param reply_tos: The comma-separated reply-to email accounts.
+        :param message_id: The Message-ID header, such as one made by email.utils.make_msgid.
+        """
+        self._line("From: %s" % source)
+        self._line("To: %s" % ", ".join(to.split(",")))
+        if cc is not None:
+            self._line("Cc: %s" % ", ".join(cc.split(",")))
+        if reply_tos is not None:
+            self._line("Reply-To: %s" % ", ".join(reply_tos.split(",")))
+        self._line("Subject: %s" % (subject if subject.isascii() else Header(subject, 'utf-8').encode()))
+        self._line("Date: %s" % email.utils.formatdate(usegmt=True))
+        if message_id is not None:
+            self._line("Message-ID: %s" % message_id)
+        self._line("MIME-Version: 1.0")
+        self._line('Content-Type: multipart/mixed; boundary="%s"' % self.boundary)
+        self._line("")
+
+    def write_body(self, text, html):
+        """
+        Writes the text and the HTML version of the body as one multipart/alternative part.
+        """
+        alternative = "alternative-" + uuid.uuid4().hex
+        self._line("--" + self.boundary)
+        self._line('Content-Type: multipart/alternative; boundary="%s"' % alternative)
+        self._line("")
+        for content_type, body in (("text/plain", text), ("text/html", html)):
+            self._line("--" + alternative)
+            self._line('Content-Type: %s; charset="utf-8"' % content_type)
+            self._line("Content-Transfer-Encoding: base64")
+            self._line("")
+            self._base64(io.BytesIO(body.encode('utf-8')))
+        self._line("--%s--" % alternative)
+
+    def write_attachment(self, filename, content_type, fp):
+        """
+        :param fp: file-like object opened for reading in binary mode, read in chunks.
+        """
+        self._line("--" + self.boundary)
+        self._line('Content-Type: %s; name="%s"' % (content_type, filename))
+        self._line('Content-Disposition: attachment; filename="%s"' % filename)
+        self._line("Content-Transfer-Encoding: base64")
+        self._line("")
+        self._base64(fp)
+
+    def close(self):
+        self._line("--%s--" % self.boundary)
+
+    def _line(self, line):
+        self.fp.write(line.encode('utf-8') + b"\r\n")
+
+    def _base64(self, fp):
+        while True:
+            chunk = fp.read(_BASE64_CHUNK)
+            if not chunk:
+                break
+            self.fp.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
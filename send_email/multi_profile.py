@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from send_email.json_convert_appconfig import ApConfigJsonConvert
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileMergeResult:
+    """The outcome of merging the incremental data of one AppConfig profile"""
+
+    def __init__(self, profile_id, merged=None, error=None, seconds=0.0):
+        """
+        :param profile_id:AppConfig profile id
+        :param merged:list:the merged data, or ChangeSet if a change set was requested, None on error
+        :param error:the exception raised while fetching or merging, None on success
+        :param seconds:the wall-clock seconds spent on the profile
+        """
+        self.profile_id = profile_id
+        self.merged = merged
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def merge_profiles(data_by_profile, max_workers=8, use_processes=False, change_set=False, session_cache=None,
+                   resilience=None):
+    """
+     Merge the incremental data of many AppConfig profiles at once. The deployed configs are
+     fetched concurrently by a bounded thread pool and every profile is merged as soon as its
+     config arrives, so the wall-clock time follows the slowest profile instead of the sum.
+    :param data_by_profile:dict:profile id -> the newly uploaded incremental data of the profile
+    :param max_workers:the number of profiles fetched and merged at the same time
+    :param use_processes:merge in a process pool, for uploads whose diff is CPU-heavy; the data
+                         of each profile is then pickled to and from the worker process
+    :param change_set:return a ChangeSet holding the merged data instead of the merged data only
+    :param session_cache:ConfigSessionCache reusing the configuration sessions between calls
+    :param resilience:ResilientCaller retrying the throttled and failed AppConfig calls behind a circuit breaker
+    :return: dict:profile id -> ProfileMergeResult, a failing profile does not stop the others
+    """
+    if not data_by_profile:
+        return {}
+    max_workers = min(max_workers, len(data_by_profile))
+    merge_pool = ProcessPoolExecutor(max_workers) if use_processes else None
+    try:
+        with ThreadPoolExecutor(max_workers, thread_name_prefix="profile-merge") as fetch_pool:
+            futures = [fetch_pool.submit(_merge_profile, ApConfigJsonConvert(list_obj, profile_id, session_cache,
+                                                                             resilience), merge_pool, change_set)
+                       for profile_id, list_obj in data_by_profile.items()]
+            results = [future.result() for future in futures]
+    finally:
+        if merge_pool is not None:
+            merge_pool.shutdown()
+    return {result.profile_id: result for result in results}
+
+
+def _merge_profile(convert, merge_pool, change_set):
+    start = time.perf_counter()
+    try:
+        if merge_pool is None:
+            merged = convert.convert_and_merge(change_set=change_set)
+        else:
+            config_json = convert.get_config()
+            merged = merge_pool.submit(_merge_in_process, list(convert.iter_list_obj()), convert.profile_id,
+                                       config_json, change_set).result()
+    except Exception as exception:
+        logger.exception("merge profile %s fail.", convert.profile_id)
+        return ProfileMergeResult(convert.profile_id, error=exception, seconds=time.perf_counter() - start)
+    return ProfileMergeResult(convert.profile_id, merged, seconds=time.perf_counter() - start)
+
+
+def _merge_in_process(list_obj, profile_id, config_json, change_set):
+    return ApConfigJsonConvert(list_obj, profile_id).merge(config_json, change_set=change_set)
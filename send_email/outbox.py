@@ -0,0 +1,231 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from entity import AppConfigResult
+from send_email.send_email_common import EmailBody
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+# The seconds a claimed entry stays sending before another drainer may take it back, longer than a batch takes.
+LEASE_TIMEOUT = 300.0
+
+# The payload kind -> (SesMailSender method, payload class) used by the drainer.
+KINDS = {
+    'email': ('send_email', EmailBody),
+    'templated_email': ('send_templated_email', EmailBody),
+    'appconfig_email': ('send_appconfig_email', AppConfigResult),
+    'appconfig_templated_email': ('send_appconfig_templated_email', AppConfigResult),
+}
+
+
+class OutboxEntry:
+    """A notification stored in the outbox."""
+
+    def __init__(self, entry_id, kind, payload, status, attempts, message_id, error):
+        self.entry_id = entry_id
+        self.kind = kind
+        self.payload = payload
+        self.status = status
+        self.attempts = attempts
+        self.message_id = message_id
+        self.error = error
+
+
+class SqliteOutbox:
+    """
+    A durable queue of notifications in a local SQLite file in WAL mode. Enqueued
+    notifications survive a crash of the process and are sent by an OutboxDrainer.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The SQLite database file.
+        """
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, message_id TEXT, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+        self._connection().execute("CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, id)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def enqueue(self, kind, payload):
+        """
+        Stores a notification to send.
+
+        :param kind: The payload kind, a key of KINDS.
+        :param payload: The EmailBody or AppConfigResult to send.
+        :return: The ID of the outbox entry.
+        """
+        if kind not in KINDS:
+            raise ValueError("Unknown outbox kind %s." % kind)
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO outbox (kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, json.dumps(payload.convert2json()), PENDING, now, now))
+        return cursor.lastrowid
+
+    def claim(self, limit, lease_timeout=LEASE_TIMEOUT):
+        """
+        Marks up to limit pending entries as sending, oldest first. Entries left sending by a
+        crashed drainer are claimed again once their lease expired.
+
+        :param lease_timeout: The seconds after its claim a sending entry is considered abandoned.
+        :return: The claimed OutboxEntry list.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            rows = connection.execute(
+                "SELECT id, kind, payload, status, attempts, message_id, error FROM outbox "
+                "WHERE status = ? OR (status = ? AND updated_at <= ?) ORDER BY id LIMIT ?",
+                (PENDING, SENDING, now - lease_timeout, limit)).fetchall()
+            connection.executemany("UPDATE outbox SET status = ?, updated_at = ? WHERE id = ?",
+                                   [(SENDING, now, row[0]) for row in rows])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return [OutboxEntry(row[0], row[1], json.loads(row[2]), SENDING, row[4], row[5], row[6]) for row in rows]
+
+    def mark_sent(self, entry_id, message_id):
+        self._connection().execute(
+            "UPDATE outbox SET status = ?, message_id = ?, error = NULL, attempts = attempts + 1, updated_at = ? "
+            "WHERE id = ?", (SENT, message_id, time.time(), entry_id))
+
+    def mark_failed(self, entry_id, error, retry):
+        """
+        :param retry: Whether the entry goes back to pending to be sent again.
+        """
+        self._connection().execute(
+            "UPDATE outbox SET status = ?, error = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+            (PENDING if retry else FAILED, error, time.time(), entry_id))
+
+    def recover(self, lease_timeout=LEASE_TIMEOUT):
+        """
+        Puts the entries left sending by a crashed drainer back to pending. Entries claimed
+        less than lease_timeout seconds ago are still being sent by a live drainer and are kept.
+
+        :param lease_timeout: The seconds after its claim an entry is considered abandoned.
+        :return: The number of recovered entries.
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE outbox SET status = ?, updated_at = ? WHERE status = ? AND updated_at <= ?",
+            (PENDING, now, SENDING, now - lease_timeout))
+        return cursor.rowcount
+
+    def get(self, entry_id):
+        """
+        :return: The OutboxEntry, None if missing.
+        """
+        row = self._connection().execute(
+            "SELECT id, kind, payload, status, attempts, message_id, error FROM outbox WHERE id = ?",
+            (entry_id,)).fetchone()
+        if row is None:
+            return None
+        return OutboxEntry(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6])
+
+    def counts(self):
+        """
+        :return: dict: status -> number of entries
+        """
+        return dict(self._connection().execute("SELECT status, count(*) FROM outbox GROUP BY status").fetchall())
+
+
+class OutboxDrainer:
+    """Sends the outbox entries in batches through a SesMailSender on a background thread."""
+
+    def __init__(self, outbox, sender, batch_size=50, interval=1.0, max_attempts=5, lease_timeout=LEASE_TIMEOUT):
+        """
+        :param outbox: The SqliteOutbox to drain.
+        :param sender: The SesMailSender sending the entries.
+        :param batch_size: The number of entries claimed at a time.
+        :param interval: The seconds waited when the outbox is empty.
+        :param max_attempts: The attempts after which a failing entry is marked failed.
+        :param lease_timeout: The seconds after which the entries left sending by a crashed drainer are sent again.
+        """
+        self.outbox = outbox
+        self.sender = sender
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.lease_timeout = lease_timeout
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def drain_once(self):
+        """
+        Sends one batch of entries.
+
+        :return: The number of entries processed.
+        """
+        entries = self.outbox.claim(self.batch_size, self.lease_timeout)
+        for entry in entries:
+            send_method, payload_class = KINDS[entry.kind]
+            try:
+                message_id = getattr(self.sender, send_method)(payload_class.from_json(entry.payload))
+            except Exception as exception:
+                message_id = None
+                error = "%s: %s" % (type(exception).__name__, exception)
+            else:
+                error = "send failed"
+            if message_id is not None:
+                self.outbox.mark_sent(entry.entry_id, message_id)
+            else:
+                retry = entry.attempts + 1 < self.max_attempts
+                logger.warning("Outbox entry %s failed (%s), %s.", entry.entry_id, error,
+                               "will retry" if retry else "giving up")
+                self.outbox.mark_failed(entry.entry_id, error, retry)
+        return len(entries)
+
+    def start(self):
+        """
+        Recovers the entries of a crashed drainer and starts draining in the background.
+        """
+        self.outbox.recover(self.lease_timeout)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-drainer", daemon=True)
+        self._thread.start()
+
+    def stop(self, drain=True):
+        """
+        Stops the background thread.
+
+        :param drain: Whether to send the pending entries before returning.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if drain:
+            while self.drain_once():
+                pass
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                processed = self.drain_once()
+            except Exception:
+                logger.exception("Outbox drain failed.")
+                processed = 0
+            if not processed:
+                self._stopped.wait(self.interval)
@@ -0,0 +1,191 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from entity.appconfig_state_enum import AppconfigState
+from send_email.instrumentation import Histogram
+from send_email.send_engine import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+URGENT = 0
+WARNING = 1
+INFO = 2
+LANE_NAMES = ('urgent', 'warning', 'info')
+
+# The lane of each AppConfig Deploy state: failed deploys first, informational results last.
+STATE_LANES = {
+    AppconfigState.VERIFY_ERROR: URGENT,
+    AppconfigState.ERROR: URGENT,
+    AppconfigState.ROLLED_BACK: WARNING,
+    AppconfigState.COMPLETE: INFO,
+    AppconfigState.NO_CHANGED: INFO,
+}
+# The seconds a notification of each lane may wait before it expires, None to never expire.
+# Only informational results expire by default, a rollback or an unknown notification is always sent.
+DEFAULT_DEADLINES = {URGENT: None, WARNING: None, INFO: 120.0}
+
+
+def lane_of(message):
+    """
+    :param message: the response information of AppConfig Deploy, or any other notification.
+    :return: The lane of the notification, WARNING when its AppConfig state is unknown or missing,
+             so it is never expired like an informational result.
+    """
+    state = getattr(message, 'appconfig_state', None)
+    return STATE_LANES.get(state, WARNING)
+
+
+class _Job:
+    __slots__ = ('message', 'send_method', 'lane', 'enqueued', 'expires', 'future')
+
+    def __init__(self, message, send_method, lane, enqueued, expires):
+        self.message = message
+        self.send_method = send_method
+        self.lane = lane
+        self.enqueued = enqueued
+        self.expires = expires
+        self.future = Future()
+
+
+class PriorityScheduler:
+    """
+    Sends notifications through a SesMailSender from priority lanes instead of in arrival order:
+    a VERIFY_ERROR or ERROR result is sent before the queued informational results of a large
+    fan-out. Notifications still queued after the deadline of their lane are coalesced into a
+    digest or dropped.
+    """
+
+    def __init__(self, sender, workers=4, deadlines=None, digest=None, max_send_rate=None, clock=time.monotonic):
+        """
+        :param sender: The SesMailSender sending the notifications.
+        :param workers: The number of threads sending at the same time.
+        :param deadlines: dict: lane -> seconds, overriding DEFAULT_DEADLINES.
+        :param digest: A DigestAggregator receiving the expired notifications, None to drop them.
+        :param max_send_rate: The maximum number of notifications sent per second, None for no limit.
+        :param clock: The monotonic clock measuring the waits and the deadlines.
+        """
+        self.sender = sender
+        self.deadlines = dict(DEFAULT_DEADLINES)
+        self.deadlines.update(deadlines or {})
+        self.digest = digest
+        self.bucket = TokenBucket(max_send_rate) if max_send_rate else None
+        self.clock = clock
+        self.wait_times = [Histogram() for _ in LANE_NAMES]
+        self._depths = [0] * len(LANE_NAMES)
+        self._counts = {'sent': 0, 'failed': 0, 'dropped': 0, 'coalesced': 0}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name="priority-send-%d" % index, daemon=True)
+                         for index in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, message, send_method="send_appconfig_email", deadline=None, lane=None):
+        """
+        Queues a notification in its lane.
+
+        :param message: The AppConfigResult, or the EmailBody for the send_email methods.
+        :param send_method: The name of the SesMailSender method used to send it.
+        :param deadline: The seconds the notification may wait, the deadline of its lane if None.
+        :param lane: URGENT, WARNING or INFO, derived from the AppConfig state if None.
+        :return: A future resolving to the ID of the message, or None if it expired.
+        """
+        if lane is None:
+            lane = lane_of(message)
+        if deadline is None:
+            deadline = self.deadlines.get(lane)
+        now = self.clock()
+        job = _Job(message, send_method, lane, now, None if deadline is None else now + deadline)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The scheduler is shut down.")
+            heapq.heappush(self._heap, (lane, next(self._sequence), job))
+            self._depths[lane] += 1
+            self._condition.notify()
+        return job.future
+
+    def stats(self):
+        """
+        :return: dict: the queue depth and the wait time summary of each lane, and the
+                 numbers of sent, failed, dropped and coalesced notifications
+        """
+        with self._condition:
+            depths = list(self._depths)
+            stats = dict(self._counts)
+        stats['depth'] = dict(zip(LANE_NAMES, depths))
+        stats['wait'] = {name: histogram.summary() for name, histogram in zip(LANE_NAMES, self.wait_times)}
+        return stats
+
+    def shutdown(self, wait=True):
+        """
+        Stops accepting notifications; the queued ones are still sent or expired.
+
+        :param wait: Whether to block until the queue is empty.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _next(self):
+        with self._condition:
+            while not self._heap and not self._closed:
+                self._condition.wait()
+            if not self._heap:
+                return None
+            _, _, job = heapq.heappop(self._heap)
+            self._depths[job.lane] -= 1
+            return job
+
+    def _count(self, outcome):
+        with self._condition:
+            self._counts[outcome] += 1
+
+    def _run(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            now = self.clock()
+            self.wait_times[job.lane].record(now - job.enqueued)
+            if job.expires is not None and now > job.expires:
+                self._expire(job)
+                continue
+            if self.bucket is not None:
+                self.bucket.acquire()
+            try:
+                message_id = getattr(self.sender, job.send_method)(job.message)
+            except Exception as exception:
+                self._count('failed')
+                job.future.set_exception(exception)
+                continue
+            self._count('sent' if message_id is not None else 'failed')
+            job.future.set_result(message_id)
+
+    def _expire(self, job):
+        if self.digest is not None:
+            try:
+                self.digest.add(job.message)
+            except Exception:
+                logger.exception("Couldn't coalesce the expired %s notification.", LANE_NAMES[job.lane])
+            else:
+                self._count('coalesced')
+                job.future.set_result(None)
+                return
+        logger.info("Dropped the %s notification that waited past its deadline.", LANE_NAMES[job.lane])
+        self._count('dropped')
+        job.future.set_result(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
@@ -0,0 +1,205 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Error codes of Amazon SES and AppConfig calls that succeed when retried later.
+RETRYABLE_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'TooManyRequestsException',
+    'RequestLimitExceeded', 'LimitExceededException', 'ServiceUnavailable', 'ServiceUnavailableException',
+    'InternalFailure', 'InternalServerException', 'InternalServerError', 'RequestTimeout',
+    'RequestTimeoutException',
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service while its circuit breaker is open."""
+
+
+def is_retryable(error):
+    """
+    Classifies an error raised by a boto3 call or an SMTP send.
+
+    :param error: The raised exception.
+    :return: True for throttling, 5xx, 4xx SMTP replies and connection errors, which are worth retrying.
+    """
+    import smtplib
+
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # every recipient was refused, retry if all the refusals are transient
+        return bool(error.recipients) and all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+
+    import botocore.exceptions
+
+    if isinstance(error, botocore.exceptions.ClientError):
+        if error.response.get('Error', {}).get('Code') in RETRYABLE_ERROR_CODES:
+            return True
+        return error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500
+    return isinstance(error, (botocore.exceptions.ConnectionError, botocore.exceptions.HTTPClientError))
+
+
+class DecorrelatedJitterBackoff:
+    """Decorrelated jitter backoff: each delay is random between base and three times the previous delay."""
+
+    def __init__(self, base=0.1, cap=10.0, rand=random.uniform):
+        """
+        :param base: The minimum delay in seconds.
+        :param cap: The maximum delay in seconds.
+        :param rand: The function returning a random float between its two arguments.
+        """
+        self.base = base
+        self.cap = cap
+        self.rand = rand
+
+    def next_delay(self, previous=None):
+        """
+        :param previous: The previous delay, None before the first retry.
+        :return: The seconds to wait before the next attempt.
+        """
+        return min(self.cap, self.rand(self.base, (previous or self.base) * 3))
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a service is degraded. The breaker opens after failure_threshold
+    consecutive retryable failures, rejects calls for reset_timeout seconds and then
+    lets one trial call through: its success closes the breaker, its failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        """
+        :param failure_threshold: The consecutive failures opening the breaker.
+        :param reset_timeout: The seconds the breaker stays open.
+        :param clock: The monotonic clock measuring the open time.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.opened = 0
+        self.rejected = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        :return: Whether a call may go through now.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                return True
+            if self.state == self.HALF_OPEN:
+                # only the trial call goes through until it finishes
+                self.rejected += 1
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = self.CLOSED
+
+    def release(self):
+        """
+        Ends a call that neither succeeded nor failed retryably, such as a rejected request:
+        it says nothing about the health of the service, so a trial call leaves the breaker
+        open and the next call is a new trial.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                    logger.warning("Circuit breaker opened after %s failures.", self._failures)
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+
+
+class ResilientCaller:
+    """Calls a service with retries of the retryable errors, jittered backoff and a circuit breaker."""
+
+    def __init__(self, max_attempts=4, backoff=None, breaker=None, sleep=time.sleep):
+        """
+        :param max_attempts: The maximum number of attempts of a call.
+        :param backoff: The DecorrelatedJitterBackoff between attempts, a default one if None.
+        :param breaker: The CircuitBreaker of the service, a default one if None.
+        :param sleep: The function waiting between attempts.
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff if backoff is not None else DecorrelatedJitterBackoff()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.sleep = sleep
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls func, retrying it while it raises retryable errors.
+
+        :return: The return value of func.
+        :raises CircuitOpenError: if the circuit breaker is open.
+        """
+        with self._lock:
+            self.calls += 1
+        delay = None
+        attempt = 1
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError("Circuit breaker is open, call rejected.")
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                if not is_retryable(error):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_attempts:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                delay = self.backoff.next_delay(delay)
+                with self._lock:
+                    self.retries += 1
+                logger.info("Retrying after %s in %.3f seconds.", type(error).__name__, delay)
+                self.sleep(delay)
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+
+    def stats(self):
+        """
+        :return: dict: the call, retry, failure and circuit breaker counters
+        """
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'failures': self.failures,
+            'breaker_state': self.breaker.state,
+            'breaker_opened': self.breaker.opened,
+            'breaker_rejected': self.breaker.rejected
+        }
@@ -7,6 +7,7 @@ from entity import AppConfigResult
 from entity.appconfig_state_enum import AppconfigState
 from send_email.json_convert_appconfig import ApConfigJsonConvert
 from send_email.send_email_common import SesMailSender
+from send_email.validator import validate_ship_options
 
 
 def demo():
@@ -43,6 +44,13 @@ def demo1():
         }
     ]
 
+    error_message = validate_ship_options(event_json)
+    if error_message:
+        appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.VERIFY_ERROR.value, error_message,
+                                           "shipoption/test1.json")
+        print(SesMailSender().send_appconfig_email(appconfig_result))
+        return
+
     appConfig_json_convert = ApConfigJsonConvert(event_json, 'ngskjdp')
     merge = appConfig_json_convert.convert_and_merge()
     print(merge)
@@ -1,16 +1,29 @@
+import html
+import io
+import itertools
 import json
 import logging
 import os
 import traceback
 
-import boto3
-from botocore.exceptions import ClientError
-
-from entity import AppConfigResult
 from entity.appconfig_state_enum import AppconfigState
+from send_email import client_pool, instrumentation
+from send_email.mime_report import PREVIEW_ROWS, RawMessageWriter, report_attachment
+from send_email.template_engine import MAX_MESSAGE_SIZE, MAX_TEMPLATE_DATA_LENGTH, TemplateError
+from send_email.transport import SesApiTransport
 
 logger = logging.getLogger(__name__)
 
+# Amazon SES accepts at most 50 destinations in one SendBulkTemplatedEmail call.
+BULK_DESTINATION_LIMIT = 50
+
+
+def __getattr__(name):
+    # botocore is only imported when ClientError is asked for, so formatting stays free of the AWS SDK.
+    if name == 'ClientError':
+        return client_pool.ClientError
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 
 class EmailBody:
     """
@@ -44,6 +57,27 @@ class EmailBody:
         self.bcc = bcc
         self.reply_tos = reply_tos
 
+    def convert2json(self):
+        return {
+            'source': self.source,
+            'destination': self.destination,
+            'subject': self.subject,
+            'text': self.text,
+            'html': self.html,
+            'template_name': self.template_name,
+            'template_data': self.template_data,
+            'cc': self.cc,
+            'bcc': self.bcc,
+            'reply_tos': self.reply_tos
+        }
+
+    @classmethod
+    def from_json(cls, json_dict):
+        """
+        :param json_dict: The dict returned by convert2json.
+        """
+        return cls(**json_dict)
+
     def to_service_format(self):
         """
         :return: The destination data in the format expected by Amazon SES.
@@ -59,11 +93,70 @@ class EmailBody:
 class SesMailSender:
     """Encapsulates functions to send emails with Amazon SES."""
 
-    def __init__(self, ses_client=boto3.client("ses")):
+    def __init__(self, ses_client=None, template_registry=None, dedup_cache=None, resilience=None, outbox=None,
+                 report_row_threshold=None, report_format='csv', transport=None):
+        """
+        :param ses_client: A Boto3 Amazon SES client, the pooled client of the
+                           calling thread if None.
+        :param template_registry: A TemplateRegistry rendering the templates client side
+                                  before sending, None to leave rendering to Amazon SES.
+        :param dedup_cache: A SendDedupCache returning the original message ID when the
+                            same AppConfig Deploy result is sent again, None to always send.
+        :param resilience: A ResilientCaller retrying the throttled and failed SES calls
+                           behind a circuit breaker, None to leave the retries to botocore.
+                           The pooled client does not retry on its own when it is given.
+        :param outbox: A SqliteOutbox storing the notifications of the enqueue_* methods
+                       until an OutboxDrainer sends them.
+        :param report_row_threshold: The number of error rows above which send_appconfig_email sends
+                                     a summary with the rows attached as a compressed report,
+                                     None to always list every row in the body.
+        :param report_format: The format of the attached report, 'csv' or 'json'.
+        :param transport: The transport sending the messages, such as an SmtpTransport;
+                          a SesApiTransport of ses_client if None.
+        """
+        if ses_client is not None and transport is not None:
+            raise ValueError("Give either an SES client or a transport, not both.")
+        self.transport = transport if transport is not None else SesApiTransport(ses_client, retry=resilience is None)
+        self.template_registry = template_registry
+        self.dedup_cache = dedup_cache
+        self.resilience = resilience
+        self.outbox = outbox
+        self.report_row_threshold = report_row_threshold
+        self.report_format = report_format
+
+    @property
+    def ses_client(self):
+        """
+        :return: The Boto3 Amazon SES client of the transport, None for a transport without one, such as SMTP.
+        """
+        return getattr(self.transport, 'ses_client', None)
+
+    def enqueue_email(self, email_body, templated=False):
         """
-        :param ses_client: A Boto3 Amazon SES client.
+        Stores an email in the outbox and returns without waiting for Amazon SES;
+        an OutboxDrainer sends it with send_email or send_templated_email.
+
+        :param email_body:
+        :param templated: Whether the email is sent based on its template.
+        :return: The ID of the outbox entry.
+        """
+        return self.outbox.enqueue('templated_email' if templated else 'email', email_body)
+
+    def enqueue_appconfig_email(self, message, templated=False):
         """
-        self.ses_client = ses_client
+        Stores an AppConfig Deploy notification in the outbox and returns without waiting for
+        Amazon SES; an OutboxDrainer sends it with send_appconfig_email or send_appconfig_templated_email.
+
+        :param message: the response information of AppConfig Deploy.
+        :param templated: Whether the email is sent based on a template.
+        :return: The ID of the outbox entry.
+        """
+        return self.outbox.enqueue('appconfig_templated_email' if templated else 'appconfig_email', message)
+
+    def _call(self, func, **kwargs):
+        if self.resilience is None:
+            return func(**kwargs)
+        return self.resilience.call(func, **kwargs)
 
     def send_email(self, email_body):
         """
@@ -84,17 +177,63 @@ class SesMailSender:
         if email_body.reply_tos is not None:
             send_args['ReplyToAddresses'] = email_body.reply_tos.split(',')
         try:
-            response = self.ses_client.send_email(**send_args)
+            with instrumentation.span('send_email.ses'):
+                response = self._call(self.transport.send_email, **send_args)
             message_id = response['MessageId']
             logger.info(
                 "Sent mail %s from %s to %s.", message_id, email_body.source, email_body.destination)
-        except ClientError:
+        except self.transport.error_types():
             logger.exception(
                 "Couldn't send mail from %s to %s.", email_body.source, email_body.destination)
             raise
         else:
             return message_id
 
+    def send_raw_email(self, email_body, attachments=()):
+        """
+        Sends an email as a raw MIME message built part by part; the attachments are read
+        and encoded in chunks, but the whole message is held in memory, as SendRawEmail
+        takes it as one value. Amazon SES limits it to MAX_MESSAGE_SIZE bytes.
+
+        Note: If your account is in the Amazon SES  sandbox, the source and
+        destination email accounts must both be verified.
+
+        :param email_body:
+        :param attachments: The list of (file name, content type, binary file-like object) to attach.
+        :return: The ID of the message, assigned by Amazon SES.
+        """
+        raw = io.BytesIO()
+        with instrumentation.span('send_raw_email.build'):
+            writer = RawMessageWriter(raw)
+            writer.write_headers(email_body.source, email_body.destination, email_body.subject,
+                                 cc=email_body.cc, reply_tos=email_body.reply_tos)
+            writer.write_body(email_body.text, email_body.html)
+            for filename, content_type, fp in attachments:
+                writer.write_attachment(filename, content_type, fp)
+            writer.close()
+        data = raw.getvalue()
+        message_size = len(data)
+        if message_size > MAX_MESSAGE_SIZE:
+            raise ValueError("Raw mail of %s bytes exceeds the %s bytes limit." % (message_size, MAX_MESSAGE_SIZE))
+        destinations = email_body.destination.split(",")
+        for recipients in (email_body.cc, email_body.bcc):
+            if recipients is not None:
+                destinations += recipients.split(",")
+        try:
+            with instrumentation.span('send_raw_email.ses'):
+                response = self._call(self.transport.send_raw_email, Source=email_body.source,
+                                      Destinations=destinations, RawMessage={'Data': data})
+            message_id = response['MessageId']
+            logger.info(
+                "Sent raw mail %s of %s bytes from %s to %s.", message_id, message_size, email_body.source,
+                email_body.destination)
+        except self.transport.error_types():
+            logger.exception(
+                "Couldn't send raw mail from %s to %s.", email_body.source, email_body.destination)
+            raise
+        else:
+            return message_id
+
     def send_templated_email(self, email_body):
         """
         Sends an email based on a template. A template contains replaceable tags
@@ -108,27 +247,119 @@ class SesMailSender:
         :param email_body:
         :return: The ID of the message, assigned by Amazon SES.
         """
+        with instrumentation.span('send_templated_email.template_data'):
+            template_data = json.dumps(email_body.template_data)
         send_args = {
             'Source': email_body.source,
             'Destination': email_body.to_service_format(),
             'Template': email_body.template_name,
-            'TemplateData': json.dumps(email_body.template_data)
+            'TemplateData': template_data
         }
         if email_body.reply_tos is not None:
             send_args['ReplyToAddresses'] = email_body.reply_tos.split(',')
         try:
-            response = self.ses_client.send_templated_email(**send_args)
+            with instrumentation.span('send_templated_email.ses'):
+                response = self._call(self.transport.send_templated_email, **send_args)
             message_id = response['MessageId']
             logger.info(
                 "Sent templated mail %s from %s to %s.", message_id, email_body.source,
                 email_body.destination)
-        except ClientError:
+        except self.transport.error_types():
             logger.exception(
                 "Couldn't send templated mail from %s to %s.", email_body.source, email_body.destination)
             raise
         else:
             return message_id
 
+    def send_local_templated_email(self, email_body):
+        """
+        Renders a templated email client side with the template registry before sending it,
+        so a missing template, malformed template data or an oversized message fails without
+        a round trip. When the template data is too large for SendTemplatedEmail, the
+        pre-rendered bodies are sent with send_email instead.
+
+        :param email_body:
+        :return: The ID of the message, assigned by Amazon SES.
+        """
+        template = self.template_registry.get(email_body.template_name)
+        subject, text, html_body = template.render(email_body.template_data)
+        message_size = len(subject.encode('utf-8')) + len(text.encode('utf-8')) + len(html_body.encode('utf-8'))
+        if message_size > MAX_MESSAGE_SIZE:
+            raise TemplateError("Rendered mail of %s bytes exceeds the %s bytes limit." % (message_size,
+                                                                                          MAX_MESSAGE_SIZE))
+        if len(json.dumps(email_body.template_data)) <= MAX_TEMPLATE_DATA_LENGTH:
+            return self.send_templated_email(email_body)
+        logger.info("Template data of %s exceeds the SES limit, sending pre-rendered mail.",
+                    email_body.template_name)
+        return self.send_email(EmailBody(source=email_body.source, destination=email_body.destination,
+                                         subject=subject, text=text, html=html_body, cc=email_body.cc,
+                                         bcc=email_body.bcc, reply_tos=email_body.reply_tos))
+
+    def send_bulk_templated_email(self, email_bodies, default_template_data=None):
+        """
+        Sends one templated email to each EmailBody using as few SES calls as possible.
+        The bodies are chunked into batches of BULK_DESTINATION_LIMIT destinations and
+        each batch is sent with a single SendBulkTemplatedEmail call.
+
+        All bodies must share the same source, template name and reply-to addresses;
+        the destination, cc, bcc and template data of each body are sent as a separate
+        bulk destination.
+
+        Note: If your account is in the Amazon SES  sandbox, the source and
+        destination email accounts must both be verified.
+
+        :param email_bodies: The list of EmailBody to send.
+        :param default_template_data: The template data used for destinations that
+                                      don't set their own.
+        :return: A list with one dict per email body, in input order, holding the
+                 destination, the SES status, the message ID and the error, if any.
+        """
+        if not email_bodies:
+            return []
+        first = email_bodies[0]
+        for email_body in email_bodies:
+            if (email_body.source, email_body.template_name, email_body.reply_tos) != \
+                    (first.source, first.template_name, first.reply_tos):
+                raise ValueError("Bulk templated emails must share source, template name and reply-to addresses.")
+
+        statuses = []
+        for start in range(0, len(email_bodies), BULK_DESTINATION_LIMIT):
+            batch = email_bodies[start:start + BULK_DESTINATION_LIMIT]
+            send_args = {
+                'Source': first.source,
+                'Template': first.template_name,
+                'DefaultTemplateData': json.dumps(default_template_data or {}),
+                'Destinations': [self._bulk_destination(email_body) for email_body in batch]
+            }
+            if first.reply_tos is not None:
+                send_args['ReplyToAddresses'] = first.reply_tos.split(',')
+            try:
+                response = self._call(self.transport.send_bulk_templated_email, **send_args)
+                logger.info(
+                    "Sent bulk templated mail from %s to %s destinations.", first.source, len(batch))
+            except self.transport.error_types():
+                logger.exception(
+                    "Couldn't send bulk templated mail from %s to %s destinations.", first.source, len(batch))
+                raise
+            for email_body, status in zip(batch, response['Status']):
+                statuses.append({
+                    'destination': email_body.destination,
+                    'status': status.get('Status', 'Success'),
+                    'message_id': status.get('MessageId'),
+                    'error': status.get('Error')
+                })
+        return statuses
+
+    @staticmethod
+    def _bulk_destination(email_body):
+        """
+        :return: The bulk destination data in the format expected by Amazon SES.
+        """
+        destination = {'Destination': email_body.to_service_format()}
+        if email_body.template_data is not None:
+            destination['ReplacementTemplateData'] = json.dumps(email_body.template_data)
+        return destination
+
     def send_appconfig_email(self, message):
         """
         Sends an email according to the response information of AppConfig Deploy.
@@ -136,26 +367,56 @@ class SesMailSender:
         Note: If your account is in the Amazon SES  sandbox, the source and
         destination email accounts must both be verified.
 
+        When report_row_threshold is set, a VERIFY_ERROR result with more error rows
+        is sent with send_appconfig_report_email instead.
+
         :param message:
         :return: The ID of the message, assigned by Amazon SES.
         """
+        if self.report_row_threshold is not None and message.appconfig_state is AppconfigState.VERIFY_ERROR and \
+                len(message.error_message) > self.report_row_threshold:
+            return self.send_appconfig_report_email(message)
+        message_id = self._sent_message_id(message)
+        if message_id is not None:
+            return message_id
         email_body = EmailBody(source=os.getenv("EMAIL_SOURCE"),
                                destination=os.getenv("EMAIL_DESTINATION"))
         try:
-            if message.state == AppconfigState.VERIFY_ERROR.value:
-                email_body.subject = "Appconfig deploy error notification."
-                email_body.text = MessageFormat(message).error_message_text_format()
-                email_body.html = MessageFormat(message).error_message_html_format()
-            else:
-                email_body.subject = "Appconfig deploy " + message.state + " notification."
-                email_body.text = MessageFormat(message).common_message_text_format()
-                email_body.html = MessageFormat(message).common_message_html_format()
-            return self.send_email(email_body)
+            with instrumentation.span('send_appconfig_email.format'):
+                email_body.subject, email_body.text, email_body.html = MessageFormat(message).render()
+            with instrumentation.span('send_appconfig_email.send'):
+                return self._remember_sent(message, self.send_email(email_body))
         except Exception as exception:
             logger.error("send appconfig email fail.")
             traceback.print_exc()
         return None
 
+    def send_appconfig_report_email(self, message):
+        """
+        Sends a VERIFY_ERROR result as a summary listing the first error rows, with all
+        the rows attached as a gzip-compressed report written one row at a time.
+
+        :param message: the response information of AppConfig Deploy.
+        :return: The ID of the message, assigned by Amazon SES.
+        """
+        message_id = self._sent_message_id(message)
+        if message_id is not None:
+            return message_id
+        email_body = EmailBody(source=os.getenv("EMAIL_SOURCE"),
+                               destination=os.getenv("EMAIL_DESTINATION"))
+        try:
+            with instrumentation.span('send_appconfig_report_email.report'):
+                filename, content_type, report = report_attachment(message.error_message, self.report_format)
+            with report:
+                email_body.subject, email_body.text, email_body.html = \
+                    MessageFormat(message).render_summary(PREVIEW_ROWS, filename)
+                return self._remember_sent(message, self.send_raw_email(email_body,
+                                                                        [(filename, content_type, report)]))
+        except Exception as exception:
+            logger.error("send appconfig report email fail.")
+            traceback.print_exc()
+        return None
+
     def send_appconfig_templated_email(self, message):
         """
         Sends an email based on a template. A template contains replaceable tags
@@ -169,67 +430,201 @@ class SesMailSender:
         :param message:
         :return: The ID of the message, assigned by Amazon SES.
         """
+        message_id = self._sent_message_id(message)
+        if message_id is not None:
+            return message_id
         email_body = EmailBody(source=os.getenv("EMAIL_SOURCE"),
                                destination=os.getenv("EMAIL_DESTINATION"))
         try:
-            if message.state == AppconfigState.VERIFY_ERROR.value:
-                email_body.template_name = "SendEmailAppConfigError"
-                error_message = message.error_message
-                error_message_list = []
-                for key, value in error_message.items():
-                    error_message_each_dict = {"row": key, "msg": ','.join(value)}
-                    error_message_list.append(error_message_each_dict)
-                template_data = {"error_message": error_message_list}
-                email_body.template_data = template_data
-            else:
-                email_body.template_name = "SendEmailAppConfigCommon"
-                common_dict = {"state": message.state, "msg": json.dumps(message, default=AppConfigResult.convert2json)}
-                email_body.template_data = common_dict
-            return self.send_templated_email(email_body)
+            email_body.template_name, email_body.template_data = self.appconfig_template(message)
+            if self.template_registry is not None:
+                return self._remember_sent(message, self.send_local_templated_email(email_body))
+            return self._remember_sent(message, self.send_templated_email(email_body))
         except Exception as exception:
             logger.error("send appconfig template email fail.")
             traceback.print_exc()
         return None
 
+    def _sent_message_id(self, message):
+        """
+        :return: The ID of the message already sent for the AppConfig Deploy result, None if not sent.
+        """
+        if self.dedup_cache is None:
+            return None
+        message_id = self.dedup_cache.lookup(message)
+        if message_id is not None:
+            logger.info("Mail %s was already sent for %s, skip sending it again.", message_id, message.key)
+        return message_id
+
+    def _remember_sent(self, message, message_id):
+        if self.dedup_cache is not None:
+            self.dedup_cache.remember(message, message_id)
+        return message_id
+
+    def send_appconfig_bulk_templated_email(self, message, destinations):
+        """
+        Sends the templated AppConfig Deploy notification to many destinations with
+        bulk SES calls instead of one call per destination.
+
+        :param message: the response information of AppConfig Deploy.
+        :param destinations: The list of destination email accounts; each entry may
+                             hold several comma-separated accounts.
+        :return: The per-destination statuses, see send_bulk_templated_email,
+                 or None if sending failed.
+        """
+        try:
+            template_name, template_data = self.appconfig_template(message)
+            email_bodies = [EmailBody(source=os.getenv("EMAIL_SOURCE"), destination=destination,
+                                      template_name=template_name) for destination in destinations]
+            return self.send_bulk_templated_email(email_bodies, default_template_data=template_data)
+        except Exception as exception:
+            logger.error("send appconfig bulk template email fail.")
+            traceback.print_exc()
+        return None
+
+    @staticmethod
+    def appconfig_template(message):
+        """
+        Chooses the SES template and builds the template data for an AppConfig Deploy result.
+
+        :param message: the response information of AppConfig Deploy.
+        :return: tuple: the template name and the template data
+        """
+        if message.appconfig_state is AppconfigState.VERIFY_ERROR:
+            error_message_list = []
+            for key, value in message.error_message.items():
+                error_message_each_dict = {"row": key, "msg": ','.join(value)}
+                error_message_list.append(error_message_each_dict)
+            return "SendEmailAppConfigError", {"error_message": error_message_list}
+        common_dict = {"state": message.state, "msg": message.to_json()}
+        return "SendEmailAppConfigCommon", common_dict
+
+
+class MessageLayout:
+    """A message layout compiled once: the fixed text around the rows and the row separators."""
+
+    def __init__(self, header, row_start, row_middle, row_end, footer, escape=None):
+        """
+        :param header: The text before the rows, may contain a {} placeholder for the key or the details.
+        :param row_start: The text before the row name.
+        :param row_middle: The text between the row name and its messages.
+        :param row_end: The text after the row messages.
+        :param footer: The text after the rows.
+        :param escape: The function escaping the inserted values, None to insert them as they are.
+        """
+        self.header_parts = header.split("{}")
+        self.row_start = row_start
+        self.row_middle = row_middle
+        self.row_end = row_end
+        self.footer = footer
+        self.escape = escape
+
+    def header(self, value):
+        if self.escape is not None:
+            value = self.escape(value)
+        return value.join(self.header_parts)
+
+
+def _escape_html(value):
+    return html.escape(value, quote=False)
+
 
 class MessageFormat:
     """Message format output text and html."""
 
+    ERROR_TEXT = MessageLayout(
+        "Hello,\r\nVerification of uploaded excel file failed,details are as follows!\r\nkey:{}\r\n",
+        "", "    ", "\r\n", "")
+    ERROR_HTML = MessageLayout(
+        "<p>Hello!</p><p>Verification of uploaded excel file failed,details are as follows!</p><p>key:{}</p>"
+        "<table border='1'>",
+        "<tr><td>", "</td><td>", "</td></tr>", "</table>", _escape_html)
+    COMMON_TEXT = MessageLayout("Hello,\r\nDeploy details are as follows!\r\n{}", "", "", "", "")
+    COMMON_HTML = MessageLayout("<p>Hello!</p><p>Deploy details are as follows!</p><p>{}</p>", "", "", "", "",
+                                _escape_html)
+
     def __init__(self, appconfig_result):
         """
         param appconfig_result: the response information of AppConfig Deploy.
         """
         self.appconfig_result = appconfig_result
+        self._error_bodies = None
+        self._common_bodies = None
+
+    def render(self):
+        """
+        Renders the text and the HTML body matching the state of the result.
+
+        :return: tuple: the subject, the text body and the HTML body
+        """
+        if self.appconfig_result.appconfig_state is AppconfigState.VERIFY_ERROR:
+            return ("Appconfig deploy error notification.",) + self.render_error_message()
+        return ("Appconfig deploy " + self.appconfig_result.state + " notification.",) + \
+            self.render_common_message()
+
+    def render_error_message(self):
+        """
+        Renders both error bodies in a single pass over the error message.
+
+        :return: tuple: the text body and the HTML body
+        """
+        if self._error_bodies is None:
+            text, html_parts = self._render_rows(self.appconfig_result.error_message.items())
+            self._error_bodies = (''.join(text), ''.join(html_parts))
+        return self._error_bodies
+
+    def render_summary(self, preview_rows, attachment_name):
+        """
+        Renders the error bodies of a result whose rows are attached as a report:
+        the first rows followed by a pointer to the attachment.
+
+        :param preview_rows: The number of error rows listed in the bodies.
+        :param attachment_name: The file name of the attached report.
+        :return: tuple: the subject, the text body and the HTML body
+        """
+        error_message = self.appconfig_result.error_message
+        text, html_parts = self._render_rows(itertools.islice(error_message.items(), preview_rows))
+        note = "%d error rows in total, all of them are in the attached %s." % (len(error_message),
+                                                                              attachment_name)
+        text.append(note + "\r\n")
+        html_parts.append("<p>" + _escape_html(note) + "</p>")
+        return "Appconfig deploy error notification.", ''.join(text), ''.join(html_parts)
+
+    def _render_rows(self, rows):
+        """
+        :return: tuple: the text parts and the HTML parts of the error bodies
+        """
+        text_layout = self.ERROR_TEXT
+        html_layout = self.ERROR_HTML
+        key = self.appconfig_result.key
+        text = [text_layout.header(key)]
+        html_parts = [html_layout.header(key)]
+        for row, messages in rows:
+            message = ','.join(messages)
+            text += (text_layout.row_start, row, text_layout.row_middle, message, text_layout.row_end)
+            html_parts += (html_layout.row_start, _escape_html(row), html_layout.row_middle,
+                           _escape_html(message), html_layout.row_end)
+        text.append(text_layout.footer)
+        html_parts.append(html_layout.footer)
+        return text, html_parts
+
+    def render_common_message(self):
+        """
+        :return: tuple: the text body and the HTML body
+        """
+        if self._common_bodies is None:
+            details = self.appconfig_result.to_json()
+            self._common_bodies = (self.COMMON_TEXT.header(details), self.COMMON_HTML.header(details))
+        return self._common_bodies
 
     def error_message_html_format(self):
-        appconfig_result = self.appconfig_result
-        error_dict = appconfig_result.error_message
-        html = "<p>Hello!</p><p>Verification of uploaded excel file failed,details are as follows!</p><p>key:" \
-               + appconfig_result.key + "</p>"
-        table = "<table border='1'>"
-        for key, value in error_dict.items():
-            table += "<tr><td>" + key + "</td>"
-            table += "<td>" + ','.join(value) + "</td></tr>"
-
-        table += "</table>"
-        html += table
-        return html
+        return self.render_error_message()[1]
 
     def error_message_text_format(self):
-        appconfig_result = self.appconfig_result
-        error_dict = appconfig_result.error_message
-        text = "Hello,\r\n" + "Verification of uploaded excel file failed,details are as follows!\r\nkey:" \
-               + appconfig_result.key + "\r\n"
-        for key, value in error_dict.items():
-            text += key + "    " + ','.join(value) + "\r\n"
-        return text
+        return self.render_error_message()[0]
 
     def common_message_html_format(self):
-        html = "<p>Hello!</p><p>Deploy details are as follows!</p><p>" + json.dumps(
-            self.appconfig_result, default=AppConfigResult.convert2json) + "</p>"
-        return html
+        return self.render_common_message()[1]
 
     def common_message_text_format(self):
-        text = "Hello,\r\n" + "Deploy details are as follows!\r\n" + json.dumps(
-            self.appconfig_result, default=AppConfigResult.convert2json)
-        return text
+        return self.render_common_message()[0]
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """A thread-safe token bucket that limits how many operations run per second."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param rate: The number of tokens added to the bucket per second.
+        :param capacity: The maximum number of tokens the bucket holds, defaults to rate.
+        :param clock: The monotonic clock used to refill the bucket.
+        :param sleep: The function used to wait for tokens.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes tokens from the bucket without waiting.
+
+        :param tokens: The number of tokens to take.
+        :return: 0 if the tokens were taken, otherwise the seconds to wait before retrying.
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        Takes tokens from the bucket, waiting until enough of them are available.
+
+        :param tokens: The number of tokens to take.
+        """
+        wait = self.try_acquire(tokens)
+        while wait > 0:
+            self.sleep(wait)
+            wait = self.try_acquire(tokens)
+
+
+class SendEngine:
+    """Sends many emails concurrently through a SesMailSender while staying within the SES send quota."""
+
+    def __init__(self, sender, max_workers=10, max_send_rate=None):
+        """
+        :param sender: The SesMailSender used to send each email.
+        :param max_workers: The number of threads sending at the same time.
+        :param max_send_rate: The maximum number of emails sent per second, read from
+                              the MaxSendRate of the SES send quota when not given; no limit
+                              if the transport has none, such as an SmtpTransport without one.
+        """
+        self.sender = sender
+        if max_send_rate is None:
+            max_send_rate = sender.transport.get_send_quota()['MaxSendRate']
+            logger.info("Using SES max send rate %s.", max_send_rate)
+        self.bucket = TokenBucket(max_send_rate) if max_send_rate else None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ses-send")
+
+    def submit(self, email_body, send_method="send_email"):
+        """
+        Schedules an email to be sent.
+
+        :param email_body: The EmailBody, or the AppConfigResult for the send_appconfig_* methods.
+        :param send_method: The name of the SesMailSender method used to send it.
+        :return: A future resolving to the ID of the message, assigned by Amazon SES.
+        """
+        return self.executor.submit(self._send, getattr(self.sender, send_method), email_body)
+
+    def send_all(self, email_bodies, send_method="send_email"):
+        """
+        Sends all emails concurrently.
+
+        :param email_bodies: The EmailBody objects, or AppConfigResult objects for the send_appconfig_* methods.
+        :param send_method: The name of the SesMailSender method used to send them.
+        :return: An iterator of the message IDs in input order; an error raised by a send is
+                 raised when its result is reached.
+        """
+        futures = [self.submit(email_body, send_method) for email_body in email_bodies]
+        return (future.result() for future in futures)
+
+    def _send(self, send, email_body):
+        if self.bucket is not None:
+            self.bucket.acquire()
+        return send(email_body)
+
+    def shutdown(self, wait=True):
+        """
+        Stops the engine after the scheduled emails are sent.
+
+        :param wait: Whether to block until the scheduled emails are sent.
+        """
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
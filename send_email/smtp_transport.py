@@ -0,0 +1,231 @@
+import email.utils
+import io
+import json
+import logging
+import queue
+import smtplib
+import threading
+from email.parser import BytesHeaderParser
+
+from send_email.mime_report import RawMessageWriter
+
+logger = logging.getLogger(__name__)
+
+
+class SmtpTransport:
+    """
+    Sends the messages of a SesMailSender over SMTP, to the Amazon SES SMTP endpoint or any
+    relay. Authenticated connections are kept open in a pool and reused for many messages,
+    so a burst pays the TCP, TLS and AUTH handshakes once per connection instead of once
+    per message. SES templates are rendered locally with a TemplateRegistry.
+    """
+
+    def __init__(self, host, port=587, username=None, password=None, starttls=True, pool_size=4, timeout=30,
+                 template_registry=None, max_send_rate=None, smtp_factory=smtplib.SMTP):
+        """
+        :param host: The SMTP server, such as email-smtp.us-east-1.amazonaws.com.
+        :param port: The SMTP port.
+        :param username: The SMTP user name, None to send without AUTH.
+        :param password: The SMTP password.
+        :param starttls: Whether to upgrade the connections with STARTTLS before AUTH.
+        :param pool_size: The maximum number of connections open at the same time.
+        :param timeout: The socket timeout in seconds.
+        :param template_registry: A TemplateRegistry rendering the templated emails,
+                                  None if only non-templated emails are sent.
+        :param max_send_rate: The messages per second returned as MaxSendRate by get_send_quota.
+        :param smtp_factory: The function creating a connection from the host, port and timeout.
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.template_registry = template_registry
+        self.max_send_rate = max_send_rate
+        self.smtp_factory = smtp_factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def send_email(self, Source, Destination, Message, ReplyToAddresses=None, **kwargs):
+        """
+        Sends the message of a SendEmail call.
+
+        :return: dict: the MessageId, the Message-ID header of the sent message
+        """
+        body = Message['Body']
+        return self._send_message(Source, Destination, ReplyToAddresses, Message['Subject']['Data'],
+                                  body.get('Text', {}).get('Data', ''), body.get('Html', {}).get('Data', ''))
+
+    def send_templated_email(self, Source, Destination, Template, TemplateData, ReplyToAddresses=None, **kwargs):
+        """
+        Renders the template of a SendTemplatedEmail call with the template registry and sends it.
+
+        :return: dict: the MessageId, the Message-ID header of the sent message
+        """
+        subject, text, html_body = self._render(Template, json.loads(TemplateData))
+        return self._send_message(Source, Destination, ReplyToAddresses, subject, text, html_body)
+
+    def send_bulk_templated_email(self, Source, Template, Destinations, DefaultTemplateData='{}',
+                                  ReplyToAddresses=None, **kwargs):
+        """
+        Sends every destination of a SendBulkTemplatedEmail call over the pooled connections.
+
+        :return: dict: the Status list, one entry per destination
+        """
+        default_template_data = json.loads(DefaultTemplateData)
+        statuses = []
+        for destination in Destinations:
+            template_data = default_template_data
+            if 'ReplacementTemplateData' in destination:
+                template_data = dict(default_template_data, **json.loads(destination['ReplacementTemplateData']))
+            try:
+                subject, text, html_body = self._render(Template, template_data)
+                response = self._send_message(Source, destination['Destination'], ReplyToAddresses, subject, text,
+                                              html_body)
+            except self.error_types() as exception:
+                logger.warning("Couldn't send bulk mail over SMTP to %s: %s", destination['Destination'], exception)
+                statuses.append({'Status': 'Failed', 'Error': str(exception)})
+            else:
+                statuses.append({'Status': 'Success', 'MessageId': response['MessageId']})
+        return {'Status': statuses}
+
+    def send_raw_email(self, RawMessage, Source=None, Destinations=None, **kwargs):
+        """
+        Sends the message of a SendRawEmail call, taking the source and the destinations
+        from its headers when they are not given. Like Amazon SES, the Bcc recipients are
+        sent to and the Bcc header is removed from the sent message.
+
+        :return: dict: the MessageId, the Message-ID header of the sent message
+        """
+        data = RawMessage['Data']
+        headers = BytesHeaderParser().parsebytes(data)
+        if Source is None:
+            Source = email.utils.parseaddr(headers['From'])[1]
+        if Destinations is None:
+            Destinations = [address for _, address in email.utils.getaddresses(
+                headers.get_all('To', []) + headers.get_all('Cc', []) + headers.get_all('Bcc', []))]
+        if 'Bcc' in headers:
+            data = _strip_header(data, b'bcc')
+        message_id = headers['Message-ID']
+        if message_id is None:
+            message_id = email.utils.make_msgid(domain=Source.rpartition('@')[2] or None)
+            data = ("Message-ID: %s\r\n" % message_id).encode('ascii') + data
+        return self._send(Source, Destinations, data, message_id)
+
+    def get_send_quota(self):
+        return {'MaxSendRate': self.max_send_rate, 'Max24HourSend': -1.0, 'SentLast24Hours': 0.0}
+
+    @staticmethod
+    def error_types():
+        """
+        :return: tuple: the exception classes of a failed send, for use in except clauses
+        """
+        return smtplib.SMTPException, OSError
+
+    def close(self):
+        """
+        Closes the idle connections of the pool.
+        """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(connection)
+
+    def _render(self, template_name, template_data):
+        if self.template_registry is None:
+            raise ValueError("SmtpTransport needs a template registry to send templated emails.")
+        return self.template_registry.get(template_name).render(template_data)
+
+    def _send_message(self, source, destination, reply_tos, subject, text, html_body):
+        message_id = email.utils.make_msgid(domain=source.rpartition('@')[2] or None)
+        raw = io.BytesIO()
+        writer = RawMessageWriter(raw)
+        writer.write_headers(source, ",".join(destination.get('ToAddresses', [])), subject,
+                             cc=",".join(destination['CcAddresses']) if destination.get('CcAddresses') else None,
+                             reply_tos=",".join(reply_tos) if reply_tos else None, message_id=message_id)
+        writer.write_body(text, html_body)
+        writer.close()
+        recipients = destination.get('ToAddresses', []) + destination.get('CcAddresses', []) + \
+            destination.get('BccAddresses', [])
+        return self._send(source, recipients, raw.getvalue(), message_id)
+
+    def _send(self, source, recipients, data, message_id):
+        """
+        Sends over a pooled connection. A reused connection the server closed while it was
+        idle is dropped and the message is sent over another one.
+
+        :return: dict: the MessageId
+        """
+        with self._slots:
+            while True:
+                try:
+                    connection, reused = self._idle.get_nowait(), True
+                except queue.Empty:
+                    connection, reused = self._connect(), False
+                try:
+                    refused = connection.sendmail(source, recipients, data)
+                except smtplib.SMTPServerDisconnected:
+                    self._quit(connection)
+                    if reused:
+                        logger.debug("Idle SMTP connection to %s was closed, reconnecting.", self.host)
+                        continue
+                    raise
+                except smtplib.SMTPException:
+                    # sendmail resets the transaction before raising, the connection stays usable
+                    self._idle.put(connection)
+                    raise
+                except Exception:
+                    self._quit(connection)
+                    raise
+                self._idle.put(connection)
+                break
+        if refused:
+            logger.warning("SMTP server refused recipients %s of mail %s.", list(refused), message_id)
+        logger.info("Sent mail %s over SMTP from %s to %s recipients.", message_id, source, len(recipients))
+        return {'MessageId': message_id.strip('<>')}
+
+    def _connect(self):
+        connection = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                connection.starttls()
+            if self.username is not None:
+                connection.login(self.username, self.password)
+        except Exception:
+            self._quit(connection)
+            raise
+        logger.debug("Opened SMTP connection to %s:%s.", self.host, self.port)
+        return connection
+
+    @staticmethod
+    def _quit(connection):
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+
+def _strip_header(data, name):
+    """
+    Removes a header and its continuation lines from the header block of a raw message.
+
+    :param name: The lowercase header name, such as b'bcc'.
+    """
+    lines = data.splitlines(keepends=True)
+    kept = []
+    skipping = False
+    for index, line in enumerate(lines):
+        if line in (b"\r\n", b"\n"):
+            kept.extend(lines[index:])
+            break
+        if line[:1] in (b" ", b"\t"):
+            if not skipping:
+                kept.append(line)
+            continue
+        skipping = line.split(b":", 1)[0].strip().lower() == name
+        if not skipping:
+            kept.append(line)
+    return b"".join(kept)
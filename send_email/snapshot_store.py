@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+import logging
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+
+from send_email import client_pool
+from send_email.merge_index import KEY_FIELD, MergeIndex, fingerprint
+
+logger = logging.getLogger(__name__)
+
+# magic, format, marshal version, config version length, item count, keys length, items length
+_HEADER = struct.Struct('<4sBBHIQQ')
+_MAGIC = b'APSN'
+_FORMAT = 2
+_FINGERPRINT_SIZE = len(fingerprint({}))
+# The deployment states after which the deployed version is the one of the previous deployment.
+_REVERTED_STATES = {'ROLLED_BACK', 'REVERTED'}
+
+
+class Snapshot:
+    """The deployed config of a profile read from a snapshot file, with the fingerprints of its items"""
+
+    def __init__(self, profile_id, version, items, fingerprints):
+        """
+        :param version:the deployed configuration version
+        :param items:dict:key -> item in deployed order
+        :param fingerprints:dict:key -> fingerprint of the item
+        """
+        self.profile_id = profile_id
+        self.version = version
+        self.items = items
+        self.fingerprints = fingerprints
+
+    @property
+    def keys(self):
+        return list(self.items)
+
+    @property
+    def config_json(self):
+        """
+        :return: list:the deployed json data
+        """
+        return list(self.items.values())
+
+    def merge_index(self, key_field=KEY_FIELD):
+        """
+        :return: MergeIndex reusing the stored fingerprints instead of hashing every item again
+        """
+        return MergeIndex.from_index(self.items, self.fingerprints, key_field)
+
+
+class SnapshotStore:
+    """
+    Keep the last deployed config of every profile in a local binary file, so a merge can start
+    from the local copy instead of downloading and parsing the deployed configuration. A snapshot
+    is only used when its version is still the configuration version deployed to the environment.
+    """
+
+    def __init__(self, directory, key_field=KEY_FIELD):
+        """
+        :param directory:the directory holding one snapshot file per profile
+        :param key_field:the field identifying an item
+        """
+        self.directory = directory
+        self.key_field = key_field
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, profile_id):
+        return os.path.join(self.directory, "%s.snapshot" % profile_id)
+
+    def save(self, profile_id, version, config_json):
+        """
+         Store the deployed config of a profile, replacing the previous snapshot atomically
+        :param profile_id:AppConfig profile id
+        :param version:the deployed configuration version, AppConfigResult.version
+        :param config_json:the deployed json data
+        """
+        version_blob = str(version).encode('utf-8')
+        keys = [each_data[self.key_field] for each_data in config_json]
+        fingerprints = b''.join(fingerprint(each_data) for each_data in config_json)
+        keys_blob = marshal.dumps(keys)
+        items_blob = marshal.dumps(list(config_json))
+        header = _HEADER.pack(_MAGIC, _FORMAT, marshal.version, len(version_blob), len(keys), len(keys_blob),
+                              len(items_blob))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".%s." % profile_id)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                for part in (header, version_blob, fingerprints, keys_blob, items_blob):
+                    fp.write(part)
+            os.replace(tmp_path, self.path(profile_id))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        logger.info("saved snapshot of %s version %s with %s items", profile_id, version, len(keys))
+
+    def load(self, profile_id, version=None):
+        """
+         Read the snapshot of a profile. The file is memory-mapped and decoded without copying
+         it first, and unmapped before returning.
+        :param profile_id:AppConfig profile id
+        :param version:the required configuration version, any version if None
+        :return: Snapshot, None if missing, of another version or unreadable
+        """
+        try:
+            with open(self.path(profile_id), 'rb') as fp, \
+                    mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    return self._read(profile_id, view, version)
+                finally:
+                    view.release()
+        except (OSError, ValueError):
+            return None
+
+    def _read(self, profile_id, view, version):
+        if len(view) < _HEADER.size:
+            return None
+        magic, file_format, marshal_version, version_length, count, keys_length, items_length = \
+            _HEADER.unpack_from(view)
+        if (magic, file_format, marshal_version) != (_MAGIC, _FORMAT, marshal.version) or \
+                len(view) != _HEADER.size + version_length + count * _FINGERPRINT_SIZE + keys_length + items_length:
+            logger.warning("ignore unreadable snapshot of %s", profile_id)
+            return None
+        start = _HEADER.size
+        snapshot_version = bytes(view[start:start + version_length]).decode('utf-8')
+        if version is not None and snapshot_version != str(version):
+            return None
+        start += version_length
+        fingerprints_blob = bytes(view[start:start + count * _FINGERPRINT_SIZE])
+        start += count * _FINGERPRINT_SIZE
+        keys = marshal.loads(view[start:start + keys_length])
+        start += keys_length
+        items = dict(zip(keys, marshal.loads(view[start:start + items_length])))
+        fingerprints = {key: fingerprints_blob[index * _FINGERPRINT_SIZE:(index + 1) * _FINGERPRINT_SIZE]
+                        for index, key in enumerate(keys)}
+        return Snapshot(profile_id, snapshot_version, items, fingerprints)
+
+    def invalidate(self, profile_id):
+        try:
+            os.unlink(self.path(profile_id))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def deployed_version(profile_id, call=None, client=None):
+        """
+         Get the configuration version of a profile deployed to the environment, from the latest
+         completed deployment of the profile; the ListDeployments pages are read until a deployment
+         of the profile decides it. A rolled back deployment is skipped, as its previous version is the one deployed
+        :param profile_id:AppConfig profile id
+        :param call:function calling the AppConfig client, such as ResilientCaller.call
+        :param client:the AppConfig client, the pooled client of the calling thread if None
+        :return: str:the deployed version, None if unknown or a deployment of the profile is in progress
+        """
+        client = client or client_pool.get_client('appconfig')
+        call = call or (lambda func, **kwargs: func(**kwargs))
+        kwargs = {'ApplicationId': os.getenv("APP_CONFIG_APPLICATION_ID"),
+                  'EnvironmentId': os.getenv("APP_CONFIG_ENVIRONMENT_ID")}
+        # the pages are requested one by one through call rather than with a paginator,
+        # so each ListDeployments call is retried on its own
+        while True:
+            response = call(client.list_deployments, **kwargs)
+            # the deployments are listed newest first
+            for deployment in response.get('Items', []):
+                if deployment.get('ConfigurationProfileId') != profile_id or deployment['State'] in _REVERTED_STATES:
+                    continue
+                if deployment['State'] == 'COMPLETE':
+                    return deployment['ConfigurationVersion']
+                return None
+            if not response.get('NextToken'):
+                return None
+            kwargs['NextToken'] = response['NextToken']
+
+    def load_latest(self, profile_id, call=None, client=None):
+        """
+         Read the snapshot of a profile if it holds the configuration version deployed to the environment
+        :param profile_id:AppConfig profile id
+        :param call:function calling the AppConfig client, such as ResilientCaller.call
+        :param client:the AppConfig client, the pooled client of the calling thread if None
+        :return: Snapshot, None if missing or outdated
+        """
+        if not os.path.exists(self.path(profile_id)):
+            return None
+        version = self.deployed_version(profile_id, call, client)
+        if version is None:
+            return None
+        snapshot = self.load(profile_id, version)
+        if snapshot is None:
+            logger.info("snapshot of %s is not version %s", profile_id, version)
+        return snapshot
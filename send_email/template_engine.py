@@ -0,0 +1,225 @@
+import functools
+import html
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# The TemplateData of a SendTemplatedEmail call is limited to 262144 characters.
+MAX_TEMPLATE_DATA_LENGTH = 262144
+# The maximum size of a message sent through Amazon SES.
+MAX_MESSAGE_SIZE = 10 * 1024 * 1024
+
+_TAG = re.compile(r"\{\{\{\s*(?P<raw>[^}]+?)\s*\}\}\}|\{\{\s*(?P<tag>[^}]+?)\s*\}\}")
+
+
+class TemplateError(Exception):
+    """Raised when a template can't be parsed or rendered with the given template data."""
+
+
+class LocalTemplate:
+    """
+    An Amazon SES template compiled for client side rendering. Supports the handlebars
+    tags used by SES templates: {{var}}, {{{raw}}}, dotted paths, {{this}}, {{@index}},
+    {{#each list}}, {{#if value}} and {{else}}. Values are HTML-escaped in the HTML part only
+    and, like Amazon SES, a missing value fails the rendering.
+
+    :param name: The name of the template.
+    :param subject_part: The subject line of the template.
+    :param text_part: The plain text body of the template.
+    :param html_part: The HTML body of the template.
+    """
+
+    def __init__(self, name, subject_part=None, text_part=None, html_part=None):
+        self.name = name
+        self.subject = compile_template(subject_part or "")
+        self.text = compile_template(text_part or "")
+        self.html = compile_template(html_part or "")
+
+    @classmethod
+    def from_service_format(cls, template):
+        """
+        :param template: The Template dict returned by the Amazon SES get_template call.
+        """
+        return cls(template['TemplateName'], template.get('SubjectPart'), template.get('TextPart'),
+                   template.get('HtmlPart'))
+
+    def render(self, template_data):
+        """
+        Renders the template.
+
+        :param template_data: The key-value pairs inserted in the template.
+        :return: tuple: the subject, the text body and the HTML body
+        """
+        context = _Context(template_data, None, None)
+        return (_render(self.subject, context, False), _render(self.text, context, False),
+                _render(self.html, context, True))
+
+
+class TemplateRegistry:
+    """Caches the compiled templates, fetching the ones not registered locally from Amazon SES once."""
+
+    def __init__(self, ses_client=None):
+        """
+        :param ses_client: A Boto3 Amazon SES client used to fetch unknown templates,
+                           None to only use registered templates.
+        """
+        self.ses_client = ses_client
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def register(self, template):
+        """
+        :param template: The LocalTemplate to use for its name.
+        """
+        with self._lock:
+            self._templates[template.name] = template
+
+    def get(self, name):
+        """
+        :param name: The name of the template.
+        :return: The compiled LocalTemplate.
+        """
+        template = self._templates.get(name)
+        if template is None:
+            if self.ses_client is None:
+                raise TemplateError("Template %s is not registered." % name)
+            response = self.ses_client.get_template(TemplateName=name)
+            template = LocalTemplate.from_service_format(response['Template'])
+            logger.info("Fetched and compiled template %s.", name)
+            self.register(template)
+        return template
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(source):
+    """
+    Parses a template part into its compiled form, a tuple of literal strings and tag nodes.
+    The result is cached by source, so each distinct part is parsed once.
+
+    :param source: The template part.
+    :return: The compiled template part.
+    """
+    root = []
+    stack = [(None, None, root)]
+    position = 0
+    for match in _TAG.finditer(source):
+        if match.start() > position:
+            stack[-1][2].append(source[position:match.start()])
+        position = match.end()
+        if match.group('raw') is not None:
+            stack[-1][2].append(('var', _path(match.group('raw')), False))
+            continue
+        tag = match.group('tag')
+        if tag.startswith('#'):
+            block, _, argument = tag[1:].partition(' ')
+            if block not in ('each', 'if') or not argument.strip():
+                raise TemplateError("Unsupported block {{%s}}." % tag)
+            node = [block, _path(argument.strip()), [], None]
+            stack[-1][2].append(node)
+            stack.append((block, node, node[2]))
+        elif tag == 'else':
+            block, node, _ = stack[-1]
+            if block is None or node[3] is not None:
+                raise TemplateError("Unexpected {{else}}.")
+            node[3] = []
+            stack[-1] = (block, node, node[3])
+        elif tag.startswith('/'):
+            if stack[-1][0] != tag[1:].strip():
+                raise TemplateError("Unexpected {{%s}}." % tag)
+            stack.pop()
+        else:
+            stack[-1][2].append(('var', _path(tag), True))
+    if len(stack) > 1:
+        raise TemplateError("Unclosed {{#%s}}." % stack[-1][0])
+    if position < len(source):
+        root.append(source[position:])
+    return _freeze(root)
+
+
+def _path(expression):
+    if expression == 'this' or expression == '.':
+        return ()
+    if expression.startswith('this.'):
+        expression = expression[len('this.'):]
+    return tuple(expression.split('.'))
+
+
+def _freeze(nodes):
+    frozen = []
+    for node in nodes:
+        if isinstance(node, list):
+            node = (node[0], node[1], _freeze(node[2]), _freeze(node[3]) if node[3] is not None else ())
+        frozen.append(node)
+    return tuple(frozen)
+
+
+class _Context:
+    __slots__ = ('value', 'parent', 'index')
+
+    def __init__(self, value, parent, index):
+        self.value = value
+        self.parent = parent
+        self.index = index
+
+    def lookup(self, path, strict):
+        """
+        Names missing from an {{#each}} item are looked up in the enclosing data.
+        """
+        if path == ('@index',):
+            return self.index
+        if not path:
+            return self.value
+        context = self
+        while not (isinstance(context.value, dict) and path[0] in context.value):
+            context = context.parent
+            if context is None:
+                if strict:
+                    raise TemplateError("Template data has no value for %s." % '.'.join(path))
+                return None
+        value = context.value
+        for part in path:
+            if isinstance(value, dict) and part in value:
+                value = value[part]
+            elif strict:
+                raise TemplateError("Template data has no value for %s." % '.'.join(path))
+            else:
+                return None
+        return value
+
+
+def _render(nodes, context, escape):
+    out = []
+    _render_into(out, nodes, context, escape)
+    return ''.join(out)
+
+
+def _render_into(out, nodes, context, escape):
+    for node in nodes:
+        if isinstance(node, str):
+            out.append(node)
+        elif node[0] == 'var':
+            value = _stringify(context.lookup(node[1], True))
+            out.append(html.escape(value) if escape and node[2] else value)
+        elif node[0] == 'each':
+            items = context.lookup(node[1], False)
+            if items:
+                if not isinstance(items, (list, dict)):
+                    raise TemplateError("{{#each %s}} needs a list." % '.'.join(node[1]))
+                for index, item in enumerate(items.values() if isinstance(items, dict) else items):
+                    _render_into(out, node[2], _Context(item, context, index), escape)
+            else:
+                _render_into(out, node[3], context, escape)
+        else:
+            _render_into(out, node[2] if context.lookup(node[1], False) else node[3], context, escape)
+
+
+def _stringify(value):
+    if value is None:
+        return ''
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    return str(value)
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import unittest
+
+import boto3
+
+from send_email.async_send_email import AsyncSesMailSender
+from send_email.send_email_common import EmailBody, SesMailSender
+
+os.environ['EMAIL_SOURCE'] = "xu.liang@cienet.com.cn"
+os.environ['EMAIL_DESTINATION'] = "xu@229"
+from botocore.exceptions import ClientError
+from moto import mock_ses
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+
+
+class TestAsyncSendMail(unittest.TestCase):
+
+    @mock_ses
+    def test_send_email(self):
+        conn = boto3.client("ses", region_name="us-east-2")
+        sender = AsyncSesMailSender(SesMailSender(conn), max_concurrency=4)
+        email_bodies = [EmailBody(source="xu.liang@cienet.com.cn",
+                                  destination="user%d@163.com" % index,
+                                  subject="subject",
+                                  text="text",
+                                  html="<p>html</p>")
+                        for index in range(10)]
+
+        with self.assertRaises(ClientError):
+            asyncio.run(sender.send_email(email_bodies[0]))
+
+        conn.verify_email_address(EmailAddress="xu.liang@cienet.com.cn")
+
+        async def send_all():
+            return await asyncio.gather(*(sender.send_email(email_body) for email_body in email_bodies))
+
+        message_ids = asyncio.run(send_all())
+        sender.close()
+        self.assertEqual(len(set(message_ids)), 10)
+
+        send_quota = conn.get_send_quota()
+        self.assertEqual(int(send_quota["SentLast24Hours"]), 10)
+
+    @mock_ses
+    def test_send_appconfig_templated_email(self):
+        conn = boto3.client("ses")
+        conn.verify_email_address(EmailAddress="xu.liang@cienet.com.cn")
+        conn.create_template(
+            Template={
+                "TemplateName": "SendEmailAppConfigCommon",
+                "SubjectPart": "lalala",
+                "HtmlPart": "1111",
+                "TextPart": "1111",
+            }
+        )
+        appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.COMPLETE.value, {},
+                                           "shipoption/test1.json")
+        sender = AsyncSesMailSender(SesMailSender(conn))
+
+        message_id = asyncio.run(sender.send_appconfig_templated_email(appconfig_result))
+        sender.close()
+        self.assertIsNotNone(message_id)
+
+        send_quota = conn.get_send_quota()
+        self.assertEqual(int(send_quota["SentLast24Hours"]), 1)
+
+    def test_send_email_in_several_loops(self):
+        class EchoSender:
+            def send_email(self, email_body):
+                return email_body
+
+        sender = AsyncSesMailSender(EchoSender(), max_concurrency=1)
+
+        async def send_all():
+            return await asyncio.gather(*(sender.send_email(index) for index in range(4)))
+
+        self.assertEqual(asyncio.run(send_all()), [0, 1, 2, 3])
+        self.assertEqual(asyncio.run(send_all()), [0, 1, 2, 3])
+        sender.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import threading
+import unittest
+
+from send_email import client_pool
+from send_email.send_email_common import SesMailSender
+
+
+class TestClientPool(unittest.TestCase):
+
+    def tearDown(self):
+        client_pool.configure(max_pool_connections=10)
+
+    def test_client_reused_per_thread(self):
+        client = client_pool.get_client("ses", region_name="us-east-2")
+        self.assertIs(client_pool.get_client("ses", region_name="us-east-2"), client)
+        self.assertIsNot(client_pool.get_client("ses", region_name="us-west-2"), client)
+
+        other_thread_clients = []
+        thread = threading.Thread(
+            target=lambda: other_thread_clients.append(client_pool.get_client("ses", region_name="us-east-2")))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other_thread_clients[0], client)
+
+    def test_configure(self):
+        client = client_pool.get_client("ses", region_name="us-east-2")
+        client_pool.configure(max_pool_connections=50)
+        configured_client = client_pool.get_client("ses", region_name="us-east-2")
+        self.assertIsNot(configured_client, client)
+        self.assertEqual(configured_client.meta.config.max_pool_connections, 50)
+        self.assertTrue(configured_client.meta.config.tcp_keepalive)
+
+        client_pool.reset()
+        self.assertIsNot(client_pool.get_client("ses", region_name="us-east-2"), configured_client)
+
+    def test_client_without_retries(self):
+        client = client_pool.get_client("ses", region_name="us-east-2", retry=False)
+        self.assertIsNot(client, client_pool.get_client("ses", region_name="us-east-2"))
+        self.assertEqual(client.meta.config.retries['total_max_attempts'], 1)
+        self.assertIs(SesMailSender(resilience=object()).ses_client, client_pool.get_client("ses", retry=False))
+
+    def test_configured_retries(self):
+        self.addCleanup(client_pool._client_config.pop, 'retries', None)
+        client_pool.configure(retries={'max_attempts': 3})
+        # botocore counts the first attempt in total_max_attempts
+        client = client_pool.get_client("ses", region_name="us-east-2")
+        self.assertEqual(client.meta.config.retries['total_max_attempts'], 4)
+        client = client_pool.get_client("ses", region_name="us-east-2", retry=False)
+        self.assertEqual(client.meta.config.retries['total_max_attempts'], 1)
+
+    def test_sender_uses_pool_lazily(self):
+        sender = SesMailSender()
+        self.assertIs(sender.ses_client, client_pool.get_client("ses"))
+
+
+if __name__ == '__main__':
+    unittest.main()
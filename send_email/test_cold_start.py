@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORMAT_ONLY = """
+import sys
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+from send_email import json_convert_appconfig, merge_index
+from send_email.send_email_common import MessageFormat, SesMailSender
+
+result = AppConfigResult(0, "12", "123", "12345", AppconfigState.VERIFY_ERROR.value,
+                         {"This sheet 2th row has error": ["Ship Option ID is not null"]}, "shipoption/test1.json")
+MessageFormat(result).render()
+SesMailSender()
+json_convert_appconfig.ApConfigJsonConvert([{"shipOptionID": 1}], "profile_id").merge([])
+print(",".join(module for module in ("boto3", "botocore", "json_tools") if module in sys.modules))
+"""
+
+
+class TestColdStart(unittest.TestCase):
+
+    def test_format_only_import_skips_aws_sdk(self):
+        output = subprocess.run([sys.executable, "-c", FORMAT_ONLY], cwd=ROOT, check=True, capture_output=True,
+                                text=True).stdout
+        self.assertEqual(output.strip(), "")
+
+    def test_client_error_is_lazy(self):
+        from botocore.exceptions import ClientError
+
+        from send_email import client_pool, send_email_common
+        self.assertIs(send_email_common.ClientError, ClientError)
+        self.assertIs(client_pool.ClientError, ClientError)
+        self.assertIn('ClientError', vars(client_pool))
+        self.assertRaises(AttributeError, getattr, client_pool, "Missing")
+        self.assertRaises(AttributeError, getattr, send_email_common, "Missing")
+
+
+if __name__ == '__main__':
+    unittest.main()
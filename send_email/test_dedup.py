@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+import boto3
+
+from send_email.dedup import MemoryDedupStore, SendDedupCache, SqliteDedupStore, result_fingerprint
+from send_email.send_email_common import SesMailSender
+
+os.environ['EMAIL_SOURCE'] = "xu.liang@cienet.com.cn"
+os.environ['EMAIL_DESTINATION'] = "xu@229"
+from moto import mock_ses
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+
+
+def appconfig_result(version=0, error_message=None):
+    return AppConfigResult(version, "12", "123", "12345", AppconfigState.VERIFY_ERROR.value,
+                           error_message or {'This sheet 2th row has error': ['Ship Option ID is not null']},
+                           "shipoption/test1.json")
+
+
+class TestDedup(unittest.TestCase):
+
+    def test_fingerprint(self):
+        self.assertEqual(result_fingerprint(appconfig_result()), result_fingerprint(appconfig_result()))
+        self.assertNotEqual(result_fingerprint(appconfig_result()), result_fingerprint(appconfig_result(1)))
+        self.assertNotEqual(result_fingerprint(appconfig_result()),
+                            result_fingerprint(appconfig_result(error_message={'row': ['other']})))
+
+    def test_memory_store_ttl_and_lru(self):
+        now = [0]
+        cache = SendDedupCache(MemoryDedupStore(max_size=2), ttl_seconds=10, clock=lambda: now[0])
+        cache.remember(appconfig_result(0), "id-0")
+        cache.remember(appconfig_result(1), "id-1")
+        self.assertEqual(cache.lookup(appconfig_result(0)), "id-0")
+        cache.remember(appconfig_result(2), "id-2")
+        self.assertIsNone(cache.lookup(appconfig_result(1)))
+        self.assertEqual(cache.lookup(appconfig_result(0)), "id-0")
+
+        now[0] = 10
+        self.assertIsNone(cache.lookup(appconfig_result(0)))
+
+    def test_sqlite_store_shared(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dedup.db")
+            now = [0]
+            SendDedupCache(SqliteDedupStore(path), clock=lambda: now[0]).remember(appconfig_result(), "id-0")
+            store = SqliteDedupStore(path, max_size=1)
+            cache = SendDedupCache(store, ttl_seconds=10, clock=lambda: now[0])
+            self.assertEqual(cache.lookup(appconfig_result()), "id-0")
+            now[0] = 1
+            cache.remember(appconfig_result(1), "id-1")
+            store.evict(now[0])
+            self.assertIsNone(cache.lookup(appconfig_result()))
+            self.assertEqual(cache.lookup(appconfig_result(1)), "id-1")
+
+            now[0] = 11
+            self.assertIsNone(cache.lookup(appconfig_result(1)))
+
+    @mock_ses
+    def test_sender_skips_duplicates(self):
+        conn = boto3.client("ses", region_name="us-east-1")
+        conn.verify_email_address(EmailAddress="xu.liang@cienet.com.cn")
+        sender = SesMailSender(conn, dedup_cache=SendDedupCache())
+
+        message_id = sender.send_appconfig_email(appconfig_result())
+        self.assertIsNotNone(message_id)
+        self.assertEqual(sender.send_appconfig_email(appconfig_result()), message_id)
+        self.assertNotEqual(sender.send_appconfig_email(appconfig_result(1)), message_id)
+
+        send_quota = conn.get_send_quota()
+        self.assertEqual(int(send_quota["SentLast24Hours"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import unittest
+
+import boto3
+
+from send_email.digest import DigestAggregator
+from send_email.send_email_common import SesMailSender
+
+os.environ['EMAIL_SOURCE'] = "xu.liang@cienet.com.cn"
+os.environ['EMAIL_DESTINATION'] = "xu@229"
+from moto import mock_ses
+from moto.ses import ses_backends
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+
+
+def appconfig_result(state, key, error_message=None):
+    return AppConfigResult(0, "12", "123", "12345", state.value, error_message or {}, key)
+
+
+class TestDigest(unittest.TestCase):
+
+    @mock_ses
+    def test_digest_by_state_and_destination(self):
+        conn = boto3.client("ses", region_name="us-east-1")
+        conn.verify_email_address(EmailAddress="xu.liang@cienet.com.cn")
+        now = [0]
+        aggregator = DigestAggregator(SesMailSender(conn), window_seconds=10, max_count=3, background=False,
+                                      clock=lambda: now[0])
+
+        aggregator.add(appconfig_result(AppconfigState.COMPLETE, "a.json"))
+        aggregator.add(appconfig_result(AppconfigState.COMPLETE, "b.json"))
+        aggregator.add(appconfig_result(AppconfigState.COMPLETE, "c.json"), destination="other@163.com")
+        aggregator.add(appconfig_result(AppconfigState.VERIFY_ERROR, "d.json",
+                                        {'This sheet 2th row has error': ['Ship Option ID is not null']}))
+        self.assertEqual(int(conn.get_send_quota()["SentLast24Hours"]), 0)
+
+        now[0] = 10
+        message_ids = aggregator.flush_expired()
+        self.assertEqual(len(message_ids), 3)
+        sent = ses_backends["123456789012"]["us-east-1"].sent_messages
+        subjects = sorted(message.subject for message in sent)
+        self.assertEqual(subjects, ["Appconfig deploy COMPLETE digest: 1 notifications.",
+                                    "Appconfig deploy COMPLETE digest: 2 notifications.",
+                                    "Appconfig deploy error digest: 1 notifications."])
+        complete = [message for message in sent if "2 notifications" in message.subject][0]
+        self.assertIn("a.json", complete.body)
+        self.assertIn("b.json", complete.body)
+
+    @mock_ses
+    def test_count_window_and_close(self):
+        conn = boto3.client("ses", region_name="us-east-1")
+        conn.verify_email_address(EmailAddress="xu.liang@cienet.com.cn")
+        with DigestAggregator(SesMailSender(conn), window_seconds=3600, max_count=2) as aggregator:
+            for key in ("a.json", "b.json", "c.json"):
+                aggregator.add(appconfig_result(AppconfigState.NO_CHANGED, key))
+            self.assertEqual(int(conn.get_send_quota()["SentLast24Hours"]), 1)
+        self.assertEqual(int(conn.get_send_quota()["SentLast24Hours"]), 2)
+        self.assertEqual(aggregator.flush(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
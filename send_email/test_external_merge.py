@@ -0,0 +1,72 @@
+import heapq
+import io
+import json
+import random
+import unittest
+from unittest.mock import patch
+
+from send_email.external_merge import ExternalMerge
+from send_email.json_convert_appconfig import ApConfigJsonConvert
+from send_email.merge_index import MergeIndex
+
+
+def ship_option(ship_id, max_days):
+    return {"shipOptionID": ship_id, "shipOptionName": "Option %s" % ship_id, "shipOptionMaxTransitTimeasDays": max_days}
+
+
+class TestExternalMerge(unittest.TestCase):
+
+    def assert_same_as_merge_index(self, config_json, list_obj, **options):
+        expected, expected_num = MergeIndex(config_json).merge(list_obj)
+        output = io.StringIO()
+        change_num = ExternalMerge(**options).merge(iter(config_json), iter(list_obj), output)
+        self.assertEqual(json.loads(output.getvalue()), list(expected.values()))
+        self.assertEqual(change_num, expected_num)
+
+    def test_merge(self):
+        rand = random.Random(7)
+        config_json = [ship_option(ship_id, rand.randint(1, 3)) for ship_id in range(300)]
+        list_obj = [ship_option(rand.randint(0, 400), rand.randint(1, 3)) for _ in range(200)]
+        list_obj += [ship_option("new", 1), ship_option("new", 2), ship_option(5, 1.0)]
+        self.assert_same_as_merge_index(config_json, list_obj)
+        self.assert_same_as_merge_index(config_json, list_obj, memory_budget=500, partitions=3)
+        self.assert_same_as_merge_index(config_json + [ship_option(3, 9)], list_obj, memory_budget=2000,
+                                        partitions=2)
+
+    def test_bounded_fan_in(self):
+        rand = random.Random(11)
+        config_json = [ship_option(ship_id, rand.randint(1, 3)) for ship_id in range(400)]
+        list_obj = [ship_option(rand.randint(0, 500), rand.randint(1, 3)) for _ in range(300)]
+        fan_ins = []
+        heapq_merge = heapq.merge
+
+        def merge(*iterables, **kwargs):
+            fan_ins.append(len(iterables))
+            return heapq_merge(*iterables, **kwargs)
+
+        with patch('send_email.external_merge.heapq.merge', merge):
+            self.assert_same_as_merge_index(config_json, list_obj, memory_budget=20000, partitions=4, max_fan_in=3)
+        self.assertGreater(len(fan_ins), 1)
+        self.assertLessEqual(max(fan_ins), 3)
+        self.assertRaises(ValueError, ExternalMerge, max_fan_in=1)
+
+    def test_merge_empty(self):
+        self.assert_same_as_merge_index([], [])
+        self.assert_same_as_merge_index([], [ship_option(1, 1)], partitions=1)
+        self.assert_same_as_merge_index([ship_option(1, 1)], [ship_option(1, 1)])
+
+    def test_merge_out_of_core(self):
+        config_json = [ship_option(ship_id, 3) for ship_id in range(50)]
+        upload = [ship_option(60, 1), ship_option(2, 1), ship_option(3, 3)]
+        output = io.BytesIO()
+        with patch.object(ApConfigJsonConvert, 'iter_config', return_value=iter(config_json)):
+            change_num = ApConfigJsonConvert(upload, "profile_id").merge_out_of_core(output, memory_budget=300)
+        self.assertEqual(change_num, 2)
+        merged = json.loads(output.getvalue())
+        self.assertEqual(merged[2], ship_option(2, 1))
+        self.assertEqual(merged[-1], ship_option(60, 1))
+        self.assertEqual(len(merged), 51)
+
+
+if __name__ == '__main__':
+    unittest.main()
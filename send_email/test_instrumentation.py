@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import Mock
+
+from send_email import instrumentation
+from send_email.instrumentation import Histogram
+from send_email.json_convert_appconfig import ApConfigJsonConvert
+from send_email.send_email_common import EmailBody, SesMailSender
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_histogram(self):
+        histogram = Histogram(reservoir_size=100)
+        for millis in range(1, 101):
+            histogram.record(millis / 1000)
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["p50"], 0.051)
+        self.assertAlmostEqual(summary["p95"], 0.096)
+        self.assertAlmostEqual(summary["p99"], 0.1)
+        self.assertAlmostEqual(summary["max"], 0.1)
+        self.assertEqual(Histogram().summary()["p99"], 0.0)
+
+    def test_disabled_by_default(self):
+        self.assertIs(instrumentation.span("a"), instrumentation.span("b"))
+        with instrumentation.span("a"):
+            pass
+        self.assertEqual(instrumentation.snapshot(), {})
+
+    def test_spans_and_exporter(self):
+        exported = []
+        instrumentation.enable(lambda name, seconds: exported.append(name))
+
+        ApConfigJsonConvert([{"shipOptionID": 1}], "profile_id").merge([])
+        ses_client = Mock()
+        ses_client.send_templated_email.return_value = {"MessageId": "id-1"}
+        SesMailSender(ses_client).send_templated_email(EmailBody(source="a@163.com", destination="b@163.com",
+                                                                 template_name="MyTemplate", template_data={}))
+
+        self.assertEqual(exported, ["convert_and_merge.index", "convert_and_merge.merge",
+                                    "send_templated_email.template_data", "send_templated_email.ses"])
+        self.assertEqual(instrumentation.snapshot()["send_templated_email.ses"]["count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
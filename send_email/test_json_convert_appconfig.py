@@ -1,13 +1,15 @@
+import asyncio
 import json
 import unittest
-from io import StringIO
+from io import BytesIO, StringIO
 from unittest.mock import patch, call
 
 import botocore
 from coverage.annotate import os
 from moto.cloudwatch.exceptions import ResourceNotFoundException
 
-from send_email.json_convert_appconfig import ApConfigJsonConvert
+from send_email.json_convert_appconfig import ApConfigJsonConvert, AsyncApConfigJsonConvert, ConfigSessionCache
+from send_email.resilience import ResilientCaller
 
 os.environ['APP_CONFIG_APPLICATION_ID'] = "swwi0e4"
 os.environ['APP_CONFIG_ENVIRONMENT_ID'] = "qn1133e"
@@ -111,6 +113,158 @@ class TestJsonConvert(unittest.TestCase):
         self.assertEqual(len(result), 2)
         assert boto_mock.call_count == 2
 
+        change_set = appConfig_json_convert.merge(result, change_set=True)
+        self.assertIs(change_set.merged, result)
+        self.assertEqual(change_set.unchanged, [1, 2])
+        self.assertEqual(change_set.change_num, 0)
+
+    def test_async_json_convert(self, boto_mock):
+
+        response_start = {'InitialConfigurationToken': "QQQQwww"}
+
+        response_config_str = '''
+                [
+                    {
+                        "shipOptionID": 1,
+                        "shipOptionName": "Standard",
+                        "shipOptionMinTransitTimeasDays": 3,
+                        "shipOptionMaxTransitTimeasDays": 5
+                    }
+                ]
+                '''
+        response_body = botocore.response.StreamingBody(StringIO(response_config_str),
+                                                        len(str(response_config_str)))
+        response_config = {"Configuration": response_body}
+        boto_mock.side_effect = [response_start, response_config]
+
+        event_list = [
+            {
+                "shipOptionID": 2,
+                "shipOptionName": "Expedite",
+                "shipOptionMinTransitTimeasDays": 2,
+                "shipOptionMaxTransitTimeasDays": 3
+            }
+        ]
+
+        async def convert():
+            semaphore = asyncio.Semaphore(2)
+            return await AsyncApConfigJsonConvert(event_list, "profile_id", semaphore).convert_and_merge_async()
+
+        result = asyncio.run(convert())
+        self.assertEqual([item["shipOptionID"] for item in result], [1, 2])
+        assert boto_mock.call_count == 2
+
+    def test_merge_to_stream(self, boto_mock):
+        response_config_str = json.dumps([
+            {"shipOptionID": 1, "shipOptionName": "Standard",
+             "shipOptionMinTransitTimeasDays": 3, "shipOptionMaxTransitTimeasDays": 5},
+            {"shipOptionID": 2, "shipOptionName": "Expedite",
+             "shipOptionMinTransitTimeasDays": 2, "shipOptionMaxTransitTimeasDays": 3}
+        ])
+        event_list = [
+            {"shipOptionID": 11, "shipOptionName": "Standard",
+             "shipOptionMinTransitTimeasDays": 3, "shipOptionMaxTransitTimeasDays": 5},
+            {"shipOptionID": 2, "shipOptionName": "Expedite",
+             "shipOptionMinTransitTimeasDays": 2, "shipOptionMaxTransitTimeasDays": 31}
+        ]
+
+        def responses():
+            response_body = botocore.response.StreamingBody(BytesIO(response_config_str.encode()),
+                                                            len(response_config_str))
+            return [{'InitialConfigurationToken': "QQQQwww"}, {"Configuration": response_body}]
+
+        boto_mock.side_effect = responses()
+        expected = ApConfigJsonConvert(event_list, "profile_id").convert_and_merge()
+
+        boto_mock.side_effect = responses()
+        upload = BytesIO(json.dumps(event_list).encode())
+        output = StringIO()
+        change_num = ApConfigJsonConvert(upload, "profile_id").merge_to_stream(output)
+        self.assertEqual(change_num, 2)
+        self.assertEqual(json.loads(output.getvalue()), expected)
+
+    def test_merge_to_stream_repeated_key(self, boto_mock):
+        response_config_str = json.dumps([{"shipOptionID": 1, "shipOptionName": "Standard"},
+                                          {"shipOptionID": 2, "shipOptionName": "Expedite"},
+                                          {"shipOptionID": 1, "shipOptionName": "Economy"}])
+        event_list = [{"shipOptionID": 2, "shipOptionName": "Express"}]
+
+        def responses():
+            response_body = botocore.response.StreamingBody(BytesIO(response_config_str.encode()),
+                                                            len(response_config_str))
+            return [{'InitialConfigurationToken': "QQQQwww"}, {"Configuration": response_body}]
+
+        boto_mock.side_effect = responses()
+        expected = ApConfigJsonConvert(event_list, "profile_id").convert_and_merge()
+
+        boto_mock.side_effect = responses()
+        output = StringIO()
+        change_num = ApConfigJsonConvert(event_list, "profile_id").merge_to_stream(output)
+        self.assertEqual(change_num, 1)
+        self.assertEqual(json.loads(output.getvalue()), expected)
+        self.assertEqual(expected, [{"shipOptionID": 1, "shipOptionName": "Economy"},
+                                    {"shipOptionID": 2, "shipOptionName": "Express"}])
+
+    def test_session_cache(self, boto_mock):
+        response_config_str = '''
+                [
+                    {
+                        "shipOptionID": 1,
+                        "shipOptionName": "Standard",
+                        "shipOptionMinTransitTimeasDays": 3,
+                        "shipOptionMaxTransitTimeasDays": 5
+                    }
+                ]
+                '''
+        clock = [0]
+        session_cache = ConfigSessionCache(clock=lambda: clock[0])
+
+        def config_response(content):
+            return {"Configuration": botocore.response.StreamingBody(StringIO(content), len(content)),
+                    "NextPollConfigurationToken": "token", "NextPollIntervalInSeconds": 15}
+
+        expired = botocore.exceptions.ClientError({"Error": {"Code": "BadRequestException"}},
+                                                  "GetLatestConfiguration")
+        boto_mock.side_effect = [{'InitialConfigurationToken': "QQQQwww"}, config_response(response_config_str),
+                                 config_response(""),
+                                 expired, {'InitialConfigurationToken': "QQQQwww"},
+                                 config_response(response_config_str)]
+
+        event_list = [{"shipOptionID": 1, "shipOptionName": "Standard",
+                       "shipOptionMinTransitTimeasDays": 3, "shipOptionMaxTransitTimeasDays": 5}]
+        appConfig_json_convert = ApConfigJsonConvert(event_list, "profile_id", session_cache=session_cache)
+        config_json = appConfig_json_convert.get_config()
+        self.assertEqual(len(config_json), 1)
+        assert boto_mock.call_count == 2
+
+        self.assertIs(appConfig_json_convert.convert_and_merge(), config_json)
+        assert boto_mock.call_count == 2
+
+        clock[0] = 15
+        self.assertIs(appConfig_json_convert.get_config(), config_json)
+        assert boto_mock.call_count == 3
+
+        clock[0] = 30
+        self.assertEqual(appConfig_json_convert.get_config(), config_json)
+        assert boto_mock.call_count == 6
+
+        session_cache.invalidate("profile_id")
+        self.assertIsNone(session_cache.get("profile_id"))
+
+    def test_resilience_retries_throttling(self, boto_mock):
+        response_config_str = '[{"shipOptionID": 1, "shipOptionName": "Standard"}]'
+        response_body = botocore.response.StreamingBody(StringIO(response_config_str), len(response_config_str))
+        throttling = botocore.exceptions.ClientError({"Error": {"Code": "ThrottlingException"}},
+                                                     "GetLatestConfiguration")
+        boto_mock.side_effect = [{'InitialConfigurationToken': "QQQQwww"}, throttling,
+                                 {"Configuration": response_body}]
+
+        resilience = ResilientCaller(sleep=lambda delay: None)
+        config_json = ApConfigJsonConvert([], "profile_id", resilience=resilience).get_config()
+        self.assertEqual(config_json, [{"shipOptionID": 1, "shipOptionName": "Standard"}])
+        self.assertEqual(resilience.stats()["retries"], 1)
+        assert boto_mock.call_count == 3
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
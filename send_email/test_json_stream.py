@@ -0,0 +1,50 @@
+import io
+import json
+import unittest
+
+from send_email.json_stream import JsonArrayWriter, iter_json_array, load_json
+
+
+class TestJsonStream(unittest.TestCase):
+
+    def test_iter_json_array(self):
+        items = [{"shipOptionID": index, "shipOptionName": "名称 %d" % index, "days": [index, 1.5, None, True]}
+                 for index in range(200)] + [12345678, "x", [], {}]
+        document = json.dumps(items, ensure_ascii=False, indent=2)
+        for chunk_size in (1, 3, 7, 64, 100000):
+            self.assertEqual(list(iter_json_array(io.BytesIO(document.encode('utf-8')), chunk_size)), items)
+            self.assertEqual(list(iter_json_array(io.StringIO(document), chunk_size)), items)
+
+    def test_empty_and_invalid(self):
+        self.assertEqual(list(iter_json_array(io.BytesIO(b' [ ] '))), [])
+        self.assertRaises(ValueError, list, iter_json_array(io.BytesIO(b'{"a": 1}')))
+        self.assertRaises(ValueError, list, iter_json_array(io.BytesIO(b'[1 2]')))
+        self.assertRaises(ValueError, list, iter_json_array(io.BytesIO(b'[1, 2')))
+        self.assertRaises(ValueError, list, iter_json_array(io.BytesIO(b'[1] 2')))
+
+    def test_load_json(self):
+        items = [{"shipOptionID": index, "shipOptionName": "名称 %d" % index} for index in range(50)]
+        document = json.dumps(items, ensure_ascii=False)
+        self.assertEqual(load_json(io.BytesIO(document.encode('utf-8')), 7), items)
+        self.assertEqual(load_json(io.StringIO(document), 7), items)
+        self.assertEqual(load_json(io.BytesIO(' {"名称": [1, 2]} '.encode('utf-8')), 3), {"名称": [1, 2]})
+        self.assertEqual(load_json(io.StringIO('"x"'), 1), "x")
+        self.assertIsNone(load_json(io.BytesIO(b'')))
+        self.assertRaises(ValueError, load_json, io.BytesIO(b'[1, 2'))
+        self.assertRaises(ValueError, load_json, io.BytesIO(b'{"a": 1'))
+
+    def test_writer(self):
+        items = [{"shipOptionID": 1, "shipOptionName": "名称"}, 2]
+        for fp in (io.BytesIO(), io.StringIO()):
+            with JsonArrayWriter(fp) as writer:
+                for item in items:
+                    writer.write(item)
+            value = fp.getvalue()
+            self.assertEqual(json.loads(value), items)
+        with JsonArrayWriter(io.StringIO()) as writer:
+            self.assertEqual(writer.fp.getvalue(), '[')
+        self.assertEqual(writer.fp.getvalue(), '[]')
+
+
+if __name__ == '__main__':
+    unittest.main()
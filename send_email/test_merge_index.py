@@ -0,0 +1,78 @@
+import random
+import unittest
+
+import json_tools
+
+from send_email.merge_index import ChangeSet, MergeIndex, field_deltas, fingerprint
+
+
+def diff_merge(config_json, list_obj):
+    """The json_tools.diff based merge the index must reproduce."""
+    cache_dict = {}
+    if config_json:
+        for each_data in config_json:
+            cache_dict[each_data["shipOptionID"]] = each_data
+    change_num = 0
+    for item in list_obj:
+        ship_id = item["shipOptionID"]
+        if ship_id not in cache_dict or json_tools.diff(item, cache_dict[ship_id]):
+            cache_dict[ship_id] = item
+            change_num += 1
+    return cache_dict, change_num
+
+
+def ship_option(ship_id, max_days):
+    return {"shipOptionID": ship_id, "shipOptionName": "Option %d" % ship_id,
+            "shipOptionMinTransitTimeasDays": 1, "shipOptionMaxTransitTimeasDays": max_days}
+
+
+class TestMergeIndex(unittest.TestCase):
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint({"a": 1, "b": [1, 2]}), fingerprint({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(fingerprint({"a": 1}), fingerprint({"a": 1.0}))
+        self.assertNotEqual(fingerprint({"a": 1}), fingerprint({"a": True}))
+        self.assertNotEqual(fingerprint({"a": [1, 2]}), fingerprint({"a": [2, 1]}))
+
+    def test_same_result_as_diff(self):
+        rand = random.Random(7)
+        for _ in range(50):
+            config_json = [ship_option(ship_id, rand.randint(1, 3)) for ship_id in range(rand.randint(0, 30))]
+            list_obj = [ship_option(rand.randint(0, 40), rand.randint(1, 3)) for _ in range(rand.randint(0, 30))]
+
+            expected, expected_change_num = diff_merge(config_json, list_obj)
+            merged, change_num = MergeIndex(config_json).merge(list_obj)
+            self.assertEqual(list(merged.items()), list(expected.items()))
+            self.assertEqual(change_num == 0, expected_change_num == 0)
+
+    def test_merge_details(self):
+        index = MergeIndex([ship_option(1, 3), ship_option(2, 3)])
+        details = {}
+        merged, change_num = index.merge([ship_option(1, 3), ship_option(2, 5), ship_option(3, 3)], details)
+
+        self.assertEqual(change_num, 2)
+        self.assertEqual(list(merged), [1, 2, 3])
+        self.assertEqual(details, {2: [{'replace': '/shipOptionMaxTransitTimeasDays', 'value': 5, 'prev': 3}]})
+        self.assertEqual(index.items[2], ship_option(2, 3))
+
+    def test_change_set(self):
+        index = MergeIndex([ship_option(1, 3), ship_option(2, 3), ship_option(3, 3)])
+        change_set = ChangeSet()
+        merged, change_num = index.merge([ship_option(4, 3), ship_option(2, 5), ship_option(1, 3),
+                                          ship_option(4, 3)], change_set=change_set)
+
+        self.assertEqual(change_num, 2)
+        self.assertEqual(change_set.added, [4])
+        self.assertEqual(change_set.modified, [2])
+        self.assertEqual(change_set.unchanged, [1])
+        self.assertEqual(change_set.removed, [])
+        self.assertEqual(change_set.change_num, 2)
+        self.assertEqual(change_set.deltas, {2: {"shipOptionMaxTransitTimeasDays": {"prev": 3, "value": 5}}})
+
+    def test_field_deltas(self):
+        self.assertEqual(field_deltas({"a": 1, "b": 2, "c": [1]}, {"a": 1.0, "c": [1], "d": 4}),
+                         {"a": {"prev": 1, "value": 1.0}, "b": {"prev": 2}, "d": {"value": 4}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import csv
+import email
+import gzip
+import io
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import boto3
+from moto import mock_ses
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+from send_email.mime_report import RawMessageWriter, report_attachment, write_report
+from send_email.send_email_common import EmailBody, SesMailSender
+
+os.environ['EMAIL_SOURCE'] = "xu.liang@cienet.com.cn"
+os.environ['EMAIL_DESTINATION'] = "xu@229"
+
+
+def error_message(rows):
+    return {"This sheet %dth row has error" % row: ["Ship Option ID is not null", "Ship Option Name is not null"]
+            for row in range(2, rows + 2)}
+
+
+class TestMimeReport(unittest.TestCase):
+
+    def test_write_report(self):
+        fp = io.BytesIO()
+        write_report(error_message(3), fp)
+        rows = list(csv.reader(io.StringIO(gzip.decompress(fp.getvalue()).decode('utf-8'))))
+        self.assertEqual(rows[0], ["row", "messages"])
+        self.assertEqual(rows[1], ["This sheet 2th row has error",
+                                   "Ship Option ID is not null,Ship Option Name is not null"])
+        self.assertEqual(len(rows), 4)
+
+        fp = io.BytesIO()
+        write_report(error_message(2), fp, 'json')
+        report = json.loads(gzip.decompress(fp.getvalue()))
+        self.assertEqual(report[1], {"row": "This sheet 3th row has error",
+                                     "messages": ["Ship Option ID is not null", "Ship Option Name is not null"]})
+        self.assertRaises(ValueError, write_report, {}, io.BytesIO(), 'xml')
+
+    def test_raw_message(self):
+        filename, content_type, report = report_attachment(error_message(5000))
+        fp = io.BytesIO()
+        writer = RawMessageWriter(fp)
+        writer.write_headers("xu.liang@cienet.com.cn", "a@163.com,b@163.com", "报告", cc="c@163.com")
+        writer.write_body("text", "<p>html</p>")
+        writer.write_attachment(filename, content_type, report)
+        writer.close()
+
+        message = email.message_from_bytes(fp.getvalue())
+        self.assertEqual(message["To"], "a@163.com, b@163.com")
+        self.assertEqual(str(email.header.make_header(email.header.decode_header(message["Subject"]))), "报告")
+        parts = [part for part in message.walk() if not part.is_multipart()]
+        self.assertEqual([part.get_content_type() for part in parts], ["text/plain", "text/html",
+                                                                       "application/gzip"])
+        self.assertEqual(parts[1].get_payload(decode=True), b"<p>html</p>")
+        self.assertEqual(parts[2].get_filename(), "report.csv.gz")
+        report.seek(0)
+        self.assertEqual(parts[2].get_payload(decode=True), report.read())
+
+    @mock_ses
+    def test_send_appconfig_report_email(self):
+        conn = boto3.client("ses")
+        conn.verify_email_address(EmailAddress="xu.liang@cienet.com.cn")
+        sender = SesMailSender(conn, report_row_threshold=10)
+
+        small = AppConfigResult(0, "12", "123", "12345", AppconfigState.VERIFY_ERROR.value, error_message(10),
+                                "shipoption/test1.json")
+        large = AppConfigResult(0, "12", "123", "12345", AppconfigState.VERIFY_ERROR.value, error_message(30),
+                                "shipoption/test1.json")
+        with patch.object(conn, "send_raw_email", wraps=conn.send_raw_email) as send_raw_email:
+            self.assertIsNotNone(sender.send_appconfig_email(small))
+            self.assertEqual(send_raw_email.call_count, 0)
+            self.assertIsNotNone(sender.send_appconfig_email(large))
+            self.assertEqual(send_raw_email.call_count, 1)
+
+        raw = email.message_from_bytes(send_raw_email.call_args.kwargs["RawMessage"]["Data"])
+        text = [part for part in raw.walk() if part.get_content_type() == "text/plain"][0].get_payload(decode=True)
+        self.assertIn(b"30 error rows in total", text)
+        self.assertIn(b"This sheet 21th row", text)
+        self.assertNotIn(b"This sheet 22th row", text)
+
+    def test_send_raw_email_too_large(self):
+        sender = SesMailSender(boto3.client("ses", region_name="us-east-1"))
+        email_body = EmailBody(source="xu.liang@cienet.com.cn", destination="a@163.com", subject="s", text="t",
+                               html="h")
+        attachment = ("data.bin", "application/octet-stream", io.BytesIO(b"0" * (8 * 1024 * 1024)))
+        self.assertRaises(ValueError, sender.send_raw_email, email_body, [attachment])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from send_email.json_convert_appconfig import ApConfigJsonConvert
+from send_email.multi_profile import merge_profiles
+
+DEPLOYED = {
+    "profile_a": [{"shipOptionID": 1, "shipOptionName": "Standard"}, {"shipOptionID": 2, "shipOptionName": "Expedite"}],
+    "profile_b": [{"shipOptionID": 1, "shipOptionName": "Standard"}],
+}
+# Every fetch waits here until all the profiles are fetched at the same time, and breaks the barrier otherwise.
+barrier = None
+
+
+def get_config(convert):
+    barrier.wait()
+    if convert.profile_id not in DEPLOYED:
+        raise KeyError(convert.profile_id)
+    return DEPLOYED[convert.profile_id]
+
+
+@patch.object(ApConfigJsonConvert, 'get_config', get_config)
+class TestMergeProfiles(unittest.TestCase):
+
+    def test_merge_profiles(self):
+        global barrier
+        barrier = threading.Barrier(3, timeout=5)
+        data_by_profile = {
+            "profile_a": [{"shipOptionID": 2, "shipOptionName": "Next Day"}],
+            "profile_b": [{"shipOptionID": 3, "shipOptionName": "Pickup"}],
+            "profile_c": [{"shipOptionID": 1, "shipOptionName": "Standard"}],
+        }
+        results = merge_profiles(data_by_profile, max_workers=3)
+        self.assertFalse(barrier.broken)
+
+        self.assertEqual(results["profile_a"].merged, [{"shipOptionID": 1, "shipOptionName": "Standard"},
+                                                       {"shipOptionID": 2, "shipOptionName": "Next Day"}])
+        self.assertEqual(results["profile_b"].merged, [{"shipOptionID": 1, "shipOptionName": "Standard"},
+                                                       {"shipOptionID": 3, "shipOptionName": "Pickup"}])
+        self.assertTrue(results["profile_a"].ok)
+        self.assertFalse(results["profile_c"].ok)
+        self.assertIsInstance(results["profile_c"].error, KeyError)
+        self.assertIsNone(results["profile_c"].merged)
+
+    def test_merge_profiles_in_processes(self):
+        global barrier
+        barrier = threading.Barrier(2, timeout=5)
+        data_by_profile = {
+            "profile_a": [{"shipOptionID": 2, "shipOptionName": "Next Day"}],
+            "profile_b": [{"shipOptionID": 1, "shipOptionName": "Standard"}],
+        }
+        results = merge_profiles(data_by_profile, max_workers=2, use_processes=True, change_set=True)
+        self.assertEqual(results["profile_a"].merged.change_num, 1)
+        self.assertEqual(results["profile_a"].merged.merged[1], {"shipOptionID": 2, "shipOptionName": "Next Day"})
+        self.assertEqual(results["profile_b"].merged.change_num, 0)
+        self.assertEqual(merge_profiles({}), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
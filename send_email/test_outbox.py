@@ -0,0 +1,95 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock
+
+import boto3
+
+from send_email.outbox import FAILED, PENDING, SENDING, SENT, OutboxDrainer, SqliteOutbox
+from send_email.send_email_common import EmailBody, SesMailSender
+
+os.environ['EMAIL_SOURCE'] = "xu.liang@cienet.com.cn"
+os.environ['EMAIL_DESTINATION'] = "xu@229"
+from moto import mock_ses
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+
+
+class TestOutbox(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "outbox.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @mock_ses
+    def test_enqueue_and_drain(self):
+        conn = boto3.client("ses", region_name="us-east-1")
+        conn.verify_email_address(EmailAddress="xu.liang@cienet.com.cn")
+        sender = SesMailSender(conn, outbox=SqliteOutbox(self.path))
+
+        email_id = sender.enqueue_email(EmailBody(source="xu.liang@cienet.com.cn", destination="liangxudoit@163.com",
+                                                  subject="subject", text="text", html="<p>html</p>"))
+        appconfig_id = sender.enqueue_appconfig_email(
+            AppConfigResult(0, "12", "123", "12345", AppconfigState.COMPLETE.value, {}, "shipoption/test1.json"))
+        self.assertEqual(int(conn.get_send_quota()["SentLast24Hours"]), 0)
+
+        drainer = OutboxDrainer(SqliteOutbox(self.path), sender, batch_size=10)
+        self.assertEqual(drainer.drain_once(), 2)
+        self.assertEqual(drainer.drain_once(), 0)
+        self.assertEqual(int(conn.get_send_quota()["SentLast24Hours"]), 2)
+        self.assertEqual(sender.outbox.get(email_id).status, SENT)
+        self.assertIsNotNone(sender.outbox.get(appconfig_id).message_id)
+
+    def test_failures_and_recovery(self):
+        outbox = SqliteOutbox(self.path)
+        sender = Mock()
+        sender.send_appconfig_templated_email.return_value = None
+        entry_id = outbox.enqueue('appconfig_templated_email', AppConfigResult(
+            0, "12", "123", "12345", AppconfigState.ERROR.value, {}, "shipoption/test1.json"))
+
+        drainer = OutboxDrainer(outbox, sender, max_attempts=2)
+        drainer.drain_once()
+        self.assertEqual(outbox.get(entry_id).status, PENDING)
+        drainer.drain_once()
+        entry = outbox.get(entry_id)
+        self.assertEqual((entry.status, entry.attempts, entry.error), (FAILED, 2, "send failed"))
+        self.assertEqual(sender.send_appconfig_templated_email.call_args.args[0].key, "shipoption/test1.json")
+
+        crashed_id = outbox.enqueue('email', EmailBody(source="a@163.com", destination="b@163.com"))
+        outbox.claim(10)
+        self.assertEqual(outbox.recover(), 0)
+        self.assertEqual(outbox.get(crashed_id).status, SENDING)
+        self.assertEqual(outbox.recover(lease_timeout=0), 1)
+        self.assertEqual(outbox.counts(), {PENDING: 1, FAILED: 1})
+
+        sender.send_email.return_value = "id-1"
+        drainer.start()
+        drainer.stop()
+        self.assertEqual(outbox.get(crashed_id).message_id, "id-1")
+        self.assertRaises(ValueError, outbox.enqueue, 'fax', EmailBody(source="a@163.com", destination="b@163.com"))
+
+    def test_restart_within_lease(self):
+        outbox = SqliteOutbox(self.path)
+        entry_id = outbox.enqueue('email', EmailBody(source="a@163.com", destination="b@163.com"))
+        self.assertEqual(len(outbox.claim(10)), 1)
+
+        sender = Mock()
+        sender.send_email.return_value = "id-1"
+        drainer = OutboxDrainer(SqliteOutbox(self.path), sender, interval=0.01, lease_timeout=0.2)
+        drainer.start()
+        self.assertEqual(outbox.get(entry_id).status, SENDING)
+        deadline = time.monotonic() + 5
+        while outbox.get(entry_id).status != SENT and time.monotonic() < deadline:
+            time.sleep(0.01)
+        drainer.stop()
+        self.assertEqual(outbox.get(entry_id).message_id, "id-1")
+        self.assertEqual(sender.send_email.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
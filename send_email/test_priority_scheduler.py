@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+from send_email.priority_scheduler import INFO, URGENT, WARNING, PriorityScheduler, lane_of
+
+
+def appconfig_result(state, key):
+    return AppConfigResult(0, "12", "123", "12345", state.value, {}, key)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingSender:
+
+    def __init__(self):
+        self.sent = []
+        self.release = threading.Event()
+
+    def send_appconfig_email(self, message):
+        self.release.wait()
+        self.sent.append(message.key)
+        return "id-" + message.key
+
+
+class TestPriorityScheduler(unittest.TestCase):
+
+    def test_errors_jump_the_queue(self):
+        sender = RecordingSender()
+        scheduler = PriorityScheduler(sender, workers=1)
+        futures = [scheduler.submit(appconfig_result(AppconfigState.COMPLETE, "complete-0"))]
+        while scheduler.stats()['depth']['info']:
+            time.sleep(0.001)
+        futures += [scheduler.submit(appconfig_result(AppconfigState.COMPLETE, "complete-%d" % index))
+                    for index in range(1, 5)]
+        futures.append(scheduler.submit(appconfig_result(AppconfigState.VERIFY_ERROR, "error")))
+        futures.append(scheduler.submit(appconfig_result(AppconfigState.ROLLED_BACK, "rolled-back")))
+        stats = scheduler.stats()
+        sender.release.set()
+        scheduler.shutdown()
+
+        self.assertEqual(sender.sent[1:3], ["error", "rolled-back"])
+        self.assertEqual(sorted(sender.sent), sorted(["complete-%d" % index for index in range(5)] +
+                                                     ["error", "rolled-back"]))
+        self.assertEqual(futures[5].result(), "id-error")
+        self.assertEqual(stats['depth']['urgent'] + stats['depth']['warning'], 2)
+        stats = scheduler.stats()
+        self.assertEqual(stats['sent'], 7)
+        self.assertEqual(stats['depth'], {'urgent': 0, 'warning': 0, 'info': 0})
+        self.assertEqual(stats['wait']['info']['count'], 5)
+        self.assertRaises(RuntimeError, scheduler.submit, appconfig_result(AppconfigState.ERROR, "late"))
+
+    def test_expired_notifications(self):
+        clock = FakeClock()
+        sender = RecordingSender()
+        digest = MagicMock()
+        scheduler = PriorityScheduler(sender, workers=1, deadlines={INFO: 10}, digest=digest, clock=clock)
+        blocking = scheduler.submit(appconfig_result(AppconfigState.ERROR, "blocking"))
+        expired = scheduler.submit(appconfig_result(AppconfigState.NO_CHANGED, "no-changed"))
+        error = scheduler.submit(appconfig_result(AppconfigState.VERIFY_ERROR, "error"))
+        clock.now = 60
+        sender.release.set()
+        scheduler.shutdown()
+
+        self.assertEqual(sender.sent, ["blocking", "error"])
+        self.assertIsNone(expired.result())
+        self.assertEqual(error.result(), "id-error")
+        digest.add.assert_called_once()
+        self.assertEqual(digest.add.call_args.args[0].key, "no-changed")
+        self.assertEqual(scheduler.stats()['coalesced'], 1)
+        self.assertEqual(scheduler.stats()['wait']['urgent']['max'], 60)
+        self.assertEqual(blocking.result(), "id-blocking")
+
+        scheduler = PriorityScheduler(sender, workers=1, clock=clock)
+        dropped = scheduler.submit(appconfig_result(AppconfigState.COMPLETE, "complete"), deadline=-1)
+        scheduler.shutdown()
+        self.assertIsNone(dropped.result())
+        self.assertEqual(scheduler.stats()['dropped'], 1)
+
+    def test_lane_of(self):
+        self.assertEqual(lane_of(appconfig_result(AppconfigState.ERROR, "key")), URGENT)
+        self.assertEqual(lane_of(appconfig_result(AppconfigState.NO_CHANGED, "key")), INFO)
+        self.assertEqual(lane_of(object()), WARNING)
+        unknown = appconfig_result(AppconfigState.COMPLETE, "key")
+        unknown.state = "DEPLOYING"
+        self.assertEqual(lane_of(unknown), WARNING)
+        scheduler = PriorityScheduler(MagicMock(), workers=0)
+        self.assertIsNone(scheduler.deadlines[WARNING])
+        self.assertIsNone(scheduler.deadlines[lane_of(unknown)])
+
+
+if __name__ == '__main__':
+    unittest.main()
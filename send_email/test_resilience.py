@@ -0,0 +1,104 @@
+import smtplib
+import unittest
+from unittest.mock import Mock
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from send_email.resilience import (CircuitBreaker, CircuitOpenError, DecorrelatedJitterBackoff, ResilientCaller,
+                                   is_retryable)
+from send_email.send_email_common import EmailBody, SesMailSender
+
+
+def client_error(code, status=400):
+    return ClientError({"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "SendEmail")
+
+
+class TestResilience(unittest.TestCase):
+
+    def test_is_retryable(self):
+        self.assertTrue(is_retryable(client_error("Throttling")))
+        self.assertTrue(is_retryable(client_error("Whatever", 503)))
+        self.assertTrue(is_retryable(EndpointConnectionError(endpoint_url="https://email.us-east-1.amazonaws.com")))
+        self.assertFalse(is_retryable(client_error("MessageRejected")))
+        self.assertFalse(is_retryable(ValueError()))
+
+    def test_is_retryable_smtp(self):
+        self.assertTrue(is_retryable(smtplib.SMTPResponseException(421, b"Service not available")))
+        self.assertTrue(is_retryable(smtplib.SMTPDataError(451, b"Try again later")))
+        self.assertFalse(is_retryable(smtplib.SMTPDataError(554, b"Message rejected")))
+        self.assertFalse(is_retryable(smtplib.SMTPAuthenticationError(535, b"Authentication failed")))
+        self.assertTrue(is_retryable(smtplib.SMTPServerDisconnected("Connection unexpectedly closed")))
+        self.assertTrue(is_retryable(ConnectionResetError()))
+        self.assertTrue(is_retryable(smtplib.SMTPRecipientsRefused({"a@163.com": (450, b"Mailbox busy")})))
+        self.assertFalse(is_retryable(smtplib.SMTPRecipientsRefused({"a@163.com": (450, b"Mailbox busy"),
+                                                                     "b@163.com": (550, b"No such user")})))
+
+    def test_backoff(self):
+        backoff = DecorrelatedJitterBackoff(base=1, cap=5, rand=lambda low, high: high)
+        self.assertEqual(backoff.next_delay(), 3)
+        self.assertEqual(backoff.next_delay(3), 5)
+
+    def test_retry_then_succeed(self):
+        sleeps = []
+        caller = ResilientCaller(max_attempts=3, sleep=sleeps.append,
+                                 backoff=DecorrelatedJitterBackoff(rand=lambda low, high: low))
+        func = Mock(side_effect=[client_error("Throttling"), client_error("Throttling"), "ok"])
+        self.assertEqual(caller.call(func, Source="a"), "ok")
+        func.assert_called_with(Source="a")
+        self.assertEqual(sleeps, [0.1, 0.1])
+        self.assertEqual(caller.stats()["retries"], 2)
+
+        func = Mock(side_effect=client_error("MessageRejected"))
+        self.assertRaises(ClientError, caller.call, func)
+        self.assertEqual(func.call_count, 1)
+
+    def test_circuit_breaker(self):
+        now = [0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+        caller = ResilientCaller(max_attempts=2, breaker=breaker, sleep=lambda delay: None)
+        func = Mock(side_effect=client_error("ServiceUnavailable", 503))
+
+        self.assertRaises(ClientError, caller.call, func)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertRaises(CircuitOpenError, caller.call, func)
+        self.assertEqual(func.call_count, 2)
+
+        now[0] = 10
+        func.side_effect = None
+        func.return_value = "ok"
+        self.assertEqual(caller.call(func), "ok")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(caller.stats(), {'calls': 3, 'retries': 1, 'failures': 1, 'breaker_state': 'closed',
+                                          'breaker_opened': 1, 'breaker_rejected': 1})
+
+    def test_non_retryable_error_is_neutral(self):
+        now = [0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+        caller = ResilientCaller(max_attempts=1, breaker=breaker, sleep=lambda delay: None)
+        unavailable = Mock(side_effect=client_error("ServiceUnavailable", 503))
+        rejected = Mock(side_effect=client_error("MessageRejected"))
+
+        self.assertRaises(ClientError, caller.call, unavailable)
+        self.assertRaises(ClientError, caller.call, rejected)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertRaises(ClientError, caller.call, unavailable)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        now[0] = 10
+        self.assertRaises(ClientError, caller.call, rejected)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(caller.call(Mock(return_value="ok")), "ok")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_sender_retries_throttling(self):
+        ses_client = Mock()
+        ses_client.send_email.side_effect = [client_error("Throttling"), {"MessageId": "id-1"}]
+        sender = SesMailSender(ses_client, resilience=ResilientCaller(sleep=lambda delay: None))
+        email_body = EmailBody(source="xu.liang@cienet.com.cn", destination="liangxudoit@163.com",
+                               subject="subject", text="text", html="<p>html</p>")
+        self.assertEqual(sender.send_email(email_body), "id-1")
+        self.assertEqual(ses_client.send_email.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
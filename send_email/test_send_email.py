@@ -1,9 +1,11 @@
+import json
 import os
 import unittest
+from unittest.mock import patch
 
 import boto3
 
-from send_email.send_email_common import EmailBody, SesMailSender
+from send_email.send_email_common import EmailBody, MessageFormat, SesMailSender
 
 os.environ['EMAIL_SOURCE'] = "xu.liang@cienet.com.cn"
 os.environ['EMAIL_DESTINATION'] = "xu@229"
@@ -165,5 +167,84 @@ class TestSendMail(unittest.TestCase):
         sent_count = int(send_quota["SentLast24Hours"])
         self.assertEqual(sent_count, 1)
 
+    def test_send_bulk_templated_email(self):
+        conn = boto3.client("ses", region_name="us-east-2")
+
+        email_bodies = [EmailBody(source="xu.liang@cienet.com.cn",
+                                  destination="user%d@163.com" % index,
+                                  template_name="MyTemplate",
+                                  template_data={"name": "user%d" % index})
+                        for index in range(120)]
+
+        sesMailSender = SesMailSender(conn)
+        with patch.object(conn, "send_bulk_templated_email", side_effect=bulk_response) as bulk_mock:
+            statuses = sesMailSender.send_bulk_templated_email(email_bodies)
+        self.assertEqual(bulk_mock.call_count, 3)
+        self.assertEqual([len(each.kwargs["Destinations"]) for each in bulk_mock.call_args_list], [50, 50, 20])
+        self.assertEqual(len(statuses), 120)
+        self.assertEqual(statuses[119]["destination"], "user119@163.com")
+        self.assertEqual(statuses[119]["message_id"], "user119@163.com-id")
+        self.assertEqual(statuses[0]["status"], "Success")
+
+        email_bodies[1].template_name = "OtherTemplate"
+        self.assertRaises(ValueError, sesMailSender.send_bulk_templated_email, email_bodies)
+
+    def test_send_appconfig_bulk_templated_email(self):
+        conn = boto3.client("ses", region_name="us-east-2")
+
+        appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.COMPLETE.value, {},
+                                           "shipoption/test1.json")
+        sesMailSender = SesMailSender(conn)
+        with patch.object(conn, "send_bulk_templated_email", side_effect=bulk_response) as bulk_mock:
+            statuses = sesMailSender.send_appconfig_bulk_templated_email(appconfig_result,
+                                                                         ["a@163.com", "b@163.com", "c@163.com"])
+        self.assertEqual(bulk_mock.call_args.kwargs["Template"], "SendEmailAppConfigCommon")
+        self.assertEqual([status["status"] for status in statuses], ["Success"] * 3)
+
+
+class TestMessageFormat(unittest.TestCase):
+
+    def test_error_message_format(self):
+        message_dict = {'This sheet 2th row has error': ['Ship Option ID is not null', 'Ship Option Name is not null'],
+                        'This sheet 3th row has error': ['Ship Option <ID> & name']
+                        }
+        appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.VERIFY_ERROR.value, message_dict,
+                                           "shipoption/test1.json")
+        message_format = MessageFormat(appconfig_result)
+
+        self.assertEqual(message_format.error_message_text_format(),
+                         "Hello,\r\nVerification of uploaded excel file failed,details are as follows!\r\n"
+                         "key:shipoption/test1.json\r\n"
+                         "This sheet 2th row has error    Ship Option ID is not null,Ship Option Name is not null\r\n"
+                         "This sheet 3th row has error    Ship Option <ID> & name\r\n")
+        self.assertEqual(message_format.error_message_html_format(),
+                         "<p>Hello!</p><p>Verification of uploaded excel file failed,details are as follows!</p>"
+                         "<p>key:shipoption/test1.json</p><table border='1'>"
+                         "<tr><td>This sheet 2th row has error</td>"
+                         "<td>Ship Option ID is not null,Ship Option Name is not null</td></tr>"
+                         "<tr><td>This sheet 3th row has error</td><td>Ship Option &lt;ID&gt; &amp; name</td></tr>"
+                         "</table>")
+        subject, text, html = message_format.render()
+        self.assertEqual(subject, "Appconfig deploy error notification.")
+        self.assertIs(text, message_format.error_message_text_format())
+
+    def test_common_message_format(self):
+        appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.COMPLETE.value, {},
+                                           "shipoption/test1.json")
+        details = json.dumps(appconfig_result, default=AppConfigResult.convert2json)
+        message_format = MessageFormat(appconfig_result)
+
+        self.assertEqual(message_format.common_message_text_format(),
+                         "Hello,\r\nDeploy details are as follows!\r\n" + details)
+        self.assertEqual(message_format.common_message_html_format(),
+                         "<p>Hello!</p><p>Deploy details are as follows!</p><p>" + details + "</p>")
+        self.assertEqual(message_format.render()[0], "Appconfig deploy COMPLETE notification.")
+
+
+def bulk_response(**send_args):
+    return {'Status': [{'Status': 'Success', 'MessageId': destination['Destination']['ToAddresses'][0] + '-id'}
+                       for destination in send_args['Destinations']]}
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+import os
+import unittest
+
+import boto3
+
+from send_email.send_email_common import EmailBody, SesMailSender
+from send_email.send_engine import SendEngine, TokenBucket
+
+os.environ['EMAIL_SOURCE'] = "xu.liang@cienet.com.cn"
+os.environ['EMAIL_DESTINATION'] = "xu@229"
+from botocore.exceptions import ClientError
+from moto import mock_ses
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_acquire_waits_for_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, clock=clock, sleep=clock.sleep)
+
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(clock.now, 0.0)
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+
+        bucket.acquire()
+        self.assertAlmostEqual(clock.now, 0.5)
+
+    def test_invalid_rate(self):
+        self.assertRaises(ValueError, TokenBucket, 0)
+
+
+class TestSendEngine(unittest.TestCase):
+
+    @mock_ses
+    def test_send_all(self):
+        conn = boto3.client("ses", region_name="us-east-2")
+        conn.verify_email_address(EmailAddress="xu.liang@cienet.com.cn")
+        email_bodies = [EmailBody(source="xu.liang@cienet.com.cn",
+                                  destination="user%d@163.com" % index,
+                                  subject="subject",
+                                  text="text",
+                                  html="<p>html</p>")
+                        for index in range(20)]
+
+        with SendEngine(SesMailSender(conn), max_workers=4, max_send_rate=1000) as engine:
+            message_ids = list(engine.send_all(email_bodies))
+
+        self.assertEqual(len(set(message_ids)), 20)
+        send_quota = conn.get_send_quota()
+        self.assertEqual(int(send_quota["SentLast24Hours"]), 20)
+
+    @mock_ses
+    def test_quota_rate_and_errors(self):
+        conn = boto3.client("ses", region_name="us-east-2")
+        engine = SendEngine(SesMailSender(conn), max_workers=2)
+        self.assertEqual(engine.bucket.rate, conn.get_send_quota()["MaxSendRate"])
+
+        email_body = EmailBody(source="xu.liang@cienet.com.cn", destination="liangxudoit@163.com",
+                               subject="subject", text="text", html="<p>html</p>")
+        future = engine.submit(email_body)
+        self.assertRaises(ClientError, future.result)
+
+        appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.COMPLETE.value, "",
+                                           "shipoption/test1.json")
+        self.assertIsNone(engine.submit(appconfig_result, "send_appconfig_email").result())
+        engine.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
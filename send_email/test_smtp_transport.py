@@ -0,0 +1,155 @@
+import email
+import os
+import smtplib
+import socket
+import unittest
+from unittest.mock import MagicMock
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+from send_email.send_email_common import EmailBody, SesMailSender
+from send_email.send_engine import SendEngine
+from send_email.smtp_transport import SmtpTransport
+from send_email.template_engine import LocalTemplate, TemplateRegistry
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+os.environ['EMAIL_SOURCE'] = "xu.liang@cienet.com.cn"
+os.environ['EMAIL_DESTINATION'] = "xu@229"
+
+
+class RecordingHandler:
+
+    def __init__(self):
+        self.envelopes = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        self.peers.add(session.peer)
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestSmtpTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=free_port())
+        self.controller.start()
+        registry = TemplateRegistry()
+        registry.register(LocalTemplate("MyTemplate", "Hello {{name}}", "Hi {{name}}", "<p>Hi {{name}}</p>"))
+        self.transport = SmtpTransport("127.0.0.1", self.controller.port, starttls=False, template_registry=registry)
+        self.sender = SesMailSender(transport=self.transport)
+
+    def tearDown(self):
+        self.transport.close()
+        self.controller.stop()
+
+    def test_send_email(self):
+        email_body = EmailBody(source="xu.liang@cienet.com.cn", destination="a@163.com,b@163.com",
+                               subject="Example of an email.", text="Hello", html="<p>Hello!</p>",
+                               cc="c@qq.com", bcc="d@qq.com", reply_tos="e@qq.com")
+        message_ids = [self.sender.send_email(email_body) for _ in range(3)]
+
+        self.assertEqual(len(set(message_ids)), 3)
+        self.assertEqual(len(self.handler.envelopes), 3)
+        self.assertEqual(len(self.handler.peers), 1)
+        envelope = self.handler.envelopes[0]
+        self.assertEqual(envelope.rcpt_tos, ["a@163.com", "b@163.com", "c@qq.com", "d@qq.com"])
+        message = email.message_from_bytes(envelope.content)
+        self.assertEqual(message["Subject"], "Example of an email.")
+        self.assertEqual(message["Reply-To"], "e@qq.com")
+        self.assertEqual(message["Message-ID"], "<%s>" % message_ids[0])
+        self.assertIsNone(message["Bcc"])
+        self.assertIsNone(self.sender.ses_client)
+        self.assertRaises(ValueError, SesMailSender, MagicMock(), transport=self.transport)
+
+    def test_send_templated_and_appconfig_email(self):
+        email_body = EmailBody(source="xu.liang@cienet.com.cn", destination="a@163.com", template_name="MyTemplate",
+                               template_data={"name": "Alejandro"})
+        self.assertIsNotNone(self.sender.send_templated_email(email_body))
+        statuses = self.sender.send_bulk_templated_email(
+            [EmailBody(source="xu.liang@cienet.com.cn", destination="b@163.com", template_name="MyTemplate"),
+             EmailBody(source="xu.liang@cienet.com.cn", destination="c@163.com", template_name="MyTemplate",
+                       template_data={"name": "Bob"})], default_template_data={"name": "all"})
+        self.assertEqual([status['status'] for status in statuses], ["Success", "Success"])
+
+        appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.COMPLETE.value, "",
+                                           "shipoption/test1.json")
+        self.assertIsNotNone(self.sender.send_appconfig_email(appconfig_result))
+
+        subjects = [email.message_from_bytes(envelope.content)["Subject"] for envelope in self.handler.envelopes]
+        self.assertEqual(subjects, ["Hello Alejandro", "Hello all", "Hello Bob",
+                                    "Appconfig deploy COMPLETE notification."])
+        self.assertEqual(self.handler.envelopes[3].rcpt_tos, ["xu@229"])
+
+
+class TestSmtpTransportPool(unittest.TestCase):
+
+    def test_reconnect_closed_idle_connection(self):
+        connections = []
+
+        def smtp_factory(host, port, timeout):
+            connection = MagicMock()
+            connection.sendmail.return_value = {}
+            connections.append(connection)
+            return connection
+
+        transport = SmtpTransport("smtp.example.com", username="user", password="secret", smtp_factory=smtp_factory)
+        raw = {'Data': b"From: a@163.com\r\nTo: b@163.com\r\nSubject: s\r\n\r\nbody"}
+        transport.send_raw_email(RawMessage=raw)
+        connections[0].sendmail.side_effect = smtplib.SMTPServerDisconnected()
+        response = transport.send_raw_email(RawMessage=raw)
+
+        self.assertEqual(len(connections), 2)
+        connections[1].starttls.assert_called_once_with()
+        connections[1].login.assert_called_once_with("user", "secret")
+        source, recipients, data = connections[1].sendmail.call_args.args
+        self.assertEqual((source, recipients), ("a@163.com", ["b@163.com"]))
+        self.assertTrue(data.startswith(b"Message-ID: <%s>" % response['MessageId'].encode()))
+
+        connections[1].sendmail.side_effect = smtplib.SMTPRecipientsRefused({})
+        self.assertRaises(smtplib.SMTPRecipientsRefused, transport.send_raw_email, RawMessage=raw)
+        transport.close()
+        connections[1].quit.assert_called_once_with()
+
+    def test_send_raw_email_bcc(self):
+        connection = MagicMock()
+        connection.sendmail.return_value = {}
+        transport = SmtpTransport("smtp.example.com", starttls=False, smtp_factory=lambda *args, **kwargs: connection)
+        raw = {'Data': b"From: a@163.com\r\nTo: b@163.com\r\nBcc: c@163.com,\r\n d@163.com\r\n"
+                       b"Subject: s\r\nMessage-ID: <1@163.com>\r\n\r\nBcc: body"}
+        transport.send_raw_email(RawMessage=raw)
+
+        source, recipients, data = connection.sendmail.call_args.args
+        self.assertEqual(recipients, ["b@163.com", "c@163.com", "d@163.com"])
+        self.assertEqual(data, b"From: a@163.com\r\nTo: b@163.com\r\nSubject: s\r\nMessage-ID: <1@163.com>\r\n\r\n"
+                               b"Bcc: body")
+        transport.close()
+
+    def test_send_engine(self):
+        connection = MagicMock()
+        connection.sendmail.return_value = {}
+        transport = SmtpTransport("smtp.example.com", starttls=False, smtp_factory=lambda *args, **kwargs: connection)
+        email_bodies = [EmailBody(source="xu.liang@cienet.com.cn", destination="user%d@163.com" % index,
+                                  subject="subject", text="text", html="<p>html</p>") for index in range(5)]
+        with SendEngine(SesMailSender(transport=transport), max_workers=2) as engine:
+            self.assertIsNone(engine.bucket)
+            message_ids = list(engine.send_all(email_bodies))
+        self.assertEqual(len(set(message_ids)), 5)
+        self.assertEqual(connection.sendmail.call_count, 5)
+        transport.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from send_email.json_convert_appconfig import ApConfigJsonConvert
+from send_email.merge_index import MergeIndex
+from send_email.snapshot_store import SnapshotStore
+
+os.environ['APP_CONFIG_APPLICATION_ID'] = "swwi0e4"
+os.environ['APP_CONFIG_ENVIRONMENT_ID'] = "ce7ph4v"
+
+CONFIG_JSON = [
+    {"shipOptionID": 1, "shipOptionName": "Standard", "shipOptionMinTransitTimeasDays": 3},
+    {"shipOptionID": "2", "shipOptionName": "Expedite", "shipOptionMinTransitTimeasDays": 2.5},
+]
+
+
+def deployment(version, state='COMPLETE', profile_id="profile_id"):
+    return {'ConfigurationProfileId': profile_id, 'ConfigurationVersion': version, 'State': state}
+
+
+def appconfig_client(*deployments):
+    client = MagicMock()
+    client.list_deployments.return_value = {'Items': list(deployments)}
+    return client
+
+
+class TestSnapshotStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        self.assertIsNone(self.store.load("profile_id"))
+        self.store.save("profile_id", 3, CONFIG_JSON)
+
+        snapshot = self.store.load("profile_id", 3)
+        self.assertEqual(snapshot.version, "3")
+        self.assertEqual(snapshot.keys, [1, "2"])
+        self.assertEqual(snapshot.config_json, CONFIG_JSON)
+        index = MergeIndex(CONFIG_JSON)
+        self.assertEqual(snapshot.fingerprints, index.fingerprints)
+        self.assertEqual(snapshot.merge_index().items, index.items)
+
+        self.assertIsNone(self.store.load("profile_id", 4))
+        self.store.save("profile_id", "v4", CONFIG_JSON[:1])
+        self.assertEqual(self.store.load("profile_id", "v4").version, "v4")
+        self.assertEqual(self.store.load("profile_id").config_json, CONFIG_JSON[:1])
+
+        with open(self.store.path("profile_id"), "r+b") as fp:
+            fp.truncate(20)
+        self.assertIsNone(self.store.load("profile_id"))
+        self.store.invalidate("profile_id")
+        self.store.invalidate("profile_id")
+        self.assertFalse(os.path.exists(self.store.path("profile_id")))
+
+    def test_deployed_version(self):
+        client = appconfig_client(deployment("5", profile_id="other_profile"), deployment("4", 'ROLLED_BACK'),
+                                  deployment("3"), deployment("2"))
+        self.assertEqual(self.store.deployed_version("profile_id", client=client), "3")
+        client.list_deployments.assert_called_once_with(ApplicationId="swwi0e4", EnvironmentId="ce7ph4v")
+        self.assertIsNone(self.store.deployed_version("profile_id", client=appconfig_client(
+            deployment("4", 'DEPLOYING'), deployment("3"))))
+        self.assertIsNone(self.store.deployed_version("profile_id", client=appconfig_client()))
+
+    def test_deployed_version_pages(self):
+        client = MagicMock()
+        client.list_deployments.side_effect = [
+            {'Items': [deployment("5", profile_id="other_profile")], 'NextToken': "page2"},
+            {'Items': [deployment("4", 'ROLLED_BACK')], 'NextToken': "page3"},
+            {'Items': [deployment("3"), deployment("2")], 'NextToken': "page4"},
+        ]
+        self.assertEqual(self.store.deployed_version("profile_id", client=client), "3")
+        self.assertEqual(client.list_deployments.call_count, 3)
+        client.list_deployments.assert_called_with(ApplicationId="swwi0e4", EnvironmentId="ce7ph4v", NextToken="page3")
+
+        client.list_deployments.side_effect = [
+            {'Items': [deployment("5", profile_id="other_profile")], 'NextToken': "page2"}, {'Items': []}]
+        self.assertIsNone(self.store.deployed_version("profile_id", client=client))
+
+    def test_load_latest(self):
+        self.store.save("profile_id", 3, CONFIG_JSON)
+        with patch('send_email.client_pool.get_client', return_value=appconfig_client(deployment("3"))) as get_client:
+            self.assertEqual(self.store.load_latest("profile_id").version, "3")
+            self.assertIsNone(self.store.load_latest("other_profile"))
+        get_client.return_value.list_deployments.assert_called_once()
+        self.assertIsNone(self.store.load_latest("profile_id", client=appconfig_client(deployment("4"))))
+
+    def test_convert_and_merge_from_snapshot(self):
+        self.store.save("profile_id", 3, CONFIG_JSON)
+        upload = [{"shipOptionID": 1, "shipOptionName": "Standard", "shipOptionMinTransitTimeasDays": 4},
+                  {"shipOptionID": 5, "shipOptionName": "Pickup"}]
+        with patch('send_email.client_pool.get_client', return_value=appconfig_client(deployment("3"))), \
+                patch.object(ApConfigJsonConvert, 'get_config') as get_config:
+            merged = ApConfigJsonConvert(upload, "profile_id", snapshot_store=self.store).convert_and_merge()
+            unchanged = ApConfigJsonConvert(CONFIG_JSON[:1], "profile_id",
+                                            snapshot_store=self.store).convert_and_merge(change_set=True)
+        get_config.assert_not_called()
+        self.assertEqual(merged, [upload[0], CONFIG_JSON[1], upload[1]])
+        self.assertEqual(unchanged.change_num, 0)
+        self.assertEqual(unchanged.merged, CONFIG_JSON)
+
+        with patch('send_email.client_pool.get_client', return_value=appconfig_client(deployment("4"))), \
+                patch.object(ApConfigJsonConvert, 'get_config', return_value=CONFIG_JSON[:1]) as get_config:
+            merged = ApConfigJsonConvert(upload, "profile_id", snapshot_store=self.store).convert_and_merge()
+            self.assertEqual(ApConfigJsonConvert(upload, "profile_id", snapshot_store=self.store).convert_and_merge(),
+                             merged)
+        get_config.assert_called_once_with()
+        self.assertEqual(merged, [upload[0], upload[1]])
+        self.assertEqual(self.store.load("profile_id", "4").config_json, CONFIG_JSON[:1])
+
+    def test_snapshot_not_saved_when_deployed_during_download(self):
+        client = MagicMock()
+        client.list_deployments.side_effect = [{'Items': [deployment("3")]}, {'Items': [deployment("4")]}]
+        with patch('send_email.client_pool.get_client', return_value=client), \
+                patch.object(ApConfigJsonConvert, 'get_config', return_value=CONFIG_JSON):
+            ApConfigJsonConvert([], "profile_id", snapshot_store=self.store).convert_and_merge()
+        self.assertFalse(os.path.exists(self.store.path("profile_id")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import boto3
+
+from send_email.send_email_common import EmailBody, SesMailSender
+from send_email.template_engine import LocalTemplate, TemplateError, TemplateRegistry, compile_template
+
+os.environ['EMAIL_SOURCE'] = "xu.liang@cienet.com.cn"
+os.environ['EMAIL_DESTINATION'] = "xu@229"
+from moto import mock_ses
+
+from entity import AppConfigResult
+from entity.appconfig_state_enum import AppconfigState
+
+ERROR_TEMPLATE = LocalTemplate(
+    "SendEmailAppConfigError",
+    "Appconfig deploy error notification.",
+    "{{#each error_message}}{{row}}    {{msg}}\r\n{{/each}}",
+    "<table border='1'>{{#each error_message}}<tr><td>{{row}}</td><td>{{msg}}</td></tr>{{/each}}</table>")
+
+
+class TestTemplateEngine(unittest.TestCase):
+
+    def test_render(self):
+        template = LocalTemplate("MyTemplate", "Deploy {{state}}",
+                                 "{{#each rows}}{{@index}}:{{this.name}} {{key}}\n{{/each}}",
+                                 "<p>{{#if rows}}{{#each rows}}<b>{{name}}</b>{{{raw}}}{{/each}}{{else}}none{{/if}}</p>")
+        data = {"state": "COMPLETE", "key": "k", "rows": [{"name": "<a>", "raw": "<br>"}, {"name": "b", "raw": ""}]}
+        self.assertEqual(template.render(data),
+                         ("Deploy COMPLETE", "0:<a> k\n1:b k\n", "<p><b>&lt;a&gt;</b><br><b>b</b></p>"))
+        self.assertEqual(template.render({"state": True, "rows": []}), ("Deploy true", "", "<p>none</p>"))
+
+    def test_errors(self):
+        template = LocalTemplate("MyTemplate", "Deploy {{state}}")
+        self.assertRaises(TemplateError, template.render, {})
+        self.assertRaises(TemplateError, LocalTemplate("MyTemplate", "{{#each rows}}x{{/each}}").render, {"rows": 1})
+        self.assertRaises(TemplateError, compile_template, "{{#each rows}}")
+        self.assertRaises(TemplateError, compile_template, "{{/if}}")
+        self.assertRaises(TemplateError, compile_template, "{{#with rows}}{{/with}}")
+        self.assertIs(compile_template("{{name}}"), compile_template("{{name}}"))
+
+    @mock_ses
+    def test_registry_fetches_once(self):
+        conn = boto3.client("ses", region_name="us-east-2")
+        conn.create_template(Template={"TemplateName": "MyTemplate", "SubjectPart": "Hi {{name}}",
+                                       "HtmlPart": "<p>{{name}}</p>", "TextPart": "{{name}}"})
+        registry = TemplateRegistry(conn)
+        with patch.object(conn, "get_template", wraps=conn.get_template) as get_mock:
+            template = registry.get("MyTemplate")
+            self.assertIs(registry.get("MyTemplate"), template)
+        self.assertEqual(get_mock.call_count, 1)
+        self.assertEqual(template.render({"name": "x"}), ("Hi x", "x", "<p>x</p>"))
+        self.assertRaises(TemplateError, TemplateRegistry().get, "MyTemplate")
+
+
+class TestLocalTemplatedEmail(unittest.TestCase):
+
+    @mock_ses
+    def test_send_local_templated_email(self):
+        conn = boto3.client("ses", region_name="us-east-2")
+        conn.verify_email_address(EmailAddress="xu.liang@cienet.com.cn")
+        conn.create_template(Template={"TemplateName": "SendEmailAppConfigError", "SubjectPart": "lalala",
+                                       "HtmlPart": "1111", "TextPart": "1111"})
+        registry = TemplateRegistry()
+        registry.register(ERROR_TEMPLATE)
+        sender = SesMailSender(conn, template_registry=registry)
+
+        appconfig_result = AppConfigResult(0, "12", "123", "12345", AppconfigState.VERIFY_ERROR.value,
+                                           {'This sheet 2th row has error': ['Ship Option ID is not null']},
+                                           "shipoption/test1.json")
+        with patch.object(sender, "send_email", wraps=sender.send_email) as send_mock:
+            self.assertIsNotNone(sender.send_appconfig_templated_email(appconfig_result))
+            self.assertEqual(send_mock.call_count, 0)
+
+            appconfig_result.error_message = {'This sheet %dth row has error' % row: ['Ship Option ID is not null']
+                                              for row in range(10000)}
+            self.assertIsNotNone(sender.send_appconfig_templated_email(appconfig_result))
+            self.assertEqual(send_mock.call_count, 1)
+            self.assertTrue(send_mock.call_args.args[0].html.startswith("<table border='1'><tr><td>This sheet 0th"))
+
+        email_body = EmailBody(source="xu.liang@cienet.com.cn", destination="liangxudoit@163.com",
+                               template_name="SendEmailAppConfigError",
+                               template_data={"error_message": [{"row": "This sheet 2th row has error"}]})
+        self.assertRaises(TemplateError, sender.send_local_templated_email, email_body)
+
+        send_quota = conn.get_send_quota()
+        self.assertEqual(int(send_quota["SentLast24Hours"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from send_email.validator import ShipOptionValidator, validate_ship_options
+
+
+def ship_option(ship_id, min_days=1, max_days=3, name="Standard"):
+    return {"shipOptionID": ship_id, "shipOptionName": name, "shipOptionMinTransitTimeasDays": min_days,
+            "shipOptionMaxTransitTimeasDays": max_days}
+
+
+class TestShipOptionValidator(unittest.TestCase):
+
+    def test_validate(self):
+        rows = [
+            ship_option(1),
+            {"shipOptionMinTransitTimeasDays": 1, "shipOptionMaxTransitTimeasDays": 3},
+            ship_option(3, min_days=5, max_days=2),
+            ship_option(1, max_days="3", name=""),
+            ship_option(True, name=7),
+        ]
+        self.assertEqual(validate_ship_options(rows), {
+            'This sheet 3th row has error': ['Ship Option ID is not null', 'Ship Option Name is not null'],
+            'This sheet 4th row has error': ['Ship Option Min Transit Time as Days is greater than '
+                                             'Ship Option Max Transit Time as Days'],
+            'This sheet 5th row has error': ['Ship Option Name is not null',
+                                             'Ship Option Max Transit Time as Days is not a number',
+                                             'Ship Option ID is duplicated'],
+            'This sheet 6th row has error': ['Ship Option ID is not a number', 'Ship Option Name is not a string'],
+            'This sheet 2th row has error': ['Ship Option ID is duplicated'],
+        })
+        self.assertEqual(list(validate_ship_options(rows)), ['This sheet 2th row has error',
+                                                             'This sheet 3th row has error',
+                                                             'This sheet 4th row has error',
+                                                             'This sheet 5th row has error',
+                                                             'This sheet 6th row has error'])
+        self.assertEqual(validate_ship_options([ship_option(1), ship_option(2.0)]), {})
+        self.assertEqual(validate_ship_options([]), {})
+
+    def test_duplicates_across_batches(self):
+        rows = (ship_option(ship_id % 7) for ship_id in range(10))
+        errors = ShipOptionValidator(batch_size=3, first_row=1).validate(rows)
+        self.assertEqual(list(errors), ['This sheet %dth row has error' % row for row in (1, 2, 3, 8, 9, 10)])
+
+    def test_large_ids(self):
+        rows = [ship_option(2 ** 53), ship_option(2 ** 53 + 1), ship_option(10 ** 400), ship_option(10 ** 400),
+                ship_option(2 ** 64, min_days=2 ** 64 + 1, max_days=2 ** 64)]
+        self.assertEqual(validate_ship_options(rows, first_row=1), {
+            'This sheet 3th row has error': ['Ship Option ID is duplicated'],
+            'This sheet 4th row has error': ['Ship Option ID is duplicated'],
+            'This sheet 5th row has error': ['Ship Option Min Transit Time as Days is greater than '
+                                             'Ship Option Max Transit Time as Days'],
+        })
+
+    def test_large_upload(self):
+        rows = [ship_option(ship_id) for ship_id in range(200000)]
+        rows[150000] = ship_option(150000, min_days=9)
+        self.assertEqual(validate_ship_options(rows), {
+            'This sheet 150002th row has error': ['Ship Option Min Transit Time as Days is greater than '
+                                                  'Ship Option Max Transit Time as Days'],
+        })
+
+    def test_row_not_object(self):
+        rows = [ship_option(1), "1", None, ship_option(1)]
+        self.assertEqual(validate_ship_options(rows, first_row=1), {
+            'This sheet 1th row has error': ['Ship Option ID is duplicated'],
+            'This sheet 2th row has error': ['The row is not an object'],
+            'This sheet 3th row has error': ['The row is not an object'],
+            'This sheet 4th row has error': ['Ship Option ID is duplicated'],
+        })
+
+    def test_mixed_number_columns(self):
+        rows = [ship_option(2 ** 60), ship_option(float(2 ** 60)), ship_option(2 ** 60 + 1), ship_option(1.5),
+                ship_option(2, min_days=1.5, max_days=1)]
+        self.assertEqual(validate_ship_options(rows, first_row=1), {
+            'This sheet 1th row has error': ['Ship Option ID is duplicated'],
+            'This sheet 2th row has error': ['Ship Option ID is duplicated'],
+            'This sheet 5th row has error': ['Ship Option Min Transit Time as Days is greater than '
+                                             'Ship Option Max Transit Time as Days'],
+        })
+        # the ID column is int64 in the first batch and float64 in the second
+        rows = [ship_option(2 ** 60 + 1), ship_option(3), ship_option(float(3)), ship_option(float(2 ** 60))]
+        errors = ShipOptionValidator(batch_size=2, first_row=1).validate(rows)
+        self.assertEqual(list(errors), ['This sheet %dth row has error' % row for row in (2, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import logging
+
+from send_email import client_pool
+
+logger = logging.getLogger(__name__)
+
+
+class SesApiTransport:
+    """
+    Sends the messages of a SesMailSender with the Amazon SES API.
+
+    A transport takes the keyword arguments of the boto3 SES calls and returns their responses:
+    send_email, send_templated_email, send_bulk_templated_email, send_raw_email and
+    get_send_quota, plus error_types, the exceptions the transport raises when a send fails.
+    SmtpTransport in send_email.smtp_transport implements the same methods over SMTP.
+    """
+
+    def __init__(self, ses_client=None, retry=True):
+        """
+        :param ses_client: A Boto3 Amazon SES client, the pooled client of the
+                           calling thread if None.
+        :param retry: Whether the pooled client retries the failed calls, see client_pool.get_client.
+        """
+        self._ses_client = ses_client
+        self.retry = retry
+
+    @property
+    def ses_client(self):
+        if self._ses_client is not None:
+            return self._ses_client
+        return client_pool.get_client("ses", retry=self.retry)
+
+    def send_email(self, **send_args):
+        return self.ses_client.send_email(**send_args)
+
+    def send_templated_email(self, **send_args):
+        return self.ses_client.send_templated_email(**send_args)
+
+    def send_bulk_templated_email(self, **send_args):
+        return self.ses_client.send_bulk_templated_email(**send_args)
+
+    def send_raw_email(self, **send_args):
+        return self.ses_client.send_raw_email(**send_args)
+
+    def get_send_quota(self):
+        return self.ses_client.get_send_quota()
+
+    @staticmethod
+    def error_types():
+        """
+        :return: tuple: the exception classes of a failed send, for use in except clauses
+        """
+        return client_pool.ClientError,
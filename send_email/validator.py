@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+import collections
+import itertools
+import logging
+import operator
+
+import numpy as np
+
+from send_email.merge_index import KEY_FIELD
+
+logger = logging.getLogger(__name__)
+
+NUMBER = 'number'
+STRING = 'string'
+
+# The uploaded field, its label in the messages and its kind.
+SHIP_OPTION_FIELDS = (
+    ("shipOptionID", "Ship Option ID", NUMBER),
+    ("shipOptionName", "Ship Option Name", STRING),
+    ("shipOptionMinTransitTimeasDays", "Ship Option Min Transit Time as Days", NUMBER),
+    ("shipOptionMaxTransitTimeasDays", "Ship Option Max Transit Time as Days", NUMBER),
+)
+MIN_TRANSIT_FIELD = "shipOptionMinTransitTimeasDays"
+MAX_TRANSIT_FIELD = "shipOptionMaxTransitTimeasDays"
+ROW_MESSAGE = "This sheet %dth row has error"
+
+ROW_NOT_OBJECT_MESSAGE = "The row is not an object"
+
+# The value types as small integer codes, looked up in C by map() so the type checks are comparisons
+# of an int8 column; any other type, bool included, is _OTHER.
+_OTHER, _NULL, _INT, _FLOAT, _STR = range(5)
+_TYPE_CODES = collections.defaultdict(int, {type(None): _NULL, int: _INT, float: _FLOAT, str: _STR})
+# The largest integers a float64 holds exactly.
+_MAX_EXACT_FLOAT = 2 ** 53
+
+
+class ShipOptionValidator:
+    """
+    Validate the uploaded ship option rows column by column: each batch of rows is turned
+    into one NumPy array per field and every check is a vectorized mask over the batch.
+    """
+
+    def __init__(self, fields=SHIP_OPTION_FIELDS, first_row=2, batch_size=65536):
+        """
+        :param fields:the (field, label, kind) of every required field, kind is NUMBER or STRING
+        :param first_row:the sheet row of the first uploaded item, the header being row 1
+        :param batch_size:the number of rows turned into columns at a time, bounding the memory of the columns
+        """
+        self.fields = fields
+        self.first_row = first_row
+        self.batch_size = batch_size
+        self.labels = {field: label for field, label, _ in fields}
+
+    def validate(self, rows):
+        """
+        :param rows:iterable of the uploaded items
+        :return: dict:"This sheet 2th row has error" -> list of messages, in row order, empty if all rows are valid
+        """
+        errors = {}
+        ids = []
+        id_valid = []
+        rows = iter(rows)
+        offset = 0
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            numbers, valid = self._validate_batch(batch, offset, errors)
+            if KEY_FIELD in numbers:
+                ids.append(numbers[KEY_FIELD])
+                id_valid.append(valid[KEY_FIELD])
+            offset += len(batch)
+        if ids:
+            if len({column.dtype for column in ids}) > 1:
+                # mixing int64 and float64 batches would round the large IDs, compare the Python values instead
+                ids = [column.astype(object) for column in ids]
+            self._check_unique(np.concatenate(ids), np.concatenate(id_valid), errors)
+        if errors:
+            logger.info("%s of %s rows have errors.", len(errors), offset)
+        return {ROW_MESSAGE % (index + self.first_row): errors[index] for index in sorted(errors)}
+
+    def _validate_batch(self, batch, offset, errors):
+        """
+        :return: tuple:field -> column and field -> valid mask of the NUMBER fields; a column is int64 or
+                 float64, and object only when its values do not convert exactly, such as IDs beyond int64
+        """
+        checks = []
+        numbers = {}
+        valid = {}
+        is_row = None
+        if set(map(type, batch)) != {dict}:
+            is_row = np.fromiter((isinstance(row, dict) for row in batch), dtype=bool, count=len(batch))
+            batch = [row if isinstance(row, dict) else {} for row in batch]
+            checks.append((~is_row, ROW_NOT_OBJECT_MESSAGE))
+        for field, label, kind in self.fields:
+            values = [row.get(field) for row in batch]
+            types = np.fromiter(map(_TYPE_CODES.__getitem__, map(type, values)), dtype=np.int8, count=len(values))
+            is_null = types == _NULL
+            if kind == NUMBER:
+                is_kind = (types == _INT) | (types == _FLOAT)
+                type_message = "%s is not a number" % label
+            else:
+                is_kind = types == _STR
+                is_null |= is_kind & np.fromiter(map(operator.not_, values), dtype=bool, count=len(values))
+                type_message = "%s is not a string" % label
+            is_other = ~is_null & ~is_kind
+            if is_row is not None:
+                # a row that is not an object only gets ROW_NOT_OBJECT_MESSAGE
+                is_null &= is_row
+                is_other &= is_row
+            checks.append((is_null, "%s is not null" % label))
+            checks.append((is_other, type_message))
+            if kind == NUMBER:
+                numbers[field] = _number_column(values, types, is_kind)
+                valid[field] = is_kind
+
+        if MIN_TRANSIT_FIELD in numbers and MAX_TRANSIT_FIELD in numbers:
+            both = valid[MIN_TRANSIT_FIELD] & valid[MAX_TRANSIT_FIELD]
+            greater = np.zeros(len(batch), dtype=bool)
+            greater[both] = numbers[MIN_TRANSIT_FIELD][both] > numbers[MAX_TRANSIT_FIELD][both]
+            message = "%s is greater than %s" % (self.labels[MIN_TRANSIT_FIELD], self.labels[MAX_TRANSIT_FIELD])
+            checks.append((greater, message))
+
+        masks = np.vstack([mask for mask, _ in checks])
+        messages = [message for _, message in checks]
+        for index in np.flatnonzero(masks.any(axis=0)):
+            errors[offset + int(index)] = [messages[check] for check in np.flatnonzero(masks[:, index])]
+        return numbers, valid
+
+    def _check_unique(self, ids, id_valid, errors):
+        positions = np.flatnonzero(id_valid)
+        _, inverse, counts = np.unique(ids[positions], return_inverse=True, return_counts=True)
+        message = "%s is duplicated" % self.labels[KEY_FIELD]
+        for index in positions[counts[inverse] > 1]:
+            errors.setdefault(int(index), []).append(message)
+
+
+def validate_ship_options(rows, first_row=2):
+    """
+    :param rows:iterable of the uploaded ship option items
+    :param first_row:the sheet row of the first uploaded item
+    :return: dict:the error_message of a VERIFY_ERROR AppConfigResult, empty if all rows are valid
+    """
+    return ShipOptionValidator(first_row=first_row).validate(rows)
+
+
+def _number_column(values, types, is_kind):
+    """
+    :param values:list of the values of a NUMBER field
+    :param types:the type codes of the values
+    :param is_kind:the mask of the int and float values
+    :return: the values as an int64 or float64 column, zero where is_kind is False; an object column of
+             the values if they do not convert exactly, such as ints beyond int64 or above 2**53 next to floats
+    """
+    if is_kind.all():
+        selected = values
+    else:
+        selected = np.array(values, dtype=object)[is_kind].tolist()
+    ints = types[is_kind] == _INT
+    numeric = np.array(selected) if selected else np.zeros(0, dtype=np.int64)
+    exact = numeric.dtype.kind == 'i' or (numeric.dtype.kind == 'f' and not ints.any())
+    if numeric.dtype.kind == 'f' and ints.any():
+        int_values = np.array(np.array(selected, dtype=object)[ints].tolist())
+        exact = int_values.dtype.kind == 'i' and bool(np.all((int_values >= -_MAX_EXACT_FLOAT) &
+                                                             (int_values <= _MAX_EXACT_FLOAT)))
+    if not exact:
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+    if is_kind.all():
+        return numeric
+    column = np.zeros(len(values), dtype=numeric.dtype)
+    column[is_kind] = numeric
+    return column